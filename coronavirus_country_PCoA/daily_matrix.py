@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+'''
+Daily case matrix builder with incremental Bray-Curtis distance and PCoA updates.
+
+The matrix (one row per day, one column per region) is built from every
+../dash-2019-coronavirus/cumulative_data/*.csv in a single concat aligned on
+date_day, and stored as a compressed .npz instead of DailyData.csv.
+
+IncrementalOrdination keeps the Bray-Curtis numerator and per-region sums, so
+appending a day only adds that day's terms to every pair. Full rows are only
+recomputed for regions whose min-max scale changed or that newly pass the
+case threshold, and the PCoA is refreshed by a warm-started subspace
+iteration instead of a full eigendecomposition.
+
+Usage:
+    python daily_matrix.py            # rebuild DailyData.npz and time an update
+'''
+import os
+import time
+
+import pandas as pd
+import numpy as np
+
+from distance import pcoa
+
+###################################
+# Private function and variable
+###################################
+
+CUMULATIVE_DIR = '../dash-2019-coronavirus/cumulative_data/'
+
+def _read_region(path, column):
+    '''Read one region file as a Series indexed by date'''
+    df = pd.read_csv(path, usecols=['date_day', column])
+    df = df.astype({'date_day': 'datetime64[ns]'})
+    # Keep the latest record if a day appears twice
+    df = df.drop_duplicates('date_day', keep='first')
+    return df.set_index('date_day')[column]
+
+def _root(raw):
+    '''Square-root transform; negative daily counts are reporting corrections'''
+    return np.sqrt(np.clip(raw, 0, None))
+
+def _span(low, high):
+    '''Width of the scaling bounds, 1 for a constant column so it scales to 0'''
+    span = high - low
+    span[span == 0] = 1
+    return span
+
+def _scale(raw, low, span):
+    '''Square-root transform, then min-max scale with the given bounds'''
+    return (_root(raw) - low) / span
+
+def _sign_align(new, old):
+    '''Flip eigenvector signs so axes keep their orientation between updates'''
+    k = min(new.shape[1], old.shape[1])
+    signs = np.sign((new[:, :k] * old[:, :k]).sum(axis=0))
+    signs[signs == 0] = 1
+    new[:, :k] *= signs
+    return new
+
+###################################
+# Public function
+###################################
+
+def build_daily_matrix(data_dir=CUMULATIVE_DIR, column='New', drop_last=True):
+    '''
+    Build the day x region matrix of `column` in one concat.
+
+    Regions are aligned on their dates rather than on row order, and days a
+    region has no record for are filled with 0.
+    '''
+    names = sorted(i[:-4] for i in os.listdir(data_dir) if i.endswith('.csv'))
+    series = [_read_region(os.path.join(data_dir, i + '.csv'), column) for i in names]
+    daily = pd.concat(series, axis=1, keys=names).sort_index().fillna(0)
+    daily.index.name = 'date_day'
+    if drop_last:
+        # The latest day is not completed yet
+        daily = daily.iloc[:-1]
+    return daily
+
+def save_matrix(daily, path='./DailyData.npz'):
+    '''Persist a daily matrix as a compressed NumPy archive'''
+    np.savez_compressed(path,
+                        values=daily.values.astype(np.float64),
+                        dates=daily.index.values.astype('datetime64[D]'),
+                        regions=np.asarray(daily.columns, dtype=str))
+
+def load_matrix(path='./DailyData.npz'):
+    '''Load a daily matrix saved by save_matrix'''
+    with np.load(path) as archive:
+        return pd.DataFrame(archive['values'],
+                            index=pd.DatetimeIndex(archive['dates'], name='date_day'),
+                            columns=archive['regions'])
+
+class IncrementalOrdination:
+    '''
+    Bray-Curtis distances and PCoA over the square-root, min-max scaled
+    daily matrix, kept up to date as days are appended.
+    '''
+
+    def __init__(self, daily, min_cases=50, n_components=2, oversample=6):
+        self.min_cases = min_cases
+        self.n_components = n_components
+        self.oversample = oversample
+
+        self.raw = daily.copy()
+        self.regions = [i for i in daily.columns if daily[i].sum() > min_cases]
+        self._full_recompute()
+
+    # Distance state
+    def _full_recompute(self):
+        raw = self.raw[self.regions].values
+        root = _root(raw)
+        # Bounds of the square-root counts of every region, before the constant-column substitution
+        self.low = root.min(axis=0)
+        self.high = root.max(axis=0)
+        self.scaled = _scale(raw, self.low, _span(self.low, self.high))
+        self.colsum = self.scaled.sum(axis=0)
+        self.numerator = np.abs(self.scaled[:, :, None] - self.scaled[:, None, :]).sum(axis=0)
+        self._update_distances()
+        self.coords, _ = pcoa(self.distances, self.n_components)
+        self.explained = self._explained(self.coords)
+        self._basis = None
+
+    def _update_distances(self):
+        denominator = self.colsum[:, None] + self.colsum[None, :]
+        dist = np.divide(self.numerator, denominator,
+                         out=np.zeros_like(self.numerator), where=denominator != 0)
+        self.distances = pd.DataFrame(dist, index=self.regions, columns=self.regions)
+
+    def _recompute_rows(self, idx):
+        '''Recompute the Bray-Curtis numerator of the given regions only'''
+        rows = np.abs(self.scaled[:, idx, None] - self.scaled[:, None, :]).sum(axis=0)
+        self.numerator[idx, :] = rows
+        self.numerator[:, idx] = rows.T
+
+    # Ordination state
+    def _explained(self, coords):
+        '''
+        Share of the total inertia (trace of the double-centred matrix) carried
+        by each axis; the squared coordinates of an axis sum to its eigenvalue.
+        '''
+        d = self.distances.values
+        total = 0.5 * (d**2).sum() / len(d)
+        return (coords**2).sum() / total
+
+    def _update_ordination(self, max_iter=50, tol=1e-8):
+        d = self.distances.values
+        centred = -0.5 * d**2
+        centred -= centred.mean(axis=0, keepdims=True)
+        centred -= centred.mean(axis=1, keepdims=True)
+
+        n = len(centred)
+        k = min(n, self.n_components + self.oversample)
+        if self._basis is None or self._basis.shape != (n, k):
+            # No usable warm start: seed the subspace from the last coordinates
+            basis = np.random.RandomState(0).standard_normal((n, k))
+            basis[:, :self.coords.shape[1]] = self.coords.reindex(self.regions).fillna(0).values
+        else:
+            basis = self._basis
+
+        for _ in range(max_iter):
+            basis, _ = np.linalg.qr(centred @ basis)
+            small = basis.T @ centred @ basis
+            eigvals, vecs = np.linalg.eigh(small)
+            order = np.argsort(eigvals)[::-1]
+            eigvals, ritz = eigvals[order], basis @ vecs[:, order]
+            m = self.n_components
+            residual = np.linalg.norm(centred @ ritz[:, :m] - ritz[:, :m] * eigvals[:m], axis=0)
+            if np.all(residual <= tol * max(abs(eigvals[0]), 1)):
+                break
+        else:
+            # Subspace iteration did not converge, fall back to the exact solution
+            self.coords, _ = pcoa(self.distances, self.n_components)
+            self.explained = self._explained(self.coords)
+            self._basis = None
+            return
+
+        self._basis = ritz
+        m = min(self.n_components, int((eigvals > 0).sum()))
+        old = self.coords.reindex(self.regions).fillna(0).values
+        vecs = _sign_align(ritz[:, :m].copy(), old)
+        columns = ['PC{}'.format(i+1) for i in range(m)]
+        self.coords = pd.DataFrame(vecs * np.sqrt(eigvals[:m]), index=self.regions, columns=columns)
+        self.explained = self._explained(self.coords)
+
+    def append_day(self, date, values):
+        '''
+        Append one day of new cases (a Series indexed by region) and update
+        only the affected distance rows and the ordination.
+        '''
+        row = pd.Series(values, dtype=float).reindex(self.raw.columns).fillna(0)
+        self.raw.loc[pd.Timestamp(date)] = row
+
+        totals = self.raw.sum()
+        new_regions = [i for i in self.raw.columns
+                       if i not in self.regions and totals[i] > self.min_cases]
+        if new_regions:
+            # Region set changed: grow the state with the new columns
+            self.regions = self.regions + new_regions
+            n_old = len(self.numerator)
+            self.numerator = np.pad(self.numerator, ((0, len(new_regions)), (0, len(new_regions))))
+            self.low = np.concatenate([self.low, np.zeros(len(new_regions))])
+            self.high = np.concatenate([self.high, np.zeros(len(new_regions))])
+            self.scaled = np.hstack([self.scaled, np.zeros((len(self.scaled), len(new_regions)))])
+            self.colsum = np.concatenate([self.colsum, np.zeros(len(new_regions))])
+        else:
+            n_old = len(self.regions)
+
+        raw = self.raw[self.regions].values
+        root_new = _root(raw[-1])
+        low = np.minimum(self.low, root_new)
+        high = np.maximum(self.high, root_new)
+        if new_regions:
+            root = _root(raw[:, n_old:])
+            low[n_old:] = root.min(axis=0)
+            high[n_old:] = root.max(axis=0)
+
+        changed = np.flatnonzero((low != self.low) | (high != self.high))
+        changed = np.union1d(changed, np.arange(n_old, len(self.regions)))
+        self.low, self.high = low, high
+        span = _span(low, high)
+
+        # Add the new day, then rescale the columns whose bounds moved
+        self.scaled = np.vstack([self.scaled, _scale(raw[-1], low, span)])
+        if len(changed):
+            self.scaled[:, changed] = _scale(raw[:, changed], low[changed], span[changed])
+        self.colsum = self.scaled.sum(axis=0)
+
+        new_day = self.scaled[-1]
+        self.numerator += np.abs(new_day[:, None] - new_day[None, :])
+        if len(changed):
+            self._recompute_rows(changed)
+
+        self._update_distances()
+        self._update_ordination()
+        return changed
+
+if __name__ == '__main__':
+    start = time.perf_counter()
+    DailyData = build_daily_matrix()
+    save_matrix(DailyData)
+    print('Built {} days x {} regions in {:.2f}s'.format(*DailyData.shape, time.perf_counter() - start))
+
+    history, latest = DailyData.iloc[:-1], DailyData.iloc[-1]
+
+    start = time.perf_counter()
+    ordination = IncrementalOrdination(history)
+    print('Initial ordination of {} regions in {:.2f}s'.format(len(ordination.regions), time.perf_counter() - start))
+
+    start = time.perf_counter()
+    changed = ordination.append_day(latest.name, latest)
+    print('Appended {} with {} rescaled regions in {:.3f}s'.format(
+        latest.name.date(), len(changed), time.perf_counter() - start))
+    print(ordination.coords.round(3))
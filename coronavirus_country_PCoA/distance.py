@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+'''
+Pairwise distance and PCoA engine for the COVID-19 growth pattern analysis.
+
+The notebook version loops over every pair of samples and every day in pure
+Python. Here the condensed distance matrix is built block by block with NumPy
+broadcasting, so the memory used by one block never exceeds `max_bytes`, and
+blocks can be spread over a process pool.
+
+Usage:
+    python distance.py                # Bray-Curtis + PCoA on DailyData.csv
+    python distance.py --jobs 4       # same, with four worker processes
+'''
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import numpy as np
+
+###################################
+# Private function and variable
+###################################
+
+# Default memory budget for one broadcast block (bytes)
+MAX_BYTES = 64 * 2**20
+
+# Data shared with worker processes, set once by _init_worker
+_shared = {}
+
+def _braycurtis_block(block, others):
+    '''Bray-Curtis distance between each row of block and each row of others'''
+    numerator = np.abs(block[:, None, :] - others[None, :, :]).sum(axis=2)
+    denominator = block.sum(axis=1)[:, None] + others.sum(axis=1)[None, :]
+    # Two all-zero samples are identical, so their distance is 0 rather than nan
+    return np.divide(numerator, denominator,
+                     out=np.zeros_like(numerator), where=denominator != 0)
+
+def _cityblock_block(block, others):
+    '''Manhattan distance between each row of block and each row of others'''
+    return np.abs(block[:, None, :] - others[None, :, :]).sum(axis=2)
+
+def _euclidean_block(block, others):
+    '''Euclidean distance between each row of block and each row of others'''
+    sq = (block**2).sum(axis=1)[:, None] + (others**2).sum(axis=1)[None, :] - 2*block @ others.T
+    # Rounding can make sq slightly negative for identical rows
+    return np.sqrt(np.clip(sq, 0, None))
+
+def _cosine_block(block, others):
+    '''Cosine distance between each row of block and each row of others'''
+    norm_block = np.linalg.norm(block, axis=1)[:, None]
+    norm_others = np.linalg.norm(others, axis=1)[None, :]
+    denominator = norm_block * norm_others
+    similarity = np.divide(block @ others.T, denominator,
+                           out=np.zeros((len(block), len(others))), where=denominator != 0)
+    return np.clip(1 - similarity, 0, 2)
+
+def _correlation_block(block, others):
+    '''Correlation distance (1 - Pearson r) between rows of block and others'''
+    return _cosine_block(block - block.mean(axis=1, keepdims=True),
+                         others - others.mean(axis=1, keepdims=True))
+
+# Metric name -> (block function, does the block broadcast over features)
+# Broadcasting metrics materialise a (rows, samples, features) array, the
+# others only a (rows, samples) one, which decides the block size.
+METRICS = {
+    'braycurtis': (_braycurtis_block, True),
+    'cityblock': (_cityblock_block, True),
+    'euclidean': (_euclidean_block, False),
+    'cosine': (_cosine_block, False),
+    'correlation': (_correlation_block, False),
+}
+
+def _row_offset(i, n):
+    '''Position of pair (i, i+1) in a condensed matrix of n samples'''
+    return i*n - i*(i+1)//2
+
+def _block_rows(n, n_features, metric, max_bytes):
+    '''Number of sample rows handled per block under the memory budget'''
+    _, broadcast = METRICS[metric]
+    per_row = 8 * n * (n_features if broadcast else 1)
+    return int(max(1, min(n, max_bytes // max(per_row, 1))))
+
+def _condensed_rows(data, start, stop, metric):
+    '''Condensed distances for rows start..stop against all later rows'''
+    block_fn, _ = METRICS[metric]
+    # Only compare against rows from start on; the lower triangle is not needed
+    block = block_fn(data[start:stop], data[start:])
+    parts = [block[k, k+1:] for k in range(stop - start)]
+    return np.concatenate(parts) if parts else np.empty(0)
+
+def _init_worker(data):
+    _shared['data'] = data
+
+def _worker_rows(args):
+    start, stop, metric = args
+    return start, _condensed_rows(_shared['data'], start, stop, metric)
+
+def _worker_rows_local(data, task):
+    start, stop, metric = task
+    return start, _condensed_rows(data, start, stop, metric)
+
+def _as_samples(table):
+    '''Return (ids, samples x features array) from a DataFrame or array'''
+    if isinstance(table, pd.DataFrame):
+        # Notebook tables hold one sample (region) per column and one day per row
+        return list(table.columns), np.ascontiguousarray(table.values.T, dtype=float)
+    data = np.ascontiguousarray(np.asarray(table, dtype=float))
+    return list(range(len(data))), data
+
+###################################
+# Public function
+###################################
+
+def pairwise_distances(table, metric='braycurtis', max_bytes=MAX_BYTES, n_jobs=1):
+    '''
+    Condensed pairwise distance vector, in the same order as scipy's pdist.
+
+    table is either a DataFrame with one sample per column (as DailyData) or
+    an array with one sample per row. n_jobs > 1 spreads row blocks across a
+    process pool.
+    '''
+    if metric not in METRICS:
+        raise ValueError("metric must be one of {}".format(', '.join(sorted(METRICS))))
+
+    _, data = _as_samples(table)
+    n = len(data)
+    condensed = np.empty(n*(n-1)//2)
+    step = _block_rows(n, data.shape[1], metric, max_bytes)
+    tasks = [(start, min(start+step, n), metric) for start in range(0, n, step)]
+
+    if n_jobs == 1 or len(tasks) == 1:
+        results = (_worker_rows_local(data, task) for task in tasks)
+    else:
+        n_jobs = os.cpu_count() if n_jobs in (None, -1) else n_jobs
+        executor = ProcessPoolExecutor(max_workers=n_jobs,
+                                       initializer=_init_worker, initargs=(data,))
+        with executor:
+            results = list(executor.map(_worker_rows, tasks))
+
+    for start, values in results:
+        offset = _row_offset(start, n)
+        condensed[offset:offset+len(values)] = values
+
+    return condensed
+
+def squareform(condensed):
+    '''Expand a condensed distance vector into a symmetric square matrix'''
+    n = int(round((1 + np.sqrt(1 + 8*len(condensed))) / 2))
+    square = np.zeros((n, n))
+    rows, cols = np.triu_indices(n, k=1)
+    square[rows, cols] = condensed
+    square[cols, rows] = condensed
+    return square
+
+def distance_matrix(table, metric='braycurtis', max_bytes=MAX_BYTES, n_jobs=1):
+    '''Square distance matrix as a DataFrame labelled by sample id'''
+    ids, _ = _as_samples(table)
+    square = squareform(pairwise_distances(table, metric, max_bytes, n_jobs))
+    return pd.DataFrame(square, index=ids, columns=ids)
+
+def pcoa(dm, n_components=2):
+    '''
+    Principal coordinate analysis (classical multidimensional scaling).
+
+    The squared distances are double-centred and eigendecomposed; coordinates
+    are the eigenvectors scaled by the square root of their eigenvalues.
+    Returns (coordinates DataFrame, proportion of variance explained Series).
+    '''
+    ids = list(dm.index) if isinstance(dm, pd.DataFrame) else list(range(len(dm)))
+    d = np.asarray(dm, dtype=float)
+
+    centred = -0.5 * d**2
+    centred -= centred.mean(axis=0, keepdims=True)
+    centred -= centred.mean(axis=1, keepdims=True)
+
+    eigvals, eigvecs = np.linalg.eigh(centred)
+    # eigh returns ascending eigenvalues
+    order = np.argsort(eigvals)[::-1]
+    eigvals, eigvecs = eigvals[order], eigvecs[:, order]
+
+    # Non-euclidean distances such as Bray-Curtis give negative eigenvalues,
+    # which carry no coordinates
+    positive = eigvals > 0
+    k = min(n_components, int(positive.sum()))
+    coords = eigvecs[:, :k] * np.sqrt(eigvals[:k])
+
+    columns = ['PC{}'.format(i+1) for i in range(k)]
+    explained = pd.Series(eigvals[:k] / eigvals[positive].sum(), index=columns)
+    return pd.DataFrame(coords, index=ids, columns=columns), explained
+
+def prepare_daily_table(daily, min_cases=50):
+    '''
+    Same transformation as the notebook: keep regions with more than
+    min_cases cases, square-root transform, then min-max scale each column.
+    Negative daily counts (reporting corrections) are clipped to 0 first.
+    '''
+    table = daily.loc[:, daily.sum() > min_cases].clip(lower=0)**0.5
+    low, high = table.min(), table.max()
+    span = (high - low).replace(0, 1)
+    return (table - low) / span
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default='./DailyData.csv')
+    parser.add_argument('--metric', default='braycurtis', choices=sorted(METRICS))
+    parser.add_argument('--jobs', type=int, default=1)
+    args = parser.parse_args()
+
+    DailyData = pd.read_csv(args.data, index_col=0)
+    DailyDataNorm = prepare_daily_table(DailyData)
+
+    dm = distance_matrix(DailyDataNorm, metric=args.metric, n_jobs=args.jobs)
+    coords, explained = pcoa(dm, n_components=2)
+
+    print(dm.round(3))
+    print(coords.round(3))
+    print('Variance explained: ' + ', '.join('{} {:.2%}'.format(k, v) for k, v in explained.items()))
@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+'''
+Correlation and normality diagnostics over many series at once.
+
+The notebook runs pearsonr, spearmanr, shapiro, normaltest and anderson on
+one 100-point sample at a time. Here:
+
+* pearson / spearman return full correlation matrices (with p-values) from
+  one standardised matrix product, accumulated over blocks of rows so the
+  temporary memory is bounded; Spearman ranks every column once and reuses
+  the Pearson path.
+* normality_tests runs the D'Agostino K^2 test vectorized over all columns
+  and the Shapiro-Wilk and Anderson-Darling tests, which scipy only offers
+  one sample at a time, over batches of columns in a process pool.
+* RunningMoments keeps Welford-style running moments (mean, M2, M3, M4 and
+  the co-moment matrix) that can be updated chunk by chunk, for series too
+  large to hold in memory. It gives means, variances, skewness, kurtosis,
+  the Pearson matrix and the K^2 test without a second pass.
+
+Usage:
+    python correlation.py cumulative     # every pair of regions in cumulative_data/
+    python correlation.py temperature    # streaming moments of the 160-year series
+'''
+import os
+import sys
+import glob
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import numpy as np
+from scipy import stats
+
+###################################
+# Private function and variable
+###################################
+
+# Rows of the data matrix multiplied per block
+BLOCK_ROWS = 4096
+
+def _as_matrix(data):
+    '''(column labels, float observations x variables array)'''
+    if isinstance(data, pd.DataFrame):
+        return list(data.columns), data.values.astype(float)
+    data = np.asarray(data, dtype=float)
+    data = data[:, None] if data.ndim == 1 else data
+    return list(range(data.shape[1])), data
+
+def _gram(centred, block_rows):
+    '''centred.T @ centred accumulated over blocks of rows'''
+    p = centred.shape[1]
+    gram = np.zeros((p, p))
+    for start in range(0, len(centred), block_rows):
+        block = centred[start:start+block_rows]
+        gram += block.T @ block
+    return gram
+
+def _corr_from_cov(cov):
+    '''Correlation matrix from a covariance matrix; constant columns give nan'''
+    std = np.sqrt(np.diag(cov))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = cov / np.outer(std, std)
+    np.fill_diagonal(corr, np.where(std > 0, 1.0, np.nan))
+    return np.clip(corr, -1, 1)
+
+def _p_values(corr, n):
+    '''Two-sided p-values of correlation coefficients with n observations (t test)'''
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = corr * np.sqrt((n - 2) / (1 - corr**2))
+    return 2 * stats.t.sf(np.abs(t), n - 2)
+
+def _labelled(matrix, labels):
+    return pd.DataFrame(matrix, index=labels, columns=labels)
+
+def _shapiro_anderson(columns):
+    '''Shapiro-Wilk and Anderson-Darling results for a batch of 1-d samples'''
+    rows = []
+    for x in columns:
+        x = x[np.isfinite(x)]
+        if len(x) < 3 or np.ptp(x) == 0:
+            rows.append((np.nan, np.nan, np.nan, np.nan))
+            continue
+        w, p = stats.shapiro(x)
+        with warnings.catch_warnings():
+            # Newer scipy asks for a p-value method; only the critical values are used here
+            warnings.simplefilter('ignore', FutureWarning)
+            result = stats.anderson(x)
+        # Critical value at the 5% significance level
+        critical = result.critical_values[list(result.significance_level).index(5.0)]
+        rows.append((w, p, result.statistic, critical))
+    return rows
+
+def _k2_from_moments(n, skew, kurt):
+    '''
+    D'Agostino-Pearson K^2 statistic and p-value from sample size, skewness
+    and (Pearson) kurtosis, with the same transformations as scipy.stats.normaltest.
+    '''
+    # Skewness test
+    y = skew * np.sqrt(((n + 1) * (n + 3)) / (6.0 * (n - 2)))
+    beta2 = (3.0 * (n**2 + 27*n - 70) * (n + 1) * (n + 3)) / ((n - 2.0) * (n + 5) * (n + 7) * (n + 9))
+    w2 = -1 + np.sqrt(2 * (beta2 - 1))
+    delta = 1 / np.sqrt(0.5 * np.log(w2))
+    alpha = np.sqrt(2.0 / (w2 - 1))
+    y = np.where(y == 0, 1, y)
+    z_skew = delta * np.log(y / alpha + np.sqrt((y / alpha)**2 + 1))
+
+    # Kurtosis test
+    e = 3.0 * (n - 1) / (n + 1)
+    var = 24.0 * n * (n - 2) * (n - 3) / ((n + 1)**2 * (n + 3) * (n + 5))
+    x = (kurt - e) / np.sqrt(var)
+    sqrt_beta1 = 6.0 * (n*n - 5*n + 2) / ((n + 7) * (n + 9)) * np.sqrt((6.0 * (n + 3) * (n + 5)) / (n * (n - 2) * (n - 3)))
+    a = 6.0 + 8.0 / sqrt_beta1 * (2.0 / sqrt_beta1 + np.sqrt(1 + 4.0 / (sqrt_beta1**2)))
+    term1 = 1 - 2 / (9.0 * a)
+    denom = 1 + x * np.sqrt(2 / (a - 4.0))
+    term2 = np.sign(denom) * np.where(denom == 0, np.nan, ((1 - 2.0 / a) / np.abs(denom))**(1 / 3.0))
+    z_kurt = (term1 - term2) / np.sqrt(2 / (9.0 * a))
+
+    k2 = z_skew**2 + z_kurt**2
+    return k2, stats.chi2.sf(k2, 2)
+
+###################################
+# Public function
+###################################
+
+def pearson(data, p_values=False, block_rows=BLOCK_ROWS):
+    '''
+    Pearson correlation matrix of the columns of data (DataFrame or 2-d
+    array, observations in rows). With p_values, returns (corr, p).
+    Rows with a missing value in any column are dropped.
+    '''
+    labels, x = _as_matrix(data)
+    x = x[np.isfinite(x).all(axis=1)]
+    n = len(x)
+    cov = _gram(x - x.mean(axis=0), block_rows) / (n - 1)
+    corr = _corr_from_cov(cov)
+    if not p_values:
+        return _labelled(corr, labels)
+    return _labelled(corr, labels), _labelled(_p_values(corr, n), labels)
+
+def spearman(data, p_values=False, block_rows=BLOCK_ROWS):
+    '''Spearman rank correlation matrix: every column is ranked once, then pearson'''
+    labels, x = _as_matrix(data)
+    x = x[np.isfinite(x).all(axis=1)]
+    ranks = stats.rankdata(x, axis=0)
+    return pearson(pd.DataFrame(ranks, columns=labels), p_values, block_rows)
+
+def normality_tests(data, n_jobs=1, batch=32, alpha=0.05):
+    '''
+    Shapiro-Wilk, D'Agostino K^2 and Anderson-Darling tests of every column.
+
+    Returns a DataFrame indexed by column with each statistic, the p-values,
+    the Anderson-Darling 5% critical value and whether each test finds the
+    column normal at level alpha (Anderson-Darling always at 5%).
+    '''
+    labels, x = _as_matrix(data)
+
+    # K^2 is vectorized over columns by scipy; nan are omitted per column
+    k2, k2_p = stats.normaltest(x, axis=0, nan_policy='omit')
+    k2, k2_p = np.ma.filled(k2, np.nan), np.ma.filled(k2_p, np.nan)
+
+    columns = [x[:, j] for j in range(x.shape[1])]
+    batches = [columns[i:i+batch] for i in range(0, len(columns), batch)]
+    if n_jobs == 1:
+        results = [_shapiro_anderson(b) for b in batches]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            results = list(executor.map(_shapiro_anderson, batches))
+    shapiro_w, shapiro_p, ad_stat, ad_critical = np.array([r for b in results for r in b]).T
+
+    table = pd.DataFrame({
+        'shapiro_stat': shapiro_w, 'shapiro_p': shapiro_p,
+        'normaltest_stat': k2, 'normaltest_p': k2_p,
+        'anderson_stat': ad_stat, 'anderson_critical_5pct': ad_critical,
+    }, index=labels)
+    table['shapiro_normal'] = table['shapiro_p'] > alpha
+    table['normaltest_normal'] = table['normaltest_p'] > alpha
+    table['anderson_normal'] = table['anderson_stat'] < table['anderson_critical_5pct']
+    return table
+
+class RunningMoments:
+    '''
+    Streaming moments of p variables, updated one chunk of rows at a time.
+
+    Chunks are merged with the pairwise update of Chan et al. / Pebay, so the
+    result equals the one-pass statistics of all rows seen, up to rounding.
+    Missing values are not supported: drop or fill them before update().
+    '''
+
+    def __init__(self, labels=None):
+        self.labels = labels
+        self.n = 0
+        self.mean = None
+        self.m2 = self.m3 = self.m4 = None
+        self.comoment = None
+
+    def update(self, chunk):
+        '''Add a chunk (DataFrame or array, rows are observations)'''
+        labels, x = _as_matrix(chunk)
+        if self.labels is None:
+            self.labels = labels
+        n_b = len(x)
+        if n_b == 0:
+            return self
+        mean_b = x.mean(axis=0)
+        d = x - mean_b
+        m2_b, m3_b, m4_b = (d**2).sum(axis=0), (d**3).sum(axis=0), (d**4).sum(axis=0)
+        c_b = _gram(d, BLOCK_ROWS)
+
+        if self.n == 0:
+            self.n, self.mean = n_b, mean_b
+            self.m2, self.m3, self.m4, self.comoment = m2_b, m3_b, m4_b, c_b
+            return self
+
+        n_a, n = self.n, self.n + n_b
+        delta = mean_b - self.mean
+        m2_a, m3_a = self.m2, self.m3
+        self.m4 = (self.m4 + m4_b
+                   + delta**4 * n_a * n_b * (n_a**2 - n_a*n_b + n_b**2) / n**3
+                   + 6 * delta**2 * (n_a**2 * m2_b + n_b**2 * m2_a) / n**2
+                   + 4 * delta * (n_a * m3_b - n_b * m3_a) / n)
+        self.m3 = (m3_a + m3_b
+                   + delta**3 * n_a * n_b * (n_a - n_b) / n**2
+                   + 3 * delta * (n_a * m2_b - n_b * m2_a) / n)
+        self.m2 = m2_a + m2_b + delta**2 * n_a * n_b / n
+        self.comoment = self.comoment + c_b + np.outer(delta, delta) * n_a * n_b / n
+        self.mean = self.mean + delta * n_b / n
+        self.n = n
+        return self
+
+    def _series(self, values):
+        return pd.Series(values, index=self.labels)
+
+    def variance(self, ddof=1):
+        return self._series(self.m2 / (self.n - ddof))
+
+    def skewness(self):
+        '''Biased sample skewness, as scipy.stats.skew'''
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self._series(np.sqrt(self.n) * self.m3 / self.m2**1.5)
+
+    def kurtosis(self, fisher=True):
+        '''Biased sample kurtosis, as scipy.stats.kurtosis'''
+        with np.errstate(divide='ignore', invalid='ignore'):
+            kurt = self.n * self.m4 / self.m2**2
+        return self._series(kurt - 3 if fisher else kurt)
+
+    def pearson(self):
+        return _labelled(_corr_from_cov(self.comoment / (self.n - 1)), self.labels)
+
+    def normaltest(self):
+        '''D'Agostino K^2 statistic and p-value of every variable, from the running moments'''
+        k2, p = _k2_from_moments(self.n, self.skewness().values, self.kurtosis(fisher=False).values)
+        return pd.DataFrame({'normaltest_stat': k2, 'normaltest_p': p}, index=self.labels)
+
+if __name__ == '__main__':
+    target = sys.argv[1] if len(sys.argv) > 1 else 'cumulative'
+
+    if target == 'cumulative':
+        files = sorted(glob.glob('../dash-2019-coronavirus/cumulative_data/*.csv'))
+        series = [pd.read_csv(f, usecols=['date_day', 'New']).drop_duplicates('date_day').set_index('date_day')['New']
+                  for f in files]
+        daily = pd.concat(series, axis=1, keys=[os.path.basename(f)[:-4] for f in files]).sort_index().fillna(0)
+        daily = daily.loc[:, daily.std() > 0]
+
+        corr, p = pearson(daily, p_values=True)
+        rho = spearman(daily)
+        tests = normality_tests(daily, n_jobs=os.cpu_count())
+        upper = np.triu_indices(len(corr), k=1)
+        print('{} regions x {} days, {} pairs'.format(daily.shape[1], daily.shape[0], len(upper[0])))
+        print('Median Pearson r {:.3f}, Spearman rho {:.3f}; {:.1%} of pairs significant at 5%'.format(
+            np.nanmedian(corr.values[upper]), np.nanmedian(rho.values[upper]), (p.values[upper] < 0.05).mean()))
+        print(tests[['shapiro_normal', 'normaltest_normal', 'anderson_normal']].mean().rename('share normal'))
+    else:
+        rows = []
+        for f in sorted(glob.glob('../matplotlib_sydney_temp/*-max-tmp.csv')):
+            city = RunningMoments([os.path.basename(f)[:-len('-max-tmp.csv')]])
+            for chunk in pd.read_csv(f, usecols=['Maximum temperature (Degree C)'], chunksize=10000):
+                city.update(chunk.dropna())
+            rows.append(pd.concat([pd.Series(city.mean, index=city.labels, name='mean'), city.variance().rename('variance'),
+                                   city.skewness().rename('skewness'), city.kurtosis().rename('kurtosis'),
+                                   city.normaltest()], axis=1))
+        print(pd.concat(rows).round(3))
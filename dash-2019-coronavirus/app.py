@@ -5,6 +5,7 @@ from datetime import datetime, timedelta
 import math
 import os
 import base64
+from functools import lru_cache
 
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
@@ -12,39 +13,41 @@ import plotly.express as px
 
 import dash
 import dash_table
-from dash_table.Format import Format
+from dash_table.Format import Format, Scheme
 import dash_table.FormatTemplate as FormatTemplate
 import dash_core_components as dcc
 import dash_html_components as html
 import dash_daq as daq
 import dash_bootstrap_components as dbc
 from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
+
+from trajectory import Trajectories
+from instrument import instrument
+from rollup import default_rollups
+from metrics import derive_levels, add_metrics
+from asof import SnapshotHistory
+from frames import MapFrames, add_animation
+from series import SeriesStore
+from growth import GrowthEstimator
+from search import GROUP_TAB, build_region_index
+from export import register_exports
 
 ###################################
 # Private function and variable
 ###################################
 
-def make_country_table(countryName):
-    '''This is the function for building df for Province/State of a given country'''
-    countryTable = df_latest.loc[df_latest['Country/Region'] == countryName]
+def make_country_table(countryName, source=None):
+    '''This is the function for building df for Province/State of a given country (from df_latest by default)'''
+    source = df_latest if source is None else source
+    countryTable = source.loc[source['Country/Region'] == countryName]
 
+    # Suppress SettingWithCopyWarning
+    pd.options.mode.chained_assignment = None
+    # Derived metrics are already in df_latest (see metrics.py)
     if countryName == 'Australia':
-        # Suppress SettingWithCopyWarning
-        pd.options.mode.chained_assignment = None
-        countryTable['Active'] = countryTable['Confirmed'] - countryTable['Recovered'] - countryTable['Deaths']
-        countryTable['Death rate'] = countryTable['Deaths']/countryTable['Confirmed']
-        countryTable['Confirmed/100k'] = ((countryTable['Confirmed']/countryTable['Population'])*100000).round()
-        countryTable['Positive rate'] = countryTable['Confirmed']/countryTable['Tests']
-        countryTable['Tests/100k'] = ((countryTable['Tests']/countryTable['Population'])*100000).round()
-
         countryTable = countryTable[['Province/State', 'Active', 'Confirmed', 'Recovered', 'Deaths', 'Death rate', 'Tests','Positive rate', 'Tests/100k', 'Confirmed/100k', 'lat', 'lon','Population']]
     else:
-        # Suppress SettingWithCopyWarning
-        pd.options.mode.chained_assignment = None
-        countryTable['Active'] = countryTable['Confirmed'] - countryTable['Recovered'] - countryTable['Deaths']
-        countryTable['Death rate'] = countryTable['Deaths']/countryTable['Confirmed']
-        countryTable['Confirmed/100k'] = ((countryTable['Confirmed']/countryTable['Population'])*100000).round()
-
         countryTable = countryTable[['Province/State', 'Active', 'Confirmed', 'Recovered', 'Deaths', 'Death rate', 'Confirmed/100k', 'lat', 'lon']]
     countryTable = countryTable.sort_values(by=['Active', 'Confirmed'], ascending=False).reset_index(drop=True)
     # Set row ids pass to selected_row_ids
@@ -60,8 +63,6 @@ def make_Brazil_table(countrydata):
     # Suppress SettingWithCopyWarning
     pd.options.mode.chained_assignment = None
     countryTable = countrydata
-    countryTable['Death rate'] = countryTable['Deaths']/countryTable['Confirmed']
-    countryTable['Confirmed/100k'] = ((countryTable['Confirmed']/countryTable['Population'])*100000).round()
 
     countryTable = countryTable[['Province/State', 'Confirmed', 'Deaths', 'Death rate', 'Confirmed/100k', 'lat', 'lon','Population']]
 
@@ -74,11 +75,219 @@ def make_Brazil_table(countrydata):
 
     return countryTable
 
-def make_continent_table(continent_list):
-    '''This is the function for building df for Europe countries'''
-    continent_table = WorldwildTable.loc[WorldwildTable['Country/Region'].isin(continent_list)]
+def make_continent_table(continent_list, source=None):
+    '''This is the function for building df for Europe countries (from WorldwildTable by default)'''
+    source = WorldwildTable if source is None else source
+    continent_table = source.loc[source['Country/Region'].isin(continent_list)]
     return continent_table
 
+def make_world_table(countryData):
+    '''This is the function for building the Worldwide table from per-country sums with metrics'''
+    # Rearrange columns to correspond to the number plate order
+    worldTable = countryData[['Country/Region', 'Active',
+        'Confirmed', 'Recovered', 'Deaths', 'Critical', 'Death rate', 'Tests', 'Positive rate', 'Tests/100k', 'Confirmed/100k', 'lat', 'lon','Population']]
+    # Sort value based on Active cases and then Confirmed cases
+    worldTable = worldTable.sort_values(
+        by=['Confirmed'], ascending=False).reset_index(drop=True)
+    # Set row ids pass to selected_row_ids
+    worldTable['id'] = worldTable['Country/Region']
+    worldTable.set_index('id', inplace=True, drop=False)
+    return worldTable
+
+def use_full_names(table):
+    '''Use full country names'''
+    return table.replace({'Country/Region': FULL_NAMES})
+
+def is_latest_day(day):
+    return day is None or day >= len(snapshot_history.days) - 1
+
+@lru_cache(maxsize=32)
+def make_asof_places(day):
+    '''df_latest as of the last snapshot of snapshot_history.days[day] (the latest data for None)'''
+    if is_latest_day(day):
+        return df_latest
+    places = add_metrics(snapshot_history.places(snapshot_history.locate_day(snapshot_history.days[day])))
+    # Same as df_latest: no row without cases or coordinates
+    return places[(places['Confirmed'] > 0) & places['lat'].notnull()]
+
+@lru_cache(maxsize=32)
+def make_asof_tables(day):
+    '''{tab: table} of the location tables as of snapshot_history.days[day]; Brazil and Germany have no history'''
+    if is_latest_day(day):
+        tables = {'Worldwide': WorldwildTable, 'Australia': AustraliaTable, 'Canada': CanadaTable,
+                  'Mainland China': MainlandChinaTable, 'United States': UnitedStatesTable}
+        tables.update({continent: table_dict['{}Table'.format(continent.replace(' ', ''))] for continent in list_dict})
+        return tables
+    i = snapshot_history.locate_day(snapshot_history.days[day])
+    places = add_metrics(snapshot_history.places(i))
+    countries = snapshot_history.countries(i).replace({'Country/Region': 'China'}, 'Mainland China')
+    countries['Tests'] = countries['Tests'].where(countries['Tests'] > 0)
+    asof = snapshot_history.days[day]
+    worldTable = add_growth_columns(make_world_table(add_metrics(countries)), day=asof, countries=rollups.countries)
+    tables = {'Worldwide': use_full_names(worldTable)}
+    for tab, country in [('Australia', 'Australia'), ('Canada', 'Canada'), ('Mainland China', 'China'), ('United States', 'US')]:
+        tables[tab] = add_growth_columns(make_country_table(country, places).dropna(subset=['Province/State']), day=asof)
+    for continent, countryList in list_dict.items():
+        tables[continent] = use_full_names(make_continent_table(countryList, worldTable))
+    return tables
+
+def make_asof_plates(day):
+    '''(active, confirmed, recovered, deaths) plate contents as of snapshot_history.days[day]'''
+    if is_latest_day(day):
+        return [(remainCases, plusRemainNum, plusRemainNum3), (confirmedCases, plusConfirmedNum, plusPercentNum1),
+                (recoveredCases, plusRecoveredNum, plusPercentNum2), (deathsCases, plusDeathNum, plusPercentNum3)]
+    i = snapshot_history.locate_day(snapshot_history.days[day])
+    # 24-hour window case difference against the last snapshot a day earlier
+    j = snapshot_history.locate(snapshot_history.times[i] - timedelta(days=1))
+    plates = []
+    for snapshot in (i, j):
+        total = snapshot_history.countries(snapshot)[['Confirmed', 'Recovered', 'Deaths']].sum()
+        plates.append([total['Confirmed'] - total['Recovered'] - total['Deaths'],
+                       total['Confirmed'], total['Recovered'], total['Deaths']])
+    return [(int(now), int(now - before), (now - before) / before if before else 0)
+            for now, before in zip(*plates)]
+
+def load_region_data(Region):
+    '''Cumulative data of a region; custom groups (EU, G7, ...) are rolled up from countries'''
+    if Region in rollups:
+        return rollups.series(Region)
+    return pd.read_csv('./cumulative_data/{}.csv'.format(Region))
+
+def selected_regions(value, *selected_row_ids):
+    '''Regions of the picked rows of the shown tab, from the selected_row_ids of every table in input_list order'''
+    ids = dict(zip(TABLE_TABS, selected_row_ids)).get(value) or []
+    return ['China' if i == 'Mainland China' else i for i in ids[:MAX_OVERLAY]]
+
+def overlay_scatter(n):
+    '''Scatter trace type for n overlaid regions: WebGL once there are many'''
+    return go.Scattergl if n > WEBGL_OVERLAY else go.Scatter
+
+def make_overlay_lineplot(Regions):
+    '''Confirmed cases of several regions in one figure, from one batched retrieval (see series.py)'''
+    days, found, values = region_series.batch(Regions, ['Confirmed'])
+    Scatter = overlay_scatter(len(found))
+    fig = go.Figure()
+    for i, Region in enumerate(found):
+        fig.add_trace(Scatter(x=days,
+                              y=values[0, i],
+                              mode='lines',
+                              name=Region,
+                              line=dict(color=OVERLAY_COLORS[i % len(OVERLAY_COLORS)], width=2),
+                              hovertemplate='%{y:,.0f}'))
+    fig.update_layout(
+        margin=go.layout.Margin(l=10, r=10, b=10, t=5, pad=0),
+        yaxis_title="Cumulative confirmed cases",
+        yaxis=dict(
+            showline=False, linecolor='#272e3e',
+            zeroline=False,
+            gridcolor='rgba(203, 210, 211,.3)',
+            gridwidth=.1,
+        ),
+        xaxis_title="Select locations from the table (Toggle the legend to see specific curves)",
+        xaxis=dict(
+            showline=False, linecolor='#272e3e',
+            showgrid=False,
+            zeroline=False
+        ),
+        xaxis_tickformat='%b %d',
+        hovermode='x unified',
+        legend_orientation="h",
+        legend=dict(x=.02, y=1.15, bgcolor="rgba(0,0,0,0)",),
+        plot_bgcolor='#ffffff',
+        paper_bgcolor='#ffffff',
+        font=dict(color='#292929', size=10)
+    )
+    return fig
+
+def add_overlay_curves(fig_curve, curves, Regions, case_label='cases'):
+    '''
+    Trajectories of several regions (curves: dfs_curve or dfs_curve_death), from one batched retrieval;
+    case_label names the counts in the hover text ('cases' or 'death cases')
+    '''
+    found, values = curves.batch(Regions)
+    Scatter = overlay_scatter(len(found))
+    day = np.arange(1, values.shape[1] + 1)
+    for i, Region in enumerate(found):
+        color = OVERLAY_COLORS[i % len(OVERLAY_COLORS)]
+        last = np.flatnonzero(~np.isnan(values[i]))[-1]
+        fig_curve.add_trace(Scatter(x=day[:last+1],
+                                    y=values[i, :last+1],
+                                    mode='lines',
+                                    name=Region,
+                                    line=dict(color=color, width=2),
+                                    text=[Region] * (last + 1),
+                                    hovertemplate='<b>%{text}</b><br>' +
+                                                  '<br>%{x} days after the threshold<br>' +
+                                                  'with %{y:,d} ' + case_label + ' in total<br>'
+                                                  '<extra></extra>'))
+        fig_curve.add_trace(Scatter(x=[day[last]],
+                                    y=[values[i, last]],
+                                    mode='markers',
+                                    marker=dict(size=7, color=color, line=dict(width=1, color=color)),
+                                    text=[Region],
+                                    hovertemplate='<b>%{text}</b><br>' +
+                                                  '<br>%{x} days after the threshold<br>' +
+                                                  'with %{y:,d} ' + case_label + ' in total<br>'
+                                                  '<extra></extra>'))
+    return fig_curve
+
+def add_smoothed_traces(fig_daily, Region):
+    '''Smoothed daily cases of a region over its daily plot, precomputed for all regions (see series.py)'''
+    if Region not in region_series:
+        return fig_daily
+    for kind, label, dash, visible in SMOOTHED_SERIES:
+        days, _, values = region_series.batch([Region], kind=kind)
+        for i, (case_type, color) in enumerate(SMOOTHED_COLORS):
+            fig_daily.add_trace(go.Scatter(x=days,
+                                           y=values[i, 0],
+                                           mode='lines',
+                                           name='{} ({})'.format(case_type, label),
+                                           line=dict(color=color, width=2, dash=dash),
+                                           visible=visible,
+                                           hovertemplate='{} {}: %{{y:,.1f}}<extra></extra>'.format(case_type, label)))
+    return fig_daily
+
+def make_table_columns(dataframe):
+    '''DataTable columns of a table: all but the coordinates, population and row id'''
+    return [{"name": i, "id": i} for i in dataframe.columns[0:1]] + [
+        {"name": i, "id": i, "type": "numeric", "format": TABLE_FORMATS.get(i, Format(group=','))}
+            for i in dataframe.columns[1:] if i not in ['lat', 'lon', 'Population', 'id']]
+
+def add_growth_columns(table, day=None, countries=None):
+    '''Growth rate and doubling time of the rows of a table (by row id) as of a day (the latest by default), before lat'''
+    regions = ['China' if i == 'Mainland China' else i for i in table['id']]
+    rates = growth.latest(regions, day=day)
+    if countries is not None:
+        # Country tables: a region file of the same name can be a state (Georgia)
+        rates[~rates.index.isin(countries)] = np.nan
+    table = table.copy()
+    at = list(table.columns).index('lat')
+    table.insert(at, 'Growth rate', rates['Growth rate'].values)
+    table.insert(at + 1, 'Doubling time', rates['Doubling time'].values)
+    return table
+
+def add_fitted_line(fig_curve, curves, Region, case_type):
+    '''Current exponential growth of a region on its trajectory plot: the fit of its last days, projected ahead'''
+    fit = growth.fit(Region, case_type)
+    if Region not in curves or fit is None:
+        return fig_curve
+    slope, fitted = fit
+    last = curves.get(Region)[0][0]
+    day = np.arange(max(last - growth.window + 1, 1), last + FIT_PROJECTION + 1)
+    doubling = 'Doubles every {:.1f} days'.format(np.log(2) / slope) if slope > 0 else 'Not growing'
+    fig_curve.add_trace(go.Scatter(x=day,
+                                   y=fitted * np.exp(slope * (day - last)),
+                                   mode='lines',
+                                   name='Current growth',
+                                   line=dict(color='rgba(0, 0, 0, .5)', width=1.5, dash='dot'),
+                                   text=['{}: {:.1%} growth per day'.format(Region, np.expm1(slope)) for i in day],
+                                   hovertemplate='<b>%{text}</b><br>' +
+                                                 doubling + '<br>' +
+                                                 '<extra></extra>'
+                            )
+    )
+    return fig_curve
+
 def make_dcc_Brazil_tab(countryName, dataframe):
     '''This is for generating tab component for country table'''
     return dcc.Tab(
@@ -91,15 +300,11 @@ def make_dcc_Brazil_tab(countryName, dataframe):
             dash_table.DataTable(
                 id='datatable-interact-location-{}'.format(countryName),
                 # Don't show coordinates
-                columns=[{"name": 'Province/State', "id": 'Province/State'}
-                            for i in dataframe.columns[0:1]] +
-                        [{"name": i, "id": i, "type": "numeric","format": FormatTemplate.percentage(2)}
-                            if i == 'Death rate' else {"name": i, "id": i, 'type': 'numeric', 'format': Format(group=',')}
-                                for i in dataframe.columns[1:5]],
+                columns=make_table_columns(dataframe),
                 # But still store coordinates in the table for interactivity
                 data=dataframe.to_dict("rows"),
                 #css= [{'selector': 'tr:hover', 'rule': 'background-color: #2674f6;'}],
-                row_selectable="single",
+                row_selectable="multi",
                 sort_action="native",
                 style_as_list_view=True,
                 style_cell={'font_family': 'Roboto',
@@ -139,16 +344,11 @@ def make_dcc_country_tab(countryName, dataframe):
                     dash_table.DataTable(
                         id='datatable-interact-location-{}'.format(countryName),
                         # Don't show coordinates
-                        columns=[{"name": 'Province/State', "id": 'Province/State'}
-                                    if i == 'Province/State' else {"name": 'Country/Region', "id": 'Country/Region'}
-                                        for i in dataframe.columns[0:1]] +
-                                [{"name": i, "id": i, "type": "numeric","format": FormatTemplate.percentage(2)}
-                                    if i == 'Death rate' or i == 'Positive rate' else {"name": i, "id": i, 'type': 'numeric', 'format': Format(group=',')}
-                                        for i in dataframe.columns[1:10]],
+                        columns=make_table_columns(dataframe),
                         # But still store coordinates in the table for interactivity
                         data=dataframe.to_dict("rows"),
                         #css= [{'selector': 'tr:hover', 'rule': 'background-color: #2674f6;'}],
-                        row_selectable="single",
+                        row_selectable="multi",
                         sort_action="native",
                         style_as_list_view=True,
                         style_cell={'font_family': 'Roboto',
@@ -193,16 +393,11 @@ def make_dcc_country_tab(countryName, dataframe):
                     dash_table.DataTable(
                         id='datatable-interact-location-{}'.format(countryName),
                         # Don't show coordinates
-                        columns=[{"name": 'Province/State', "id": 'Province/State'}
-                                    if i == 'Province/State' else {"name": 'Country/Region', "id": 'Country/Region'}
-                                        for i in dataframe.columns[0:1]] +
-                                [{"name": i, "id": i, "type": "numeric","format": FormatTemplate.percentage(2)}
-                                    if i == 'Death rate' or i == 'Positive rate' else {"name": i, "id": i, 'type': 'numeric', 'format': Format(group=',')}
-                                        for i in dataframe.columns[1:11]],
+                        columns=make_table_columns(dataframe),
                         # But still store coordinates in the table for interactivity
                         data=dataframe.to_dict("rows"),
                         #css= [{'selector': 'tr:hover', 'rule': 'background-color: #2674f6;'}],
-                        row_selectable="single",
+                        row_selectable="multi",
                         sort_action="native",
                         style_as_list_view=True,
                         style_cell={'font_family': 'Roboto',
@@ -247,16 +442,11 @@ def make_dcc_country_tab(countryName, dataframe):
                     dash_table.DataTable(
                         id='datatable-interact-location-{}'.format(countryName),
                         # Don't show coordinates
-                        columns=[{"name": 'Province/State', "id": 'Province/State'}
-                                    if i == 'Province/State' else {"name": 'Country/Region', "id": 'Country/Region'}
-                                        for i in dataframe.columns[0:1]] +
-                                [{"name": i, "id": i, "type": "numeric","format": FormatTemplate.percentage(2)}
-                                    if i == 'Death rate' else {"name": i, "id": i, 'type': 'numeric', 'format': Format(group=',')}
-                                        for i in dataframe.columns[1:7]],
+                        columns=make_table_columns(dataframe),
                         # But still store coordinates in the table for interactivity
                         data=dataframe.to_dict("rows"),
                         #css= [{'selector': 'tr:hover', 'rule': 'background-color: #2674f6;'}],
-                        row_selectable="single",
+                        row_selectable="multi",
                         sort_action="native",
                         style_as_list_view=True,
                         style_cell={'font_family': 'Roboto',
@@ -298,8 +488,8 @@ def render_region_map(countyrdata, dff, latitude, longitude, zoom):
                             for h, i, j, k in zip(
                                 countyrdata['Confirmed'],
                                 countyrdata['Deaths'], 
-                                countyrdata['Deaths']/countyrdata['Confirmed'], 
-                                countyrdata['Confirmed']*100000/countyrdata['Population']
+                                countyrdata['Death rate'],
+                                countyrdata['Confirmed/100k']
                             )
     ]
 
@@ -384,6 +574,28 @@ input_list = [
     Input('datatable-interact-location-United States', 'selected_row_ids'),
 ]
 
+# Tabs of the location tables, in input_list order
+TABLE_TABS = ['Worldwide', 'Asia', 'Oceania', 'North America', 'South America', 'Africa', 'Europe',
+              'Australia', 'Brazil', 'Canada', 'Germany', 'Mainland China', 'United States']
+# DataTable of every tab
+TABLE_IDS = {tab: 'datatable-interact-location' + ('' if tab == 'Worldwide' else '-' + tab) for tab in TABLE_TABS}
+# Overlay of picked rows: at most MAX_OVERLAY regions, drawn with WebGL above WEBGL_OVERLAY
+MAX_OVERLAY = 20
+WEBGL_OVERLAY = 8
+OVERLAY_COLORS = px.colors.qualitative.Dark24
+# Smoothed lines of the daily plot: (kind of series.py, legend label, dash, visibility); the
+# 14-day and weighted means are switched on from the legend
+SMOOTHED_SERIES = [('mean7', '7-day mean', 'solid', True), ('mean14', '14-day mean', 'dash', 'legendonly'),
+                   ('ewm', 'weighted mean', 'dot', 'legendonly')]
+SMOOTHED_COLORS = [('Confirmed', '#921113'), ('Recovered', '#0f5c14'), ('Deaths', '#292929')]
+# Formats of the numeric table columns other than counts
+TABLE_FORMATS = {'Death rate': FormatTemplate.percentage(2), 'Positive rate': FormatTemplate.percentage(2),
+                 'Growth rate': FormatTemplate.percentage(1), 'Doubling time': Format(precision=1, scheme=Scheme.fixed)}
+# Days the fitted growth line of the trajectory plots runs past the last day
+FIT_PROJECTION = 7
+# Matches of the region search sent to the browser
+SEARCH_LIMIT = 10
+
 ################################################################################
 # Data processing
 ################################################################################
@@ -458,23 +670,13 @@ dfGPS = dfGPS[['Country/Region', 'lat', 'lon']]
 # Merge two dataframes
 WorldwildTable = pd.merge(dfCase, dfGPS, how='inner', on='Country/Region')
 WorldwildTable = WorldwildTable.replace({'Country/Region': 'China'}, 'Mainland China')
-WorldwildTable['Active'] = WorldwildTable['Confirmed'] - WorldwildTable['Recovered'] - WorldwildTable['Deaths']
-WorldwildTable['Death rate'] = WorldwildTable['Deaths']/WorldwildTable['Confirmed']
-WorldwildTable['Confirmed/100k'] = ((WorldwildTable['Confirmed']/WorldwildTable['Population'])*100000).round()
-WorldwildTable['Positive rate'] = WorldwildTable['Confirmed']/WorldwildTable['Tests']
-WorldwildTable['Tests/100k'] = ((WorldwildTable['Tests']/WorldwildTable['Population'])*100000).round()
-# Rearrange columns to correspond to the number plate order
-WorldwildTable = WorldwildTable[['Country/Region', 'Active',
-    'Confirmed', 'Recovered', 'Deaths', 'Critical', 'Death rate', 'Tests', 'Positive rate', 'Tests/100k', 'Confirmed/100k', 'lat', 'lon','Population']]
-# Sort value based on Active cases and then Confirmed cases
-WorldwildTable = WorldwildTable.sort_values(
-    by=['Confirmed'], ascending=False).reset_index(drop=True)
-# Set row ids pass to selected_row_ids
-WorldwildTable['id'] = WorldwildTable['Country/Region']
-WorldwildTable.set_index('id', inplace=True, drop=False)
+# No test count reported shows as an empty cell
+WorldwildTable['Tests'] = WorldwildTable['Tests'].where(WorldwildTable['Tests'] > 0)
 
-# Replace 0s in 'Tests' column as ''
-WorldwildTable = WorldwildTable.replace({'Tests': 0, 'Positive rate':0, 'Tests/100k':0}, '')
+# Derived metrics (Active, Death rate, per 100k, Positive rate) of every table in one pass (see metrics.py)
+df_latest, df_brazil, df_germany, WorldwildTable = derive_levels(
+    [df_latest, df_brazil, df_germany, WorldwildTable], version=sheet_name[0])
+WorldwildTable = make_world_table(WorldwildTable)
 
 # Create tables for tabs
 MainlandChinaTable = make_country_table('China')
@@ -508,37 +710,49 @@ for i in df_latest.Continent.unique():
 
   table_dict['{}Table'.format(i.replace(' ', ''))] = make_continent_table(list_dict[i])
 
+# Series of every region for overlays of several picked rows (see series.py)
+region_series = SeriesStore()
+# Custom group series (EU, G7, ...) summed from the country series of the store (see rollup.py)
+rollups = default_rollups(df_latest, store=region_series)
+region_series.rollups = rollups
+
+# Current growth rate and doubling time of every region in the tables (see growth.py)
+growth = GrowthEstimator.from_series(region_series)
+WorldwildTable = add_growth_columns(WorldwildTable, countries=rollups.countries)
+table_dict = {name: add_growth_columns(table, countries=rollups.countries) for name, table in table_dict.items()}
+MainlandChinaTable = add_growth_columns(MainlandChinaTable)
+AustraliaTable = add_growth_columns(AustraliaTable)
+UnitedStatesTable = add_growth_columns(UnitedStatesTable)
+CanadaTable = add_growth_columns(CanadaTable)
+BrazilTable = add_growth_columns(BrazilTable)
+GermanyTable = add_growth_columns(GermanyTable)
+
 # Use full country names
-WorldwildTable = WorldwildTable.replace({'Country/Region': 'US'}, 'United States')
-WorldwildTable = WorldwildTable.replace({'Country/Region': 'UK'}, 'United Kingdom')
-WorldwildTable = WorldwildTable.replace({'Country/Region': 'DRC'}, 'Dem. Rep. Congo')
-WorldwildTable = WorldwildTable.replace({'Country/Region': 'CAR'}, 'Central African Rep.')
-table_dict['AfricaTable'] = table_dict['AfricaTable'].replace({'Country/Region': 'CAR'}, 'Central African Rep.')
-table_dict['AfricaTable'] = table_dict['AfricaTable'].replace({'Country/Region': 'DRC'}, 'Dem. Rep. Congo')
-table_dict['EuropeTable'] = table_dict['EuropeTable'].replace({'Country/Region': 'UK'}, 'United Kingdom')
-table_dict['NorthAmericaTable'] = table_dict['NorthAmericaTable'].replace({'Country/Region': 'US'}, 'United States')
+FULL_NAMES = {'US': 'United States', 'UK': 'United Kingdom', 'DRC': 'Dem. Rep. Congo', 'CAR': 'Central African Rep.'}
+WorldwildTable = use_full_names(WorldwildTable)
+table_dict = {name: use_full_names(table) for name, table in table_dict.items()}
+
+# Every snapshot of ./raw_data/ for the date slider, with the places of df_latest (see asof.py)
+snapshot_history = SnapshotHistory(reference=df_latest)
+# Location tabs that follow the date slider (Brazil and Germany have no snapshots)
+ASOF_TABS = list(list_dict) + ['Australia', 'Canada', 'Mainland China', 'United States']
+# Custom groups of the group selector and the region search
+GROUPS = rollups.groupings['custom'][0]
+# Day-by-day map animation frames, built on the first play and encoded once per tab (see frames.py)
+map_frames = MapFrames(snapshot_history)
+# Typeahead index over every country, province/state and continent of the tables (see search.py)
+region_index = build_region_index(dict(make_asof_tables(None), Brazil=BrazilTable, Germany=GermanyTable),
+                                  groups={group: rollups.series(group)['Confirmed'].iloc[0] for group in GROUPS})
 
 # Save numbers into variables to use in the app
 latestDate = datetime.strftime(df_confirmed['Date'][0], '%b %d, %Y %H:%M GMT+10')
 secondLastDate = datetime.strftime(df_confirmed['Date'][1], '%b %d')
 daysOutbreak = (df_confirmed['Date'][0] - datetime.strptime('12/31/2019', '%m/%d/%Y')).days
 
-# # Read confirmed growth data from ./lineplot_data folder
-dfs_curve = pd.read_csv('./lineplot_data/dfs_curve.csv')
+# # Read confirmed growth data from ./lineplot_data folder (built by trajectory.py)
+dfs_curve = Trajectories.load('./lineplot_data/dfs_curve.npz')
 # Read death growth data from ./lineplot_data folder
-dfs_curve_death = pd.read_csv('./lineplot_data/dfs_curve_death.csv')
-
-# Pseduo data for logplot
-pseduoDay = np.arange(1, daysOutbreak+1)
-y1 = 100*(1.85)**(pseduoDay-1)  # 85% growth rate
-y2 = 100*(1.35)**(pseduoDay-1)  # 35% growth rate
-y3 = 100*(1.15)**(pseduoDay-1)  # 15% growth rate
-y4 = 100*(1.05)**(pseduoDay-1)  # 5% growth rate
-# Pseduo data for deathplot
-z1 = 3*(1.85)**(pseduoDay-1)  # 85% growth rate
-z2 = 3*(1.35)**(pseduoDay-1)  # 35% growth rate
-z3 = 3*(1.15)**(pseduoDay-1)  # 15% growth rate
-z4 = 3*(1.05)**(pseduoDay-1)  # 5% growth rate
+dfs_curve_death = Trajectories.load('./lineplot_data/dfs_curve_death.npz')
 
 # Remove tests/critical row for US and Canada and Australian and China
 df_latest = df_latest.drop(df_latest[df_latest['Confirmed'] == 0].index, axis=0)
@@ -728,56 +942,23 @@ fig_daily_tab.update_layout(
 # Create empty figure canvas
 fig_curve_tab = go.Figure()
 
-fig_curve_tab.add_trace(go.Scatter(x=pseduoDay,
-                                   y=y1,
-                                   line=dict(color='rgba(0, 0, 0, .3)', width=1, dash='dot'),
-                                   text=['85% growth rate' for i in pseduoDay],
-                                   hovertemplate='<b>%{text}</b><br>' +
-                                                 'Doubles every 1.1 days<br>' +
-                                                 '<extra></extra>'
-                            )
-)
-fig_curve_tab.add_trace(go.Scatter(x=pseduoDay,
-                                   y=y2,
-                                   line=dict(color='rgba(0, 0, 0, .3)', width=1, dash='dot'),
-                                   text=['35% growth rate' for i in pseduoDay],
-                                   hovertemplate='<b>%{text}</b><br>' +
-                                                 'Doubles every 2.3 days<br>' +
-                                                 '<extra></extra>'
-                            )
-)
-fig_curve_tab.add_trace(go.Scatter(x=pseduoDay,
-                                   y=y3,
-                                   line=dict(color='rgba(0, 0, 0, .3)', width=1, dash='dot'),
-                                   text=['15% growth rate' for i in pseduoDay],
-                                   hovertemplate='<b>%{text}</b><br>' +
-                                                 'Doubles every 5 days<br>' +
-                                                 '<extra></extra>'
-                            )
-)
-fig_curve_tab.add_trace(go.Scatter(x=pseduoDay,
-                                   y=y4,
-                                   line=dict(color='rgba(0, 0, 0, .3)', width=1, dash='dot'),
-                                   text=['5% growth rate' for i in pseduoDay],
-                                   hovertemplate='<b>%{text}</b><br>' +
-                                                 'Doubles every 14.2 days<br>' +
-                                                 '<extra></extra>'
-                            )
-)
+# Current worldwide growth, fitted to the last days
+add_fitted_line(fig_curve_tab, dfs_curve, 'Worldwide', 'Confirmed')
+
 for regionName in ['Worldwide', 'Japan', 'Italy', 'India', 'US']:
 
-  dotgrayx_tab = [np.array(dfs_curve.loc[dfs_curve['Region'] == regionName, 'DayElapsed'])[0]]
-  dotgrayy_tab = [np.array(dfs_curve.loc[dfs_curve['Region'] == regionName, 'Confirmed'])[0]]
+  dotgrayx_tab = [np.array(dfs_curve.frame(regionName)['DayElapsed'])[0]]
+  dotgrayy_tab = [np.array(dfs_curve.frame(regionName)['Confirmed'])[0]]
 
-  fig_curve_tab.add_trace(go.Scatter(x=dfs_curve.loc[dfs_curve['Region'] == regionName]['DayElapsed'],
-                                     y=dfs_curve.loc[dfs_curve['Region'] == regionName]['Confirmed'],
+  fig_curve_tab.add_trace(go.Scatter(x=dfs_curve.frame(regionName)['DayElapsed'],
+                                     y=dfs_curve.frame(regionName)['Confirmed'],
                                      mode='lines',
                                      line_shape='spline',
                                      name=regionName,
                                      opacity=0.3,
                                      line=dict(color='#636363', width=1.5),
                                      text=[
-                                            i for i in dfs_curve.loc[dfs_curve['Region'] == regionName]['Region']],
+                                            i for i in dfs_curve.frame(regionName)['Region']],
                                      hovertemplate='<b>%{text}</b><br>' +
                                                    '<br>%{x} days after 100 cases<br>' +
                                                    'with %{y:,d} cases<br>'
@@ -840,57 +1021,23 @@ fig_curve_tab.update_layout(
 # Create empty figure canvas
 fig_death_curve_tab = go.Figure()
 
-fig_death_curve_tab.add_trace(go.Scatter(x=pseduoDay,
-                                   y=z1,
-                                   line=dict(color='rgba(0, 0, 0, .3)', width=1, dash='dot'),
-                                   text=['85% growth rate' for i in pseduoDay],
-                                   hovertemplate='<b>%{text}</b><br>' +
-                                                 'Doubles every 1.1 days<br>' +
-                                                 '<extra></extra>'
-                            )
-)
-fig_death_curve_tab.add_trace(go.Scatter(x=pseduoDay,
-                                   y=z2,
-                                   line=dict(color='rgba(0, 0, 0, .3)', width=1, dash='dot'),
-                                   text=['35% growth rate' for i in pseduoDay],
-                                   hovertemplate='<b>%{text}</b><br>' +
-                                                 'Doubles every 2.3 days<br>' +
-                                                 '<extra></extra>'
-                            )
-)
-fig_death_curve_tab.add_trace(go.Scatter(x=pseduoDay,
-                                   y=z3,
-                                   line=dict(color='rgba(0, 0, 0, .3)', width=1, dash='dot'),
-                                   text=['15% growth rate' for i in pseduoDay],
-                                   hovertemplate='<b>%{text}</b><br>' +
-                                                 'Doubles every 5 days<br>' +
-                                                 '<extra></extra>'
-                            )
-)
-fig_death_curve_tab.add_trace(go.Scatter(x=pseduoDay,
-                                   y=z4,
-                                   line=dict(color='rgba(0, 0, 0, .3)', width=1, dash='dot'),
-                                   text=['5% growth rate' for i in pseduoDay],
-                                   hovertemplate='<b>%{text}</b><br>' +
-                                                 'Doubles every 14.2 days<br>' +
-                                                 '<extra></extra>'
-                            )
-)
+# Current worldwide growth, fitted to the last days
+add_fitted_line(fig_death_curve_tab, dfs_curve_death, 'Worldwide', 'Deaths')
 
 for regionName in ['Worldwide', 'Japan', 'Italy', 'UK', 'US']:
 
-  dotgrayx_tab_death = [np.array(dfs_curve_death.loc[dfs_curve_death['Region'] == regionName, 'DayElapsed_death'])[0]]
-  dotgrayy_tab_death = [np.array(dfs_curve_death.loc[dfs_curve_death['Region'] == regionName, 'Deaths'])[0]]
+  dotgrayx_tab_death = [np.array(dfs_curve_death.frame(regionName)['DayElapsed_death'])[0]]
+  dotgrayy_tab_death = [np.array(dfs_curve_death.frame(regionName)['Deaths'])[0]]
 
-  fig_death_curve_tab.add_trace(go.Scatter(x=dfs_curve_death.loc[dfs_curve_death['Region'] == regionName]['DayElapsed_death'],
-                                     y=dfs_curve_death.loc[dfs_curve_death['Region'] == regionName]['Deaths'],
+  fig_death_curve_tab.add_trace(go.Scatter(x=dfs_curve_death.frame(regionName)['DayElapsed_death'],
+                                     y=dfs_curve_death.frame(regionName)['Deaths'],
                                      mode='lines',
                                      line_shape='spline',
                                      name=regionName,
                                      opacity=0.3,
                                      line=dict(color='#636363', width=1.5),
                                      text=[
-                                            i for i in dfs_curve_death.loc[dfs_curve_death['Region'] == regionName]['Region']],
+                                            i for i in dfs_curve_death.frame(regionName)['Region']],
                                      hovertemplate='<b>%{text}</b><br>' +
                                                    '<br>%{x} days since 3rd death cases<br>' +
                                                    'with %{y:,d} death cases<br>'
@@ -1021,6 +1168,13 @@ app.index_string = """<!DOCTYPE html>
 
 server = app.server
 
+# Read-only CSV/JSON Lines/Arrow export of the region series and snapshots under /api (see export.py)
+register_exports(server, region_series, snapshot_history)
+
+# Callback timing/payload histograms on /metrics (see instrument.py)
+if os.environ.get('DASH_METRICS'):
+    instrument(app, trace_dir=os.environ.get('DASH_TRACE_DIR'))
+
 app.config['suppress_callback_exceptions'] = True # This is to prevent app crash when loading since we have plot that only render when user clicks.
 
 app.layout = html.Div(
@@ -1049,9 +1203,20 @@ app.layout = html.Div(
                     )
                 ),
                 html.P(
+                    id='time-stamp',
                     className='time-stamp',
                     children="Last update: {}. (Hover over items for additional information)".format(latestDate)
                 ),
+                dcc.Slider(
+                    id='date-slider',
+                    min=0,
+                    max=len(snapshot_history.days) - 1,
+                    value=len(snapshot_history.days) - 1,
+                    step=1,
+                    marks={i: {'label': d.strftime('%b %d')} for i, d in enumerate(snapshot_history.days)
+                           if d.day == 1 or d.day == 15 or i == len(snapshot_history.days) - 1},
+                    updatemode='mouseup',
+                ),
                 html.Hr(
                 ),
             ]
@@ -1089,6 +1254,7 @@ app.layout = html.Div(
                             children="Active cases"
                         ),
                         html.H3(
+                            id='number-plate-active-value',
                         	style={'color': '#e36209'},
                             children=[
                                 '{:,d}'.format(remainCases),
@@ -1111,6 +1277,7 @@ app.layout = html.Div(
                             children="Confirmed cases"
                         ),
                         html.H3(
+                            id='number-plate-confirm-value',
                             style={'color': '#d7191c'},
                             children=[
                                 '{:,d}'.format(confirmedCases),
@@ -1133,6 +1300,7 @@ app.layout = html.Div(
                             children="Recovered cases"
                         ),
                         html.H3(
+                            id='number-plate-recover-value',
                             style={'color': '#1a9622'},
                             children=[
                                 '{:,d}'.format(recoveredCases),
@@ -1155,6 +1323,7 @@ app.layout = html.Div(
                             children="Death cases"
                         ),
                         html.H3(
+                            id='number-plate-death-value',
                         	style={'color': '#6c6c6c'},
                             children=[
                                 '{:,d}'.format(deathsCases),
@@ -1290,8 +1459,24 @@ app.layout = html.Div(
                 html.Div(
                 	className='dcc-sub-plot',
                     children=[
-                        html.H5(
-                            children='Latest Coronavirus Outbreak Map'
+                        html.Div(
+                            id='outbreak-map-play-button',
+                            children=[
+                                html.H5(
+                                    children='Latest Coronavirus Outbreak Map'
+                                ),
+                                daq.PowerButton(
+                                    id='map-play-button',
+                                    size=22,
+                                    color="#2674f6",
+                                    on=False,
+                                ),
+                                dbc.Tooltip(
+                                    "Animate the spread day by day",
+                                    target='map-play-button',
+                                    style={"fontSize":"1.8em"},
+                                ),
+                            ],
                         ),
                         dcc.Graph(
                             id='datatable-interact-map',
@@ -1317,6 +1502,11 @@ app.layout = html.Div(
                                 {'label':'Death Toll Trajectories', 'value':'Death Toll Trajectories'},
                             ]
                         ),                                  
+                        dcc.Dropdown(
+                            id='group-picker',
+                            placeholder='Or plot a group of countries',
+                            options=[{'label': group, 'value': group} for group in GROUPS],
+                        ),
                         html.Div(
                         	id='tabs-content-plots',
                         ),
@@ -1331,6 +1521,13 @@ app.layout = html.Div(
                     id='dcc-table-header',
                     children='Cases Summary by Location'
                 ),
+                # Options come from the server, the top matches of the typed text (see search_regions)
+                dcc.Dropdown(
+                    id='region-search',
+                    placeholder='Search a country, province or state',
+                    options=[],
+                    searchable=True,
+                ),
                 dcc.Tabs(
                     id="tabs-table",
                     value='Worldwide',
@@ -1346,14 +1543,11 @@ app.layout = html.Div(
                                 dash_table.DataTable(
                                     id='datatable-interact-location',
                                     # Don't show coordinates
-                                    columns=[{"name": 'Country/Region', "id": 'Country/Region'}] +
-                                            [{"name": i, "id": i, "type": "numeric","format": FormatTemplate.percentage(2)}
-                                                if i == 'Death rate' or i == 'Positive rate' else {"name": i, "id": i, 'type': 'numeric', 'format': Format(group=',')}
-                                                    for i in WorldwildTable.columns[1:11]],
+                                    columns=make_table_columns(WorldwildTable),
                                     # But still store coordinates in the table for interactivity
                                     data=WorldwildTable.to_dict("rows"),
                                     #css= [{'selector': 'tr:hover', 'rule': 'background-color: #2674f6;'}],
-                                    row_selectable="single",
+                                    row_selectable="multi",
                                     sort_action="native",
                                     style_as_list_view=True,
                                     style_cell={
@@ -1987,9 +2181,88 @@ def render_ternary_plot(value):
 
         return fig_ternary 
 
+@app.callback(
+    [Output('time-stamp', 'children')] +
+    [Output('number-plate-{}-value'.format(plate), 'children') for plate in ['active', 'confirm', 'recover', 'death']],
+    [Input('date-slider', 'value')]
+)
+def update_plates(day):
+    if is_latest_day(day):
+        stamp = "Last update: {}. (Hover over items for additional information)".format(latestDate)
+    else:
+        stamp = "As of {}. (Move the slider to the right end for the latest data)".format(
+            snapshot_history.days[day].strftime('%b %d, %Y'))
+    return [stamp] + [
+        ['{:,d}'.format(total), html.P(children='+ {:,d} in the past 24h ({:.1%})'.format(plus, percent))]
+        for total, plus, percent in make_asof_plates(day)]
+
+@app.callback(
+    Output('region-search', 'options'),
+    [Input('region-search', 'search_value')],
+    [State('region-search', 'value'), State('region-search', 'options')]
+)
+def search_regions(search_value, value, options):
+    if not search_value:
+        raise PreventUpdate
+    matches = region_index.search(search_value, limit=SEARCH_LIMIT)
+    # Keep the picked option, or the dropdown would clear it
+    picked = [o for o in options or [] if o['value'] == value and o not in matches]
+    return matches + picked
+
+@app.callback(
+    [Output('tabs-table', 'value'), Output('group-picker', 'value')] +
+    [Output(TABLE_IDS[tab], 'selected_rows') for tab in TABLE_TABS] +
+    [Output(TABLE_IDS[tab], 'data') for tab in ['Worldwide'] + ASOF_TABS],
+    [Input('region-search', 'value'), Input('date-slider', 'value')] +
+    [Input(TABLE_IDS[tab], 'selected_row_ids') for tab in TABLE_TABS]
+)
+def update_tables(value, day, *selected_row_ids):
+    '''
+    Tables as of the slider's day and their row selection, in one callback
+    so that rows and selection always change together:
+
+    * a slider move swaps in the tables of its day, which are sorted by that
+      day's counts, and moves the selected rows to the new rows of their ids,
+    * a searched region opens its tab and selects its row, or a searched
+      group is picked; the plots follow,
+    * a row picked in a table clears the picked group, which would otherwise
+      keep overriding the row in the line and daily plots.
+    '''
+    triggered = dash.callback_context.triggered
+    props = [t['prop_id'] for t in triggered]
+    tab, group = dash.no_update, dash.no_update
+    rows = [dash.no_update] * len(TABLE_TABS)
+    data = [dash.no_update] * (1 + len(ASOF_TABS))
+    if not any(p in ('.', 'region-search.value', 'date-slider.value') for p in props):
+        # A table selection changed: a row picked (not one cleared) replaces the group
+        if not any(t['value'] for t in triggered):
+            raise PreventUpdate
+        return [tab, None] + rows + data
+
+    tables = dict(make_asof_tables(day), Brazil=BrazilTable, Germany=GermanyTable)
+    if any(p in ('.', 'date-slider.value') for p in props):
+        data = [tables[t].to_dict("rows") for t in ['Worldwide'] + ASOF_TABS]
+        for t in ['Worldwide'] + ASOF_TABS:
+            ids = selected_row_ids[TABLE_TABS.index(t)]
+            if ids:
+                # A region without cases on the slider's day has no row
+                position = {row_id: i for i, row_id in enumerate(tables[t]['id'])}
+                rows[TABLE_TABS.index(t)] = [position[i] for i in ids if i in position]
+
+    if 'region-search.value' in props and value:
+        tab, row_id = value.split('|', 1)
+        if tab == GROUP_TAB:
+            tab, group = dash.no_update, row_id
+        else:
+            group = None
+            if row_id:
+                ids = list(tables[tab]['id'])
+                rows[TABLE_TABS.index(tab)] = [ids.index(row_id)] if row_id in ids else []
+    return [tab, group] + rows + data
+
 @app.callback(
     Output('datatable-interact-map', 'figure'),
-    input_list
+    input_list + [Input('date-slider', 'value'), Input('map-play-button', 'on')]
 )
 def update_figures(
     value, 
@@ -2006,6 +2279,7 @@ def update_figures(
     Germany_derived_virtual_selected_rows, Germany_selected_row_ids,
     MainlandChina_derived_virtual_selected_rows, MainlandChina_selected_row_ids,
     UnitedStates_derived_virtual_selected_rows, UnitedStates_selected_row_ids,
+    day=None, play=False,
 ):
 
     # When the table is first rendered, `derived_virtual_data` and
@@ -2118,12 +2392,14 @@ def update_figures(
             longitude = 22.252163 if len(Africa_derived_virtual_selected_rows) == 0 else dff.loc[Africa_selected_row_ids[0]].lon
             zoom = 1 if len(Africa_derived_virtual_selected_rows) == 0 else 5
       
+        # Markers as of the day picked on the date slider
+        df_places = make_asof_places(day)
         hovertext_value = ['Active: {:,d}<br>Confirmed: {:,d}<br>Recovered: {:,d}<br>Death: {:,d}<br>Death rate: {:.2%}<br>Confirmed cases/100k population: {:.0f}'.format(h, i, j, k, t, q) 
                             for h, i, j, k, t, q in zip(
-                                df_latest['Confirmed']-df_latest['Recovered']-df_latest['Deaths'],
-                                df_latest['Confirmed'],  df_latest['Recovered'],
-                                df_latest['Deaths'], df_latest['Deaths']/df_latest['Confirmed'], 
-                                df_latest['Confirmed']*100000/df_latest['Population']
+                                df_places['Active'],
+                                df_places['Confirmed'],  df_places['Recovered'],
+                                df_places['Deaths'], df_places['Death rate'],
+                                df_places['Confirmed/100k']
                             )
         ]
 
@@ -2131,7 +2407,7 @@ def update_figures(
 
         # Generate a list for hover text display
         textList = []
-        for area, region in zip(df_latest['Province/State'], df_latest['Country/Region']):
+        for area, region in zip(df_places['Province/State'], df_places['Country/Region']):
 
             if type(area) is str:
                 if region == "Hong Kong" or region == "Macau" or region == "Taiwan":
@@ -2143,21 +2419,21 @@ def update_figures(
 
         # Generate a list for color gradient display
         colorList = []
-        for comfirmed, recovered, deaths in zip(df_latest['Confirmed'], df_latest['Recovered'], df_latest['Deaths']):
+        for comfirmed, recovered, deaths in zip(df_places['Confirmed'], df_places['Recovered'], df_places['Deaths']):
             remaining = comfirmed - deaths - recovered
             colorList.append(remaining)
 
         fig2 = go.Figure(go.Scattermapbox(
-            lat=df_latest['lat'],
-            lon=df_latest['lon'],
+            lat=df_places['lat'],
+            lon=df_places['lon'],
             mode='markers',
             marker=go.scattermapbox.Marker(
                 color=['#d7191c' if i > 0 else '#1a9622' for i in colorList],
-                size=[i**(1/3) for i in df_latest['Confirmed']],
+                size=[i**(1/3) for i in df_places['Confirmed']],
                 sizemin=1,
                 sizemode='area',
                 sizeref=2.*max([math.sqrt(i)
-                    for i in df_latest['Confirmed']])/(100.**2),
+                    for i in df_places['Confirmed']])/(100.**2),
             ),
             text=textList,
             hovertext=hovertext_value,
@@ -2196,6 +2472,10 @@ def update_figures(
             )
         )
 
+        # Markers of every day of the tab, played from the first day
+        if play and value in map_frames.scopes:
+            return add_animation(fig2, map_frames.encode(value))
+
         return fig2
     else:
         if value == 'Brazil':
@@ -2224,7 +2504,7 @@ def update_figures(
 
 @app.callback(
     Output('datatable-interact-lineplot', 'figure'),
-    input_list
+    input_list + [Input('group-picker', 'value')]
 )
 def update_lineplot(value, derived_virtual_selected_rows, selected_row_ids,
   Asia_derived_virtual_selected_rows,Asia_selected_row_ids,
@@ -2238,7 +2518,8 @@ def update_lineplot(value, derived_virtual_selected_rows, selected_row_ids,
   Canada_derived_virtual_selected_rows, Canada_selected_row_ids,
   Germany_derived_virtual_selected_rows, Germany_selected_row_ids,
   CHN_derived_virtual_selected_rows, CHN_selected_row_ids,
-  US_derived_virtual_selected_rows, US_selected_row_ids,  
+  US_derived_virtual_selected_rows, US_selected_row_ids,
+  group=None,
   ):
 
     if value == 'Worldwide':
@@ -2379,8 +2660,20 @@ def update_lineplot(value, derived_virtual_selected_rows, selected_row_ids,
       else:
         Region = 'Africa'  
 
-    # Read cumulative data of a given region from ./cumulative_data folder
-    df_region = pd.read_csv('./cumulative_data/{}.csv'.format(Region))
+    # A custom group (EU, G7, ...) picked in the group selector or the region search
+    if group:
+      Region, dff = group, WorldwildTable
+
+    # Several picked rows: overlay their confirmed cases
+    Regions = selected_regions(value, selected_row_ids, Asia_selected_row_ids, Oceania_selected_row_ids,
+      NorthAmerica_selected_row_ids, SouthAmerica_selected_row_ids, Africa_selected_row_ids, Europe_selected_row_ids,
+      Australia_selected_row_ids, Brazil_selected_row_ids, Canada_selected_row_ids, Germany_selected_row_ids,
+      CHN_selected_row_ids, US_selected_row_ids)
+    if len(Regions) > 1 and not group:
+      return make_overlay_lineplot(Regions)
+
+    # Read cumulative data of a given region (rolled up for groups of countries)
+    df_region = load_region_data(Region)
     df_region = df_region.astype(
       {'date_day': 'datetime64'})
 
@@ -2583,7 +2876,7 @@ def update_lineplot(value, derived_virtual_selected_rows, selected_row_ids,
 
 @app.callback(
     Output('datatable-interact-dailyplot', 'figure'),
-    input_list
+    input_list + [Input('group-picker', 'value')]
 )
 
 def update_dailyplot(value, derived_virtual_selected_rows, selected_row_ids,
@@ -2598,7 +2891,8 @@ def update_dailyplot(value, derived_virtual_selected_rows, selected_row_ids,
   Canada_derived_virtual_selected_rows, Canada_selected_row_ids,
   Germany_derived_virtual_selected_rows, Germany_selected_row_ids,
   CHN_derived_virtual_selected_rows, CHN_selected_row_ids,
-  US_derived_virtual_selected_rows, US_selected_row_ids,  
+  US_derived_virtual_selected_rows, US_selected_row_ids,
+  group=None,
   ):
 
     if value == 'Worldwide':
@@ -2738,8 +3032,12 @@ def update_dailyplot(value, derived_virtual_selected_rows, selected_row_ids,
       else:
         Region = 'Africa' 
 
-    # Read cumulative data of a given region from ./cumulative_data folder
-    df_region = pd.read_csv('./cumulative_data/{}.csv'.format(Region))
+    # A custom group (EU, G7, ...) picked in the group selector or the region search
+    if group:
+      Region, dff = group, WorldwildTable
+
+    # Read cumulative data of a given region (rolled up for groups of countries)
+    df_region = load_region_data(Region)
     df_region = df_region.astype(
       {'date_day': 'datetime64'})
 
@@ -2790,6 +3088,9 @@ def update_dailyplot(value, derived_virtual_selected_rows, selected_row_ids,
                                                       '%{hovertext}' +
                                                      '<extra></extra>'))
       
+      # 7-day mean (14-day and weighted means in the legend) of the daily cases
+      add_smoothed_traces(fig_daily, Region)
+
       # Customise layout
       fig_daily.update_layout(
         margin=go.layout.Margin(
@@ -2888,6 +3189,9 @@ def update_dailyplot(value, derived_virtual_selected_rows, selected_row_ids,
                                                       '%{hovertext}' +
                                                      '<extra></extra>'))
       
+      # 7-day mean (14-day and weighted means in the legend) of the daily cases
+      add_smoothed_traces(fig_daily, Region)
+
       # Customise layout
       fig_daily.update_layout(
         margin=go.layout.Margin(
@@ -3084,68 +3388,36 @@ def update_logplot(value, derived_virtual_selected_rows, selected_row_ids,
     # Create empty figure canvas
     fig_curve = go.Figure()
 
-    fig_curve.add_trace(go.Scatter(x=pseduoDay,
-                                   y=y1,
-                                   line=dict(color='rgba(0, 0, 0, .3)', width=1, dash='dot'),
-                                   text=[
-                                       '85% growth rate' for i in pseduoDay],
-                                   hovertemplate='<b>%{text}</b><br>' +
-                                                 'Doubles every 1.1 days<br>' +
-                                                 '<extra></extra>'
-                            )
-    )
-    fig_curve.add_trace(go.Scatter(x=pseduoDay,
-                                   y=y2,
-                                   line=dict(color='rgba(0, 0, 0, .3)', width=1, dash='dot'),
-                                   text=[
-                                        '35% growth rate' for i in pseduoDay],
-                                   hovertemplate='<b>%{text}</b><br>' +
-                                                 'Doubles every 2.3 days<br>' +
-                                                 '<extra></extra>'
-                            )
-    )
-    fig_curve.add_trace(go.Scatter(x=pseduoDay,
-                                   y=y3,
-                                   line=dict(color='rgba(0, 0, 0, .3)', width=1, dash='dot'),
-                                   text=[
-                                        '15% growth rate' for i in pseduoDay],
-                                   hovertemplate='<b>%{text}</b><br>' +
-                                                 'Doubles every 5 days<br>' +
-                                                 '<extra></extra>'
-                            )
-    )
-    fig_curve.add_trace(go.Scatter(x=pseduoDay,
-                                   y=y4,
-                                   line=dict(color='rgba(0, 0, 0, .3)', width=1, dash='dot'),
-                                   text=[
-                                        '5% growth rate' for i in pseduoDay],
-                                   hovertemplate='<b>%{text}</b><br>' +
-                                                 'Doubles every 14.2 days<br>' +
-                                                 '<extra></extra>'
-                            )
-    )
-
-    # Add trace to the figure
-    if Region in set(dfs_curve['Region']):
-
-        dotx = [np.array(dfs_curve.loc[dfs_curve['Region'] == Region,'DayElapsed'])[0]]
-        doty = [np.array(dfs_curve.loc[dfs_curve['Region'] == Region,'Confirmed'])[0]]
+    # Add trace to the figure (several picked rows: overlay them)
+    Regions = selected_regions(value, selected_row_ids, Asia_selected_row_ids, Oceania_selected_row_ids,
+      NorthAmerica_selected_row_ids, SouthAmerica_selected_row_ids, Africa_selected_row_ids, Europe_selected_row_ids,
+      Australia_selected_row_ids, Brazil_selected_row_ids, Canada_selected_row_ids, Germany_selected_row_ids,
+      CHN_selected_row_ids, US_selected_row_ids)
+    if len(Regions) < 2:
+        # Current growth of the region, fitted to its last days
+        add_fitted_line(fig_curve, dfs_curve, Region, 'Confirmed')
+    if len(Regions) > 1:
+        add_overlay_curves(fig_curve, dfs_curve, Regions)
+    elif Region in dfs_curve:
+
+        dotx = [np.array(dfs_curve.frame(Region)['DayElapsed'])[0]]
+        doty = [np.array(dfs_curve.frame(Region)['Confirmed'])[0]]
 
         for regionName in ['Worldwide', 'Japan', 'Italy', 'India', 'US']:
 
-          dotgrayx = [np.array(dfs_curve.loc[dfs_curve['Region'] == regionName, 'DayElapsed'])[0]]
-          dotgrayy = [np.array(dfs_curve.loc[dfs_curve['Region'] == regionName, 'Confirmed'])[0]]
+          dotgrayx = [np.array(dfs_curve.frame(regionName)['DayElapsed'])[0]]
+          dotgrayy = [np.array(dfs_curve.frame(regionName)['Confirmed'])[0]]
 
 
-          fig_curve.add_trace(go.Scatter(x=dfs_curve.loc[dfs_curve['Region'] == regionName]['DayElapsed'],
-                                         y=dfs_curve.loc[dfs_curve['Region'] == regionName]['Confirmed'],
+          fig_curve.add_trace(go.Scatter(x=dfs_curve.frame(regionName)['DayElapsed'],
+                                         y=dfs_curve.frame(regionName)['Confirmed'],
                                          mode='lines',
                                          line_shape='spline',
                                          name=regionName,
                                          opacity=0.3,
                                          line=dict(color='#636363', width=1.5),
                                          text=[
-                                            i for i in dfs_curve.loc[dfs_curve['Region'] == regionName]['Region']],
+                                            i for i in dfs_curve.frame(regionName)['Region']],
                                          hovertemplate='<b>%{text}</b><br>' +
                                                        '<br>%{x} days after 100 cases<br>' +
                                                        'with %{y:,d} cases in total<br>'
@@ -3166,14 +3438,14 @@ def update_logplot(value, derived_virtual_selected_rows, selected_row_ids,
                             )
           )
           
-        fig_curve.add_trace(go.Scatter(x=dfs_curve.loc[dfs_curve['Region'] == Region]['DayElapsed'],
-                                       y=dfs_curve.loc[dfs_curve['Region'] == Region]['Confirmed'],
+        fig_curve.add_trace(go.Scatter(x=dfs_curve.frame(Region)['DayElapsed'],
+                                       y=dfs_curve.frame(Region)['Confirmed'],
                                        mode='lines',
                                        line_shape='spline',
                                        name=Region,
                                        line=dict(color='#d7191c', width=3),
                                        text=[
-                                           i for i in dfs_curve.loc[dfs_curve['Region'] == Region]['Region']],
+                                           i for i in dfs_curve.frame(Region)['Region']],
                                        hovertemplate='<b>%{text}</b><br>' +
                                                      '<br>%{x} days after 100 cases<br>' +
                                                      'with %{y:,d} cases in total<br>'
@@ -3196,18 +3468,18 @@ def update_logplot(value, derived_virtual_selected_rows, selected_row_ids,
     else:
         for regionName in ['Worldwide', 'Japan', 'Italy', 'India', 'US']:
 
-          dotgrayx = [np.array(dfs_curve.loc[dfs_curve['Region'] == regionName, 'DayElapsed'])[0]]
-          dotgrayy = [np.array(dfs_curve.loc[dfs_curve['Region'] == regionName, 'Confirmed'])[0]]
+          dotgrayx = [np.array(dfs_curve.frame(regionName)['DayElapsed'])[0]]
+          dotgrayy = [np.array(dfs_curve.frame(regionName)['Confirmed'])[0]]
 
-          fig_curve.add_trace(go.Scatter(x=dfs_curve.loc[dfs_curve['Region'] == regionName]['DayElapsed'],
-                                         y=dfs_curve.loc[dfs_curve['Region'] == regionName]['Confirmed'],
+          fig_curve.add_trace(go.Scatter(x=dfs_curve.frame(regionName)['DayElapsed'],
+                                         y=dfs_curve.frame(regionName)['Confirmed'],
                                          mode='lines',
                                          line_shape='spline',
                                          name=regionName,
                                          opacity=0.3,
                                          line=dict(color='#636363', width=1.5),
                                          text=[
-                                            i for i in dfs_curve.loc[dfs_curve['Region'] == regionName]['Region']],
+                                            i for i in dfs_curve.frame(regionName)['Region']],
                                          hovertemplate='<b>%{text}</b><br>' +
                                                        '<br>%{x} days after 100 cases<br>' +
                                                        'with %{y:,d} cases in total<br>'
@@ -3248,7 +3520,7 @@ def update_logplot(value, derived_virtual_selected_rows, selected_row_ids,
                 y=.4,
                 xref="paper",
                 yref="paper",
-                text=Region if Region in set(dfs_curve['Region']) else "Not over 100 cases",
+                text='{} regions'.format(len(Regions)) if len(Regions) > 1 else Region if Region in dfs_curve else "Not over 100 cases",
                 opacity=0.5,
                 font=dict(family='Roboto, sans-serif',
                           size=40,
@@ -3426,68 +3698,36 @@ def update_deathplot(value, derived_virtual_selected_rows, selected_row_ids,
     # Create empty figure canvas
     fig_curve_death = go.Figure()
 
-    fig_curve_death.add_trace(go.Scatter(x=pseduoDay,
-                                   y=z1,
-                                   line=dict(color='rgba(0, 0, 0, .3)', width=1, dash='dot'),
-                                   text=[
-                                       '85% growth rate' for i in pseduoDay],
-                                   hovertemplate='<b>%{text}</b><br>' +
-                                                 'Doubles every 1.1 days<br>' +
-                                                 '<extra></extra>'
-                            )
-    )
-    fig_curve_death.add_trace(go.Scatter(x=pseduoDay,
-                                   y=z2,
-                                   line=dict(color='rgba(0, 0, 0, .3)', width=1, dash='dot'),
-                                   text=[
-                                        '35% growth rate' for i in pseduoDay],
-                                   hovertemplate='<b>%{text}</b><br>' +
-                                                 'Doubles every 2.3 days<br>' +
-                                                 '<extra></extra>'
-                            )
-    )
-    fig_curve_death.add_trace(go.Scatter(x=pseduoDay,
-                                   y=z3,
-                                   line=dict(color='rgba(0, 0, 0, .3)', width=1, dash='dot'),
-                                   text=[
-                                        '15% growth rate' for i in pseduoDay],
-                                   hovertemplate='<b>%{text}</b><br>' +
-                                                 'Doubles every 5 days<br>' +
-                                                 '<extra></extra>'
-                            )
-    )
-    fig_curve_death.add_trace(go.Scatter(x=pseduoDay,
-                                   y=z4,
-                                   line=dict(color='rgba(0, 0, 0, .3)', width=1, dash='dot'),
-                                   text=[
-                                        '5% growth rate' for i in pseduoDay],
-                                   hovertemplate='<b>%{text}</b><br>' +
-                                                 'Doubles every 14.2 days<br>' +
-                                                 '<extra></extra>'
-                            )
-    )
-
-    # Add trace to the figure
-    if Region in set(dfs_curve_death['Region']):
-
-        dotx_death = [np.array(dfs_curve_death.loc[dfs_curve_death['Region'] == Region,'DayElapsed_death'])[0]]
-        doty_death = [np.array(dfs_curve_death.loc[dfs_curve_death['Region'] == Region,'Deaths'])[0]]
+    # Add trace to the figure (several picked rows: overlay them)
+    Regions = selected_regions(value, selected_row_ids, Asia_selected_row_ids, Oceania_selected_row_ids,
+      NorthAmerica_selected_row_ids, SouthAmerica_selected_row_ids, Africa_selected_row_ids, Europe_selected_row_ids,
+      Australia_selected_row_ids, Brazil_selected_row_ids, Canada_selected_row_ids, Germany_selected_row_ids,
+      CHN_selected_row_ids, US_selected_row_ids)
+    if len(Regions) < 2:
+        # Current growth of the region, fitted to its last days
+        add_fitted_line(fig_curve_death, dfs_curve_death, Region, 'Deaths')
+    if len(Regions) > 1:
+        add_overlay_curves(fig_curve_death, dfs_curve_death, Regions, 'death cases')
+    elif Region in dfs_curve_death:
+
+        dotx_death = [np.array(dfs_curve_death.frame(Region)['DayElapsed_death'])[0]]
+        doty_death = [np.array(dfs_curve_death.frame(Region)['Deaths'])[0]]
 
         for regionName in ['Worldwide', 'Japan', 'Italy', 'India', 'US']:
 
-          dotgrayx_death = [np.array(dfs_curve_death.loc[dfs_curve_death['Region'] == regionName, 'DayElapsed_death'])[0]]
-          dotgrayy_death = [np.array(dfs_curve_death.loc[dfs_curve_death['Region'] == regionName, 'Deaths'])[0]]
+          dotgrayx_death = [np.array(dfs_curve_death.frame(regionName)['DayElapsed_death'])[0]]
+          dotgrayy_death = [np.array(dfs_curve_death.frame(regionName)['Deaths'])[0]]
 
 
-          fig_curve_death.add_trace(go.Scatter(x=dfs_curve_death.loc[dfs_curve_death['Region'] == regionName]['DayElapsed_death'],
-                                         y=dfs_curve_death.loc[dfs_curve_death['Region'] == regionName]['Deaths'],
+          fig_curve_death.add_trace(go.Scatter(x=dfs_curve_death.frame(regionName)['DayElapsed_death'],
+                                         y=dfs_curve_death.frame(regionName)['Deaths'],
                                          mode='lines',
                                          line_shape='spline',
                                          name=regionName,
                                          opacity=0.3,
                                          line=dict(color='#636363', width=1.5),
                                          text=[
-                                            i for i in dfs_curve_death.loc[dfs_curve_death['Region'] == regionName]['Region']],
+                                            i for i in dfs_curve_death.frame(regionName)['Region']],
                                          hovertemplate='<b>%{text}</b><br>' +
                                                        '<br>%{x} days since 3rd death cases<br>' +
                                                        'with %{y:,d} death cases in total<br>'
@@ -3508,14 +3748,14 @@ def update_deathplot(value, derived_virtual_selected_rows, selected_row_ids,
                             )
           )
           
-        fig_curve_death.add_trace(go.Scatter(x=dfs_curve_death.loc[dfs_curve_death['Region'] == Region]['DayElapsed_death'],
-                                       y=dfs_curve_death.loc[dfs_curve_death['Region'] == Region]['Deaths'],
+        fig_curve_death.add_trace(go.Scatter(x=dfs_curve_death.frame(Region)['DayElapsed_death'],
+                                       y=dfs_curve_death.frame(Region)['Deaths'],
                                        mode='lines',
                                        line_shape='spline',
                                        name=Region,
                                        line=dict(color='#626262', width=3),
                                        text=[
-                                           i for i in dfs_curve_death.loc[dfs_curve_death['Region'] == Region]['Region']],
+                                           i for i in dfs_curve_death.frame(Region)['Region']],
                                        hovertemplate='<b>%{text}</b><br>' +
                                                      '<br>%{x} days since 3rd death cases<br>' +
                                                      'with %{y:,d} death cases in total<br>'
@@ -3538,18 +3778,18 @@ def update_deathplot(value, derived_virtual_selected_rows, selected_row_ids,
     else:
         for regionName in ['Worldwide', 'Japan', 'Italy', 'India', 'US']:
 
-          dotgrayx_death = [np.array(dfs_curve_death.loc[dfs_curve_death['Region'] == regionName, 'DayElapsed_death'])[0]]
-          dotgrayy_death = [np.array(dfs_curve_death.loc[dfs_curve_death['Region'] == regionName, 'Deaths'])[0]]
+          dotgrayx_death = [np.array(dfs_curve_death.frame(regionName)['DayElapsed_death'])[0]]
+          dotgrayy_death = [np.array(dfs_curve_death.frame(regionName)['Deaths'])[0]]
 
-          fig_curve_death.add_trace(go.Scatter(x=dfs_curve_death.loc[dfs_curve_death['Region'] == regionName]['DayElapsed_death'],
-                                         y=dfs_curve_death.loc[dfs_curve_death['Region'] == regionName]['Deaths'],
+          fig_curve_death.add_trace(go.Scatter(x=dfs_curve_death.frame(regionName)['DayElapsed_death'],
+                                         y=dfs_curve_death.frame(regionName)['Deaths'],
                                          mode='lines',
                                          line_shape='spline',
                                          name=regionName,
                                          opacity=0.3,
                                          line=dict(color='#636363', width=1.5),
                                          text=[
-                                            i for i in dfs_curve_death.loc[dfs_curve_death['Region'] == regionName]['Region']],
+                                            i for i in dfs_curve_death.frame(regionName)['Region']],
                                          hovertemplate='<b>%{text}</b><br>' +
                                                        '<br>%{x} days since 3rd death cases<br>' +
                                                        'with %{y:,d} death cases in total<br>'
@@ -3589,7 +3829,7 @@ def update_deathplot(value, derived_virtual_selected_rows, selected_row_ids,
             y=.4,
             xref="paper",
             yref="paper",
-            text=Region if Region in set(dfs_curve['Region']) else "Not over 3 death cases",
+            text='{} regions'.format(len(Regions)) if len(Regions) > 1 else Region if Region in dfs_curve_death else "Not over 3 death cases",
             opacity=0.5,
             font=dict(family='Roboto, sans-serif',
                           size=40,
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+'''
+As-of access to every snapshot of ./raw_data/.
+
+All snapshots are stored once in a columnar .npz: one array per column,
+rows sorted by snapshot time, text columns as category codes, and an index
+of (snapshot time -> first row). The state as of any time is the row range
+of the last snapshot at or before it, found with a binary search, so a
+past date costs a slice instead of reading and cleansing its CSV.
+
+The store is built offline with `python asof.py --build` and committed as
+./snapshot_data/snapshots.npz (as trajectory.py does with ./lineplot_data/),
+so starting the app loads it instead of reading every snapshot again. It
+keeps the names of the files it was built from, and is rebuilt when they
+differ from the files of ./raw_data/ (a snapshot added without a rebuild).
+Snapshots with a bad schema are left out of it, and the rows of the others
+are checked when it is built (see validate.py): rows with an error, such
+as the second Grand Princess row of 2020-03-13 21:00, are quarantined out
+of the store and listed in ./snapshot_data/validation.csv.
+
+SnapshotHistory.places() returns a snapshot in the layout of df_latest
+(coordinates, population and continent joined from the latest data file);
+countries() sums it per country. Both are cached per snapshot.
+
+Usage:
+    python asof.py --build
+    python asof.py 2020-03-15
+'''
+import os
+import glob
+import argparse
+import warnings
+from functools import lru_cache
+
+import pandas as pd
+import numpy as np
+
+from loader import load, save_arrays
+from validate import check_schema, SnapshotValidator
+
+###################################
+# Private function and variable
+###################################
+
+RAW_DIR = './raw_data/'
+STORE = './snapshot_data/snapshots.npz'
+REPORT = './snapshot_data/validation.csv'
+TEXT_COLUMNS = ['Province/State', 'Country/Region']
+COUNT_COLUMNS = ['Confirmed', 'Deaths', 'Recovered', 'Tests', 'Critical']
+REFERENCE_COLUMNS = ['Province/State', 'Country/Region', 'Population', 'Continent', 'World', 'lat', 'lon']
+
+def _snapshot_files(raw_dir):
+    '''{snapshot time: path} of the 'YYYY-MM-DD-HH-MM.csv' files'''
+    files = {}
+    for path in glob.glob(os.path.join(raw_dir, '*.csv')):
+        try:
+            files[pd.Timestamp(pd.to_datetime(os.path.basename(path)[:-4], format='%Y-%m-%d-%H-%M'))] = path
+        except ValueError:
+            continue
+    return dict(sorted(files.items()))
+
+def _columnar(times, snapshot, combined):
+    '''Arrays of the store: rows of combined in snapshot order, snapshot numbers of every row given'''
+    arrays = {'times': np.array(times, dtype='datetime64[m]'),
+              'offsets': np.searchsorted(snapshot, np.arange(len(times) + 1))}
+    for column in TEXT_COLUMNS:
+        codes, categories = pd.factorize(combined[column])
+        arrays[column + ':codes'] = codes.astype(np.int32)
+        arrays[column + ':categories'] = np.array(categories, dtype=str)
+    for column in COUNT_COLUMNS:
+        arrays[column] = combined[column].values
+    return arrays
+
+def _key(df):
+    '''(Province/State, Country/Region) join key; '' for a country without provinces'''
+    return df['Province/State'].fillna('') + '|' + df['Country/Region']
+
+###################################
+# Public function
+###################################
+
+def cleanse_snapshot(df):
+    '''A raw snapshot cleansed as in Data_cleansing.ipynb: counts filled with 0, China renamed'''
+    df = df.copy()
+    for column in COUNT_COLUMNS:
+        df[column] = df[column].fillna(0).astype(np.int64) if column in df else 0
+    df = df.replace({'Country/Region': 'Mainland China'}, 'China')
+    return df[TEXT_COLUMNS + COUNT_COLUMNS]
+
+def build_store(raw_dir=RAW_DIR, store=STORE, report=REPORT):
+    '''Read every snapshot once, save the columnar store of the valid ones without their error rows, and the report of their rows'''
+    files = _snapshot_files(raw_dir)
+    times, frames = [], []
+    for when, path in files.items():
+        # Through the columnar cache of loader.py, so a rebuild only parses the new files
+        df = load(path)
+        problems = check_schema(df)
+        if problems:
+            warnings.warn('{} left out of the snapshot store: {}'.format(path, '; '.join(problems)))
+            continue
+        times.append(when)
+        frames.append(cleanse_snapshot(df))
+    snapshot = np.repeat(np.arange(len(frames)), [len(f) for f in frames])
+    combined = pd.concat(frames, ignore_index=True)
+    arrays = _columnar(times, snapshot, combined)
+    validation = SnapshotValidator().validate_store(arrays)
+    quarantined = validation.error_rows()
+    if len(quarantined):
+        keep = np.ones(len(combined), dtype=bool)
+        keep[quarantined] = False
+        arrays = _columnar(times, snapshot[keep], combined[keep])
+        summary = validation.summary()
+        warnings.warn('{} rows quarantined out of the snapshot store (see {}): {}'.format(
+            len(quarantined), report, ', '.join('{} {}'.format(n, check) for check, n in
+                                                summary.loc[summary['severity'] == 'error', 'issues'].items() if n)))
+    # Every file read, the ones left out included, to tell when the store is stale
+    arrays['files'] = np.array([os.path.basename(p) for p in files.values()])
+    save_arrays(store, arrays, compressed=True)
+    validation.issues.to_csv(report, index=False)
+
+class SnapshotHistory:
+    '''The columnar snapshot store with an as-of index over snapshot times'''
+
+    def __init__(self, store=STORE, raw_dir=RAW_DIR, reference=None):
+        files = [os.path.basename(p) for p in _snapshot_files(raw_dir).values()]
+        if not os.path.exists(store) or self._built_from(store) != files:
+            build_store(raw_dir, store, os.path.join(os.path.dirname(store), os.path.basename(REPORT)))
+        with np.load(store) as data:
+            self.arrays = {k: data[k] for k in data.files if k != 'files'}
+        self.times = pd.DatetimeIndex(self.arrays['times'])
+        self.offsets = self.arrays['offsets']
+        self.days = pd.DatetimeIndex(self.times.normalize().unique())
+        # Coordinates, population and continent by place, from the latest data file
+        self.reference = self.country_reference = None
+        if reference is not None:
+            reference = reference[REFERENCE_COLUMNS].copy()
+            self.reference = reference.set_index(_key(reference)).drop(columns=TEXT_COLUMNS)
+            self.reference = self.reference[~self.reference.index.duplicated()]
+            by_country = reference.groupby('Country/Region', sort=False)
+            self.country_reference = by_country[['lat', 'lon']].first().join(by_country['Population'].sum())
+
+    @staticmethod
+    def _built_from(store):
+        '''Names of the raw files a store was built from'''
+        with np.load(store) as data:
+            return data['files'].tolist() if 'files' in data.files else None
+
+    def __len__(self):
+        return len(self.times)
+
+    def locate(self, when):
+        '''Index of the last snapshot at or before when (the first snapshot if none)'''
+        return max(int(self.times.searchsorted(pd.Timestamp(when), side='right')) - 1, 0)
+
+    def locate_day(self, day):
+        '''Index of the last snapshot of a day'''
+        return self.locate(pd.Timestamp(day).normalize() + pd.Timedelta(days=1) - pd.Timedelta(minutes=1))
+
+    @lru_cache(maxsize=64)
+    def places(self, i):
+        '''Snapshot i in the layout of df_latest (newest snapshot: i = -1)'''
+        i = i % len(self)
+        rows = slice(self.offsets[i], self.offsets[i+1])
+        df = pd.DataFrame({c: self.arrays[c][rows] for c in COUNT_COLUMNS})
+        for column in TEXT_COLUMNS:
+            codes = self.arrays[column + ':codes'][rows]
+            values = self.arrays[column + ':categories'][codes].astype(object)
+            df.insert(len(df.columns) - len(COUNT_COLUMNS), column, np.where(codes < 0, None, values))
+        df['Date_last_updated_AEDT'] = self.times[i]
+        if self.reference is not None:
+            df = df.join(self.reference, on=_key(df))
+        return df
+
+    @lru_cache(maxsize=64)
+    def countries(self, i):
+        '''Snapshot i summed per country, with the coordinates and population of the latest data file'''
+        sums = self.places(i).groupby('Country/Region', sort=False)[COUNT_COLUMNS].sum()
+        if self.country_reference is not None:
+            sums = sums.join(self.country_reference)
+        return sums.reset_index()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('when', nargs='?', help='print the countries as of this day')
+    parser.add_argument('--build', action='store_true', help='rebuild the store and the validation report')
+    args = parser.parse_args()
+
+    if args.build:
+        build_store()
+    history = SnapshotHistory(reference=pd.read_csv('./2020-04-30-07-00_data.csv'))
+    when = args.when or history.days[len(history.days) // 2]
+    i = history.locate_day(when)
+    countries = history.countries(i).sort_values('Confirmed', ascending=False)
+    print('{} snapshots, {} days; as of {}: snapshot {} ({})'.format(
+        len(history), len(history.days), when, i, history.times[i]))
+    print(countries.head(10).to_string(index=False))
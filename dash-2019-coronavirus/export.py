@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+'''
+Read-only export routes of the region series and the snapshot tables.
+
+register_exports(server, store, history) adds to the Flask server of the app:
+
+    /api/series/<region>    cumulative or smoothed daily series of a region (series.SeriesStore)
+    /api/snapshot/<when>    the snapshot as of a time (asof.SnapshotHistory), 'latest' for the newest,
+                            404 before the first snapshot
+    /api/snapshots          every snapshot from start to end, one after another
+
+with the query parameters:
+
+    format      csv (default), jsonl (JSON Lines) or arrow (Arrow IPC stream, needs pyarrow)
+    columns     comma-separated columns to export, in that order (default: all)
+    start, end  first and last day (series and snapshots)
+    kind        series only: cumulative (default), daily, mean7, mean14 or ewm
+
+Rows are read in chunks of CHUNK_ROWS straight from the numpy arrays of
+the stores and written out chunk by chunk, without a DataFrame, so an
+export of every snapshot holds one chunk in memory at a time. Text
+columns are decoded from their category codes per chunk, and only for
+the columns asked for.
+
+Every response carries an ETag of the request and of the version of its
+store (number and last of its days or snapshots); a request whose
+If-None-Match matches gets 304 Not Modified without a body.
+
+Usage:
+    python export.py        # the export routes alone, on localhost:8050
+    curl 'localhost:8050/api/series/Italy?kind=daily&start=2020-03-01&format=jsonl'
+    curl 'localhost:8050/api/snapshots?start=2020-04-01&columns=Country/Region,Confirmed&format=arrow' -o snapshots.arrows
+'''
+import io
+import csv
+import json
+import hashlib
+
+import flask
+import pandas as pd
+import numpy as np
+
+from rollup import CASE_TYPES, default_rollups
+from series import KINDS, SeriesStore
+from asof import TEXT_COLUMNS, COUNT_COLUMNS, SnapshotHistory
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+###################################
+# Private function and variable
+###################################
+
+CHUNK_ROWS = 5000
+MIMETYPES = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson', 'arrow': 'application/vnd.apache.arrow.stream'}
+SERIES_COLUMNS = ['date'] + CASE_TYPES
+SNAPSHOT_COLUMNS = ['snapshot'] + TEXT_COLUMNS + COUNT_COLUMNS
+# Kinds of series that are whole counts, exported as integers rather than floats
+WHOLE_KINDS = ['cumulative', 'daily']
+
+def _tolist(values):
+    '''Cells of a column: NaN as None, days and times as ISO strings'''
+    if values.dtype.kind == 'M':
+        return np.datetime_as_string(values).tolist()
+    if values.dtype.kind == 'f':
+        return [None if v != v else v for v in values.tolist()]
+    return values.tolist()
+
+def _counts(values):
+    '''Whole counts of a float array as an object array of ints, NaN as None'''
+    return np.array([None if v != v else int(v) for v in values.tolist()], dtype=object)
+
+def _chunks(n, take):
+    '''take(start, stop) of consecutive row ranges of at most CHUNK_ROWS; one empty chunk when n is 0'''
+    for start in range(0, max(n, 1), CHUNK_ROWS):
+        yield take(start, min(start + CHUNK_ROWS, n))
+
+def _write_csv(columns, chunks):
+    yield ','.join(columns) + '\n'
+    for chunk in chunks:
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator='\n').writerows(zip(*(_tolist(chunk[c]) for c in columns)))
+        yield buffer.getvalue()
+
+def _write_jsonl(columns, chunks):
+    for chunk in chunks:
+        yield ''.join(json.dumps(dict(zip(columns, row))) + '\n'
+                      for row in zip(*(_tolist(chunk[c]) for c in columns)))
+
+class _Sink:
+    '''File-like object that keeps what the Arrow writer writes until it is taken'''
+    closed = False
+
+    def __init__(self):
+        self.buffers = []
+
+    def write(self, data):
+        self.buffers.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data, self.buffers = b''.join(self.buffers), []
+        return data
+
+def _arrow_type(column, values):
+    '''Arrow type of a column, fixed for the object columns so every batch has the same schema'''
+    if column in TEXT_COLUMNS:
+        return pa.string()
+    # Whole counts with missing days (see _counts)
+    return pa.int64() if values.dtype.kind == 'O' else None
+
+def _write_arrow(columns, chunks):
+    sink, writer = _Sink(), None
+    for chunk in chunks:
+        arrays = [pa.array(chunk[c], type=_arrow_type(c, chunk[c])) for c in columns]
+        batch = pa.RecordBatch.from_arrays(arrays, names=columns)
+        if writer is None:
+            writer = pa.ipc.new_stream(sink, batch.schema)
+        writer.write_batch(batch)
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+WRITERS = {'csv': _write_csv, 'jsonl': _write_jsonl, 'arrow': _write_arrow}
+
+def _parse_format():
+    fmt = flask.request.args.get('format', 'csv')
+    if fmt not in WRITERS:
+        flask.abort(400, 'format must be one of {}'.format(', '.join(WRITERS)))
+    if fmt == 'arrow' and pa is None:
+        flask.abort(501, 'arrow export needs pyarrow')
+    return fmt
+
+def _parse_columns(available):
+    columns = flask.request.args.get('columns')
+    if not columns:
+        return available
+    columns = columns.split(',')
+    unknown = [c for c in columns if c not in available]
+    if unknown:
+        flask.abort(400, 'unknown columns {}; available: {}'.format(unknown, ', '.join(available)))
+    return columns
+
+def _parse_day(name):
+    '''Day of a query parameter (None when absent)'''
+    value = flask.request.args.get(name)
+    if value is None:
+        return None
+    try:
+        return pd.Timestamp(value).normalize()
+    except ValueError:
+        flask.abort(400, '{} is not a date: {}'.format(name, value))
+
+def _respond(version, fmt, columns, chunks):
+    '''Streamed response of the chunks, or 304 when the client has this version'''
+    etag = hashlib.sha1(repr((flask.request.full_path, version)).encode()).hexdigest()
+    if flask.request.if_none_match.contains(etag):
+        response = flask.Response(status=304)
+    else:
+        response = flask.Response(WRITERS[fmt](columns, chunks), mimetype=MIMETYPES[fmt])
+    response.set_etag(etag)
+    return response
+
+###################################
+# Public function
+###################################
+
+def series_chunks(store, region, kind='cumulative', start=None, end=None):
+    '''
+    Chunks ({column: array}) of the SERIES_COLUMNS of a region from start to
+    end; cumulative and daily counts are whole numbers, None before the series
+    starts
+    '''
+    days, _, values = store.batch([region], CASE_TYPES, kind)
+    first = days.searchsorted(start) if start is not None else 0
+    last = days.searchsorted(end, side='right') if end is not None else len(days)
+    dates = days.values.astype('datetime64[D]')
+
+    def take(a, b):
+        rows = slice(first + a, first + b)
+        chunk = {'date': dates[rows]}
+        for c, case_type in enumerate(CASE_TYPES):
+            chunk[case_type] = _counts(values[c, 0, rows]) if kind in WHOLE_KINDS else values[c, 0, rows]
+        return chunk
+    return _chunks(max(last - first, 0), take)
+
+def snapshot_chunks(history, first, last, columns=SNAPSHOT_COLUMNS):
+    '''Chunks ({column: array}) of the rows of snapshots first to last - 1, the given columns only'''
+    arrays, offsets = history.arrays, history.offsets
+    start, stop = int(offsets[first]), int(offsets[max(last, first)])
+    times = history.times.values.astype('datetime64[s]')
+
+    def take(a, b):
+        rows = np.arange(start + a, start + b)
+        chunk = {}
+        for column in columns:
+            if column == 'snapshot':
+                chunk[column] = times[np.searchsorted(offsets, rows, side='right') - 1]
+            elif column in TEXT_COLUMNS:
+                codes = arrays[column + ':codes'][rows]
+                chunk[column] = np.where(codes < 0, None, arrays[column + ':categories'][codes].astype(object))
+            else:
+                chunk[column] = arrays[column][rows]
+        return chunk
+    return _chunks(stop - start, take)
+
+def register_exports(server, store, history, prefix='/api'):
+    '''Add the export routes of a series.SeriesStore and an asof.SnapshotHistory to a Flask server'''
+
+    @server.route(prefix + '/series/<region>')
+    def _export_series(region):
+        if region not in store:
+            flask.abort(404, 'no series for {}'.format(region))
+        kind = flask.request.args.get('kind', 'cumulative')
+        if kind not in KINDS:
+            flask.abort(400, 'kind must be one of {}'.format(', '.join(KINDS)))
+        fmt, columns = _parse_format(), _parse_columns(SERIES_COLUMNS)
+        chunks = series_chunks(store, region, kind, _parse_day('start'), _parse_day('end'))
+        return _respond((len(store.days), str(store.days[-1])), fmt, columns, chunks)
+
+    @server.route(prefix + '/snapshot/<when>')
+    def _export_snapshot(when):
+        if when == 'latest':
+            i = len(history) - 1
+        else:
+            try:
+                when = pd.Timestamp(when)
+            except ValueError:
+                flask.abort(400, 'not a time: {}'.format(when))
+            if when < history.times[0]:
+                flask.abort(404, 'no snapshot as of {}; the first is {}'.format(when, history.times[0]))
+            i = history.locate(when)
+        fmt, columns = _parse_format(), _parse_columns(SNAPSHOT_COLUMNS)
+        chunks = snapshot_chunks(history, i, i + 1, columns)
+        return _respond((len(history), str(history.times[-1])), fmt, columns, chunks)
+
+    @server.route(prefix + '/snapshots')
+    def _export_snapshots():
+        start, end = _parse_day('start'), _parse_day('end')
+        first = history.times.searchsorted(start) if start is not None else 0
+        last = history.times.searchsorted(end + pd.Timedelta(days=1)) if end is not None else len(history)
+        fmt, columns = _parse_format(), _parse_columns(SNAPSHOT_COLUMNS)
+        chunks = snapshot_chunks(history, int(first), int(last), columns)
+        return _respond((len(history), str(history.times[-1])), fmt, columns, chunks)
+
+if __name__ == '__main__':
+    df = pd.read_csv('./2020-04-30-07-00_data.csv')
+    server = flask.Flask(__name__)
+    store = SeriesStore()
+    store.rollups = default_rollups(df, store=store)
+    register_exports(server, store, SnapshotHistory())
+    server.run(port=8050)
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+'''
+Animation frames of the outbreak map, one per day of the snapshot history.
+
+The marker sizes, colours and hover values of every place and day are
+computed once from asof.SnapshotHistory as (day x place) arrays, when the
+first frames are encoded. A region
+scope (Worldwide, a continent or a country tab) is a subset of the place
+columns, and its frames are encoded once per scope and data version:
+
+* the trace carries everything that never changes (coordinates, names,
+  the hover template and the colour scale),
+* the first frame carries the full state of the first day,
+* every later frame carries only the properties that changed since the
+  day before (a day without new cases ships an empty update).
+
+Hover strings are formatted in the browser from numeric customdata, and
+colours are 0/1 values on a two-colour scale, so a frame is a few numbers
+per place instead of a Scattermapbox with a hover string per marker.
+Because later frames are deltas, the animation always plays from the
+first frame (the play button restarts it) instead of jumping to a day.
+
+Usage:
+    python frames.py
+    python frames.py --scope Europe
+'''
+import json
+import argparse
+
+import pandas as pd
+import numpy as np
+
+from asof import SnapshotHistory
+
+###################################
+# Private function and variable
+###################################
+
+# Country tabs of the app -> Country/Region in the snapshots
+COUNTRY_SCOPES = {'Australia': 'Australia', 'Canada': 'Canada', 'Mainland China': 'China', 'United States': 'US'}
+# Hover of the markers from customdata: Active, Confirmed, Recovered, Deaths, Death rate, Confirmed/100k
+HOVERTEMPLATE = ("<b>%{text}</b><br><br>" +
+                 "Active: %{customdata[0]:,d}<br>Confirmed: %{customdata[1]:,d}<br>" +
+                 "Recovered: %{customdata[2]:,d}<br>Death: %{customdata[3]:,d}<br>" +
+                 "Death rate: %{customdata[4]:.2%}<br>Confirmed cases/100k population: %{customdata[5]:.0f}<br>" +
+                 "<extra></extra>")
+COLORSCALE = [[0, '#1a9622'], [1, '#d7191c']]
+
+def _place_names(keys):
+    '''Marker names as in update_figures: 'Province, Country', or the region alone'''
+    names = []
+    for key in keys:
+        area, region = key.split('|', 1)
+        if area and region not in ('Hong Kong', 'Macau', 'Taiwan'):
+            names.append(area + ', ' + region)
+        else:
+            names.append(area or region)
+    return names
+
+def _tolist(values):
+    '''JSON-ready list: NaN as None, integers as int'''
+    values = np.asarray(values)
+    if values.dtype.kind == 'f':
+        return [None if v != v else v for v in values.tolist()]
+    return values.tolist()
+
+def _unflatten(state):
+    '''{'marker.size': x, 'customdata': y} -> {'marker': {'size': x}, 'customdata': y}'''
+    nested = {}
+    for name, value in state.items():
+        parent, _, child = name.rpartition('.')
+        (nested.setdefault(parent, {}) if parent else nested)[child] = value
+    return nested
+
+###################################
+# Public function
+###################################
+
+class MapFrames:
+    '''(day x place) marker arrays of the snapshot history, encoded as map animation frames per scope'''
+
+    def __init__(self, history):
+        if history.reference is None:
+            raise ValueError('MapFrames needs a SnapshotHistory with a reference (the latest data)')
+        self.history = history
+        self.places = history.reference[history.reference['lat'].notnull()]
+        self.keys = self.places.index
+        self.countries = np.array([key.split('|', 1)[1] for key in self.keys])
+        self.days = history.days
+        self.version = (len(history), str(history.times[-1]))
+        self.cache = {}   # (scope, version) -> encoded frames
+        self._counts = None   # {case type: (day x place) array}, built on first use
+
+    def counts(self):
+        '''
+        {case type: (day x place) array} of every snapshot day, built on the
+        first call only, so that an app that never plays the map skips it
+        '''
+        if self._counts is None:
+            column = pd.Series(np.arange(len(self.keys)), index=self.keys)
+            counts = {c: np.zeros((len(self.days), len(self.keys)), dtype=np.int64)
+                      for c in ['Confirmed', 'Recovered', 'Deaths']}
+            for d, day in enumerate(self.days):
+                places = self.history.places(self.history.locate_day(day))
+                cols = column.reindex(places['Province/State'].fillna('') + '|' + places['Country/Region']).values
+                found = ~np.isnan(cols)
+                for c, array in counts.items():
+                    np.add.at(array[d], cols[found].astype(np.int64), places[c].values[found])
+            self._counts = counts
+        return self._counts
+
+    @property
+    def confirmed(self):
+        return self.counts()['Confirmed']
+
+    @property
+    def recovered(self):
+        return self.counts()['Recovered']
+
+    @property
+    def deaths(self):
+        return self.counts()['Deaths']
+
+    @property
+    def scopes(self):
+        return ['Worldwide'] + sorted(self.places['Continent'].dropna().unique()) + list(COUNTRY_SCOPES)
+
+    def columns(self, scope):
+        '''Place columns of a scope'''
+        if scope == 'Worldwide':
+            return np.arange(len(self.keys))
+        if scope in COUNTRY_SCOPES:
+            return np.flatnonzero(self.countries == COUNTRY_SCOPES[scope])
+        return np.flatnonzero((self.places['Continent'] == scope).values)
+
+    def day_state(self, d, cols):
+        '''{property: list} of the markers of day d: sizes, 0/1 colours and hover values'''
+        confirmed = self.confirmed[d, cols]
+        active = confirmed - self.recovered[d, cols] - self.deaths[d, cols]
+        population = self.places['Population'].values[cols].astype(float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            death_rate = np.where(confirmed > 0, self.deaths[d, cols] / np.maximum(confirmed, 1), np.nan)
+            per_100k = np.where(population > 0, confirmed / population * 100000, np.nan)
+        hover = [_tolist(active), _tolist(confirmed), _tolist(self.recovered[d, cols]), _tolist(self.deaths[d, cols]),
+                 _tolist(np.round(death_rate, 4)), _tolist(np.round(per_100k))]
+        return {
+            'marker.size': _tolist(np.round(confirmed ** (1/3), 1)),
+            'marker.color': _tolist((active > 0).astype(np.int8)),
+            'customdata': [list(row) for row in zip(*hover)],
+        }
+
+    def encode(self, scope='Worldwide'):
+        '''
+        {'trace', 'frames', 'sizeref'} of a scope: the trace shows the last
+        day, the first frame the full first day and later frames the changes.
+        '''
+        key = (scope, self.version)
+        if key in self.cache:
+            return self.cache[key]
+        cols = self.columns(scope)
+        frames, previous = [], None
+        for d, day in enumerate(self.days):
+            state = self.day_state(d, cols)
+            changed = {k: v for k, v in state.items() if previous is None or v != previous[k]}
+            frames.append({'name': day.strftime('%Y-%m-%d'), 'traces': [0],
+                           'data': [dict(type='scattermapbox', **_unflatten(changed))]})
+            previous = state
+        final = self.confirmed[-1, cols]
+        sizeref = 2. * np.sqrt(final.max()) / (100. ** 2) if len(cols) and final.max() > 0 else 1
+        trace = dict(
+            type='scattermapbox',
+            lat=_tolist(self.places['lat'].values[cols]),
+            lon=_tolist(self.places['lon'].values[cols]),
+            mode='markers',
+            text=_place_names(self.keys[cols]),
+            hovertemplate=HOVERTEMPLATE,
+            **_unflatten(previous or {}),
+        )
+        trace['marker'].update(colorscale=COLORSCALE, cmin=0, cmax=1, sizemin=0, sizemode='area', sizeref=sizeref)
+        self.cache[key] = {'trace': trace, 'frames': frames, 'sizeref': sizeref}
+        return self.cache[key]
+
+def add_animation(fig, encoded, duration=150):
+    '''
+    Figure dict of fig (a go.Figure) with the scope's trace, frames and a
+    play/pause button. A dict, so that plotly does not validate every frame.
+    '''
+    fig.update_layout(updatemenus=[dict(
+        type='buttons', showactive=False, direction='left', x=0.01, y=0.99, xanchor='left', yanchor='top',
+        pad={'r': 5, 't': 5},
+        buttons=[
+            dict(label='Play', method='animate',
+                 args=[None, {'frame': {'duration': duration, 'redraw': True},
+                              'transition': {'duration': 0}, 'fromcurrent': False, 'mode': 'immediate'}]),
+            dict(label='Pause', method='animate',
+                 args=[[None], {'frame': {'duration': 0, 'redraw': False}, 'mode': 'immediate'}]),
+        ],
+    )])
+    figure = fig.to_plotly_json()
+    figure['data'] = [encoded['trace']]
+    figure['frames'] = encoded['frames']
+    return figure
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scope', nargs='+', default=['Worldwide', 'Europe', 'United States'])
+    args = parser.parse_args()
+
+    map_frames = MapFrames(SnapshotHistory(reference=pd.read_csv('./2020-04-30-07-00_data.csv')))
+    for scope in args.scope:
+        encoded = map_frames.encode(scope)
+        cols = map_frames.columns(scope)
+        # The same days as full figures: every marker property and a hover string per marker
+        full = 0
+        for d in range(len(map_frames.days)):
+            state = map_frames.day_state(d, cols)
+            hovertext = ['Active: {:,d}<br>Confirmed: {:,d}<br>Recovered: {:,d}<br>Death: {:,d}<br>'
+                         'Death rate: {}<br>Confirmed cases/100k population: {}'.format(*row) for row in state['customdata']]
+            full += len(json.dumps(dict(encoded['trace'], hovertext=hovertext, customdata=None,
+                                        marker=dict(size=state['marker.size'], color=state['marker.color']))))
+        delta = len(json.dumps([encoded['trace'], encoded['frames']]))
+        print('{:<14} {:>4} places {:>4} days: {:>9,d} bytes as frames, {:>11,d} as full figures ({:.1%})'.format(
+            scope, len(cols), len(map_frames.days), delta, full, delta / full))
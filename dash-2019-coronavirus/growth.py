@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+'''
+Current growth rate and doubling time of every region.
+
+The growth of a region on a day is the slope of a least-squares line
+through the log of its cumulative count over the last WINDOW days. The
+slopes of all regions and days come from prefix sums over days of the
+five sums a regression needs (n, t, t^2, log y, t log y): every window is
+the difference of two prefix sums, O(1) whatever its length, and all
+windows of all regions are computed at once. append() adds a day from
+the last prefix sums only.
+
+A window is fitted only when every day in it has at least MIN_COUNT
+cases, since the log of a handful of cases is mostly noise. The daily
+growth rate is exp(slope) - 1 and the doubling time ln 2 / slope, NaN
+when the count is not growing.
+
+Usage:
+    python growth.py Italy Spain US 'New York'
+    python growth.py --window 14 --case Deaths Italy
+'''
+import argparse
+
+import pandas as pd
+import numpy as np
+
+from rollup import CASE_TYPES
+from series import SeriesStore
+
+###################################
+# Private function and variable
+###################################
+
+WINDOW = 7
+MIN_COUNT = 10
+# Prefix sums of the regression, in this order along the first axis
+SUMS = ['n', 't', 'tt', 'y', 'ty']
+
+def _terms(cumulative, t):
+    '''(SUMS, ...) terms of one or more days: cumulative (..., day), t the day numbers'''
+    valid = np.nan_to_num(cumulative) >= MIN_COUNT
+    y = np.where(valid, np.log(np.where(valid, cumulative, 1)), 0)
+    t = np.broadcast_to(t, cumulative.shape) * valid
+    return np.stack([valid.astype(float), t, t * t, y, t * y])
+
+def _fit(sums, window):
+    '''(slope, fitted log count at the last day of the window) of window sums, NaN unless the window is full'''
+    n, t, tt, y, ty = sums
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = (n * ty - t * y) / (n * tt - t * t)
+        # The days of a full window are consecutive, so its last day is (window - 1) / 2 after the mean day
+        last = y / n + slope * (window - 1) / 2.
+    full = n == window
+    return np.where(full, slope, np.nan), np.where(full, last, np.nan)
+
+###################################
+# Public function
+###################################
+
+class GrowthEstimator:
+    '''Sliding-window log-linear fits of the (case type, region, day) cumulative counts of every region'''
+
+    def __init__(self, regions, days, cumulative, window=WINDOW):
+        self.regions = list(regions)
+        self.index = {r: i for i, r in enumerate(self.regions)}
+        self.days = pd.DatetimeIndex(days)
+        self.window = window
+        # Prefix sums (SUMS, case type, region, day), with a leading day of zeros
+        terms = _terms(cumulative, np.arange(cumulative.shape[-1], dtype=float))
+        self.prefix = np.concatenate([np.zeros(terms.shape[:-1] + (1,)), np.cumsum(terms, axis=-1)], axis=-1)
+        self.slope, self.last = self._windows(0)
+
+    @classmethod
+    def from_series(cls, store, window=WINDOW):
+        '''Estimator of the regions of a series.SeriesStore'''
+        return cls(store.regions, store.days, store.values, window)
+
+    def _windows(self, start):
+        '''(slope, last) of the windows ending on days start, start+1, ... (zero sums before the first day)'''
+        ends = np.arange(start, self.prefix.shape[-1] - 1) + 1
+        sums = self.prefix[..., ends] - self.prefix[..., np.maximum(ends - self.window, 0)]
+        return _fit(sums, self.window)
+
+    def append(self, day, cumulative):
+        '''Add a day: cumulative is the (case type, region) array of its counts'''
+        t = float(self.prefix.shape[-1] - 1)
+        terms = _terms(cumulative[..., None], np.array([t]))
+        self.prefix = np.concatenate([self.prefix, self.prefix[..., -1:] + terms], axis=-1)
+        slope, last = self._windows(self.prefix.shape[-1] - 2)
+        self.slope = np.concatenate([self.slope, slope], axis=-1)
+        self.last = np.concatenate([self.last, last], axis=-1)
+        self.days = self.days.append(pd.DatetimeIndex([pd.Timestamp(day)]))
+
+    def _day(self, day):
+        '''Index of a day (default: the last one); the last day at or before it'''
+        if day is None:
+            return len(self.days) - 1
+        return int(self.days.searchsorted(pd.Timestamp(day).normalize(), side='right')) - 1
+
+    def latest(self, regions, case_type='Confirmed', day=None):
+        '''DataFrame of 'Growth rate' (per day) and 'Doubling time' (days) of regions, NaN for unknown ones'''
+        d = self._day(day)
+        rows = np.array([self.index.get(r, -1) for r in regions], dtype=np.int64)
+        slope = self.slope[CASE_TYPES.index(case_type), rows, d] if d >= 0 else np.full(len(rows), np.nan)
+        slope = np.where(rows >= 0, slope, np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            doubling = np.where(slope > 0, np.log(2) / slope, np.nan)
+        return pd.DataFrame({'Growth rate': np.expm1(slope), 'Doubling time': doubling}, index=list(regions))
+
+    def fit(self, region, case_type='Confirmed', day=None):
+        '''(slope, fitted count on the last day) of a region, or None without a fit'''
+        d, r = self._day(day), self.index.get(region)
+        if r is None or d < 0:
+            return None
+        c = CASE_TYPES.index(case_type)
+        slope, last = self.slope[c, r, d], self.last[c, r, d]
+        return None if np.isnan(slope) else (slope, np.exp(last))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('regions', nargs='*', default=['Worldwide', 'US', 'Italy', 'Brazil', 'New York'])
+    parser.add_argument('--window', type=int, default=WINDOW)
+    parser.add_argument('--case', default='Confirmed', choices=CASE_TYPES)
+    args = parser.parse_args()
+
+    growth = GrowthEstimator.from_series(SeriesStore(), args.window)
+    print(growth.latest(args.regions, args.case).to_string(float_format='{:.3f}'.format))
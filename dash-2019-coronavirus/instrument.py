@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+'''
+Timing and payload metrics of the app's callbacks.
+
+instrument(app) must be called right after the app is created, before the
+first @app.callback. It wraps every callback registered afterwards and
+hooks the Flask server, so that for every callback request it records:
+
+* the wall time of the whole request,
+* the time spent in the callback function itself (building the figure or
+  table), and the rest of the request (mostly dash's JSON serialisation),
+* the size of the response and the input that triggered the callback.
+
+Times and sizes go into fixed-bucket histograms in memory (a bisect and a
+few additions per request, a few microseconds against callbacks that take
+milliseconds), served in the Prometheus text format on /metrics to local
+clients only. With trace_dir, every request also writes a Chrome trace
+event file (open in chrome://tracing, Perfetto or speedscope) with the
+request, callback and serialisation spans.
+
+Usage:
+    DASH_METRICS=1 python app.py                       # then curl localhost:8050/metrics
+    DASH_METRICS=1 DASH_TRACE_DIR=./traces python app.py
+'''
+import os
+import json
+import time
+import bisect
+import threading
+import functools
+from collections import Counter
+
+import flask
+
+###################################
+# Private function and variable
+###################################
+
+# Upper bounds of the histogram buckets: 0.1 ms to ~52 s, 1 KiB to 64 MiB
+SECONDS_BUCKETS = [1e-4 * 2**k for k in range(20)]
+BYTES_BUCKETS = [1024 * 2**k for k in range(17)]
+
+PHASES = ['total', 'figure', 'serialize']
+LOCAL_ADDRESSES = ('127.0.0.1', '::1', 'localhost')
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _triggered():
+    '''prop_id of the input that triggered the running callback'''
+    import dash
+    try:
+        triggered = dash.callback_context.triggered
+    except Exception:
+        return 'unknown'
+    return ','.join(t['prop_id'] for t in triggered) if triggered else 'initial'
+
+def _is_callback_request():
+    return flask.request.path.endswith('_dash-update-component')
+
+###################################
+# Public function
+###################################
+
+class Histogram:
+    '''Cumulative-bucket histogram with a count and a sum, as Prometheus expects'''
+
+    def __init__(self, buckets):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        '''Upper bound of the bucket holding the q-quantile (None when empty)'''
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets + [float('inf')], self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+
+class CallbackMetrics:
+    '''Histograms and trigger counts of every instrumented callback'''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.seconds = {}   # (callback, phase) -> Histogram
+        self.bytes = {}     # callback -> Histogram
+        self.triggers = Counter()  # (callback, prop_id) -> calls
+
+    def record(self, callback, total, figure, size, trigger):
+        with self.lock:
+            for phase, value in zip(PHASES, (total, figure, total - figure)):
+                key = (callback, phase)
+                if key not in self.seconds:
+                    self.seconds[key] = Histogram(SECONDS_BUCKETS)
+                self.seconds[key].observe(value)
+            if callback not in self.bytes:
+                self.bytes[callback] = Histogram(BYTES_BUCKETS)
+            self.bytes[callback].observe(size)
+            self.triggers[(callback, trigger)] += 1
+
+    def summary(self):
+        '''{callback: {calls, median and p95 total seconds, mean figure and serialize seconds, mean bytes}}'''
+        with self.lock:
+            rows = {}
+            for (callback, phase), h in self.seconds.items():
+                row = rows.setdefault(callback, {'calls': h.count})
+                row['{}_mean'.format(phase)] = h.sum / h.count
+                if phase == 'total':
+                    row['total_p50'], row['total_p95'] = h.quantile(0.5), h.quantile(0.95)
+            for callback, h in self.bytes.items():
+                rows[callback]['bytes_mean'] = h.sum / h.count
+            return rows
+
+    def exposition(self):
+        '''All metrics in the Prometheus text exposition format'''
+        lines = []
+        with self.lock:
+            for name, kind, series in (
+                    ('dash_callback_seconds', 'phase', self.seconds),
+                    ('dash_callback_response_bytes', None, self.bytes)):
+                lines.append('# TYPE {} histogram'.format(name))
+                for key, h in sorted(series.items()):
+                    labels = 'callback="{}"'.format(_label(key[0] if kind else key))
+                    if kind:
+                        labels += ',phase="{}"'.format(key[1])
+                    seen = 0
+                    for bound, count in zip(h.buckets, h.counts):
+                        seen += count
+                        lines.append('{}_bucket{{{},le="{:g}"}} {}'.format(name, labels, bound, seen))
+                    lines.append('{}_bucket{{{},le="+Inf"}} {}'.format(name, labels, h.count))
+                    lines.append('{}_sum{{{}}} {}'.format(name, labels, h.sum))
+                    lines.append('{}_count{{{}}} {}'.format(name, labels, h.count))
+            lines.append('# TYPE dash_callback_trigger_total counter')
+            for (callback, trigger), count in sorted(self.triggers.items()):
+                lines.append('dash_callback_trigger_total{{callback="{}",input="{}"}} {}'.format(
+                    _label(callback), _label(trigger), count))
+        return '\n'.join(lines) + '\n'
+
+def write_trace(trace_dir, callback, start, figure_start, figure_end, end, size, trigger):
+    '''One Chrome trace event file with the request, callback and serialisation spans'''
+    pid, tid = os.getpid(), threading.get_ident()
+    us = lambda t: int(t * 1e6)
+    span = lambda name, a, b, args=None: {'name': name, 'ph': 'X', 'pid': pid, 'tid': tid,
+                                          'ts': us(a), 'dur': us(b) - us(a), 'args': args or {}}
+    events = [
+        span('request ' + callback, start, end, {'bytes': size, 'input': trigger}),
+        span('callback ' + callback, figure_start, figure_end),
+        span('serialize', figure_end, end),
+    ]
+    path = os.path.join(trace_dir, '{}-{}.json'.format(time.time_ns(), callback))
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+def instrument(app, trace_dir=None, route='/metrics'):
+    '''
+    Instrument the callbacks registered on app from now on and serve their
+    metrics on route (local clients only). Returns the CallbackMetrics.
+    '''
+    metrics = CallbackMetrics()
+    if trace_dir:
+        os.makedirs(trace_dir, exist_ok=True)
+
+    register = app.callback
+
+    def callback(*args, **kwargs):
+        decorator = register(*args, **kwargs)
+
+        def wrap(func):
+            @functools.wraps(func)
+            def timed(*values):
+                g = flask.g
+                g.callback_name = func.__name__
+                g.callback_trigger = _triggered()
+                g.callback_start = time.perf_counter()
+                try:
+                    return func(*values)
+                finally:
+                    g.callback_end = time.perf_counter()
+            return decorator(timed)
+        return wrap
+
+    app.callback = callback
+    server = app.server
+
+    @server.before_request
+    def _start_timer():
+        if _is_callback_request():
+            flask.g.request_start = time.perf_counter()
+
+    @server.after_request
+    def _record(response):
+        g = flask.g
+        if 'callback_end' not in g or 'request_start' not in g:
+            return response
+        end = time.perf_counter()
+        size = response.content_length or 0
+        figure = g.callback_end - g.callback_start
+        metrics.record(g.callback_name, end - g.request_start, figure, size, g.callback_trigger)
+        if trace_dir:
+            write_trace(trace_dir, g.callback_name, g.request_start, g.callback_start, g.callback_end,
+                        end, size, g.callback_trigger)
+        return response
+
+    @server.route(route)
+    def _metrics():
+        if flask.request.remote_addr not in LOCAL_ADDRESSES:
+            flask.abort(404)
+        return flask.Response(metrics.exposition(), mimetype='text/plain; version=0.0.4')
+
+    app.callback_metrics = metrics
+    return metrics
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+'''
+One loader for the text, CSV and Excel files of the dashboard data (and of
+the data_import_python notebook), with a transparent columnar cache.
+
+load() sniffs the format from the file content rather than its extension:
+workbooks are read with every sheet in one pass, Parquet/Feather directly,
+and delimited text with pandas using the detected delimiter and optional
+explicit dtypes. iter_chunks() streams large CSV files in chunks instead of
+line-by-line readline loops or csv.DictReader appends.
+
+The first load of a file is written to an uncompressed Arrow (Feather v2)
+cache keyed by path, modification time, size and read options, and later
+loads of the unchanged file memory-map the cache instead of parsing the file
+again. The cache needs pyarrow; without it files are simply parsed each time.
+build_store() of asof.py reads the raw_data snapshots through it.
+
+save_arrays() writes an .npz to a temporary file and renames it, so a
+reader in another worker never loads a half-written store.
+
+Usage:
+    python loader.py raw_data/*.csv
+    python loader.py ../data_import_python/sample.csv ../data_import_python/sample.xlsx
+'''
+import os
+import csv
+import sys
+import json
+import time
+import hashlib
+import warnings
+
+import pandas as pd
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+
+###################################
+# Private function and variable
+###################################
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+
+# Leading bytes of binary formats
+MAGIC = [
+    (b'PK\x03\x04', 'excel'),                            # xlsx / xlsm (zip container)
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'excel'),      # legacy xls (OLE2)
+    (b'PAR1', 'parquet'),
+    (b'ARROW1', 'feather'),
+]
+
+SNIFF_BYTES = 64 * 1024
+
+def _sniff_delimiter(path, encoding):
+    '''Delimiter of a text file from its first bytes; ',' if there is none'''
+    with open(path, 'r', encoding=encoding, newline='') as f:
+        sample = f.read(SNIFF_BYTES)
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=',;\t|').delimiter
+    except csv.Error:
+        # A single column (such as sample.txt) has no delimiter to find
+        return ','
+
+def _cache_key(path, options):
+    stat = os.stat(path)
+    key = repr((os.path.abspath(path), stat.st_mtime_ns, stat.st_size, sorted(options.items())))
+    return hashlib.sha1(key.encode()).hexdigest()[:20]
+
+def _read_cache(directory):
+    '''Frame or {sheet: frame} from a cache directory, memory-mapping every table'''
+    with open(os.path.join(directory, 'manifest.json')) as f:
+        manifest = json.load(f)
+    frames = [feather.read_table(os.path.join(directory, '{}.arrow'.format(i)), memory_map=True).to_pandas()
+              for i in range(len(manifest['names']))]
+    if manifest['kind'] == 'frame':
+        return frames[0]
+    return dict(zip(manifest['names'], frames))
+
+def _write_cache(directory, data):
+    '''Store a frame or {sheet: frame} as uncompressed Arrow files plus a manifest'''
+    kind, names, frames = ('frame', [None], [data]) if isinstance(data, pd.DataFrame) \
+        else ('book', list(data), list(data.values()))
+    tmp = directory + '.tmp'
+    os.makedirs(tmp, exist_ok=True)
+    try:
+        for i, frame in enumerate(frames):
+            # Keep the index (a RangeIndex only as metadata) and the pandas metadata that restores
+            # the dtype of the column labels (0, 1, ... with header=None), so a cached load is the same frame
+            table = pa.Table.from_pandas(frame, preserve_index=None)
+            # Uncompressed, so the file can be memory-mapped on the next load
+            feather.write_feather(table, os.path.join(tmp, '{}.arrow'.format(i)), compression='uncompressed')
+        with open(os.path.join(tmp, 'manifest.json'), 'w') as f:
+            json.dump({'kind': kind, 'names': names}, f)
+        os.replace(tmp, directory)
+    except (pa.ArrowException, OSError) as e:
+        # Columns Arrow cannot represent (e.g. mixed object types) are not cached
+        warnings.warn('not caching {}: {}'.format(directory, e))
+        for name in os.listdir(tmp):
+            os.remove(os.path.join(tmp, name))
+        os.rmdir(tmp)
+
+###################################
+# Public function
+###################################
+
+def sniff_format(path):
+    '''One of 'excel', 'parquet', 'feather' or 'csv', from the first bytes of the file'''
+    with open(path, 'rb') as f:
+        head = f.read(8)
+    for magic, fmt in MAGIC:
+        if head.startswith(magic):
+            return fmt
+    return 'csv'
+
+def read(path, dtype=None, parse_dates=None, encoding='utf-8', **kwargs):
+    '''
+    Parse a file without the cache. Workbooks return {sheet name: DataFrame}
+    with all sheets read in one pass; every other format returns a DataFrame.
+    '''
+    fmt = sniff_format(path)
+    if fmt == 'excel':
+        book = pd.read_excel(path, sheet_name=None, dtype=dtype, **kwargs)
+        if parse_dates:
+            book = {name: df.assign(**{c: pd.to_datetime(df[c]) for c in parse_dates if c in df})
+                    for name, df in book.items()}
+        return book
+    if fmt == 'parquet':
+        return pd.read_parquet(path, **kwargs)
+    if fmt == 'feather':
+        return pd.read_feather(path, **kwargs)
+    return pd.read_csv(path, sep=_sniff_delimiter(path, encoding), dtype=dtype, parse_dates=parse_dates,
+                       encoding=encoding, **kwargs)
+
+def load(path, dtype=None, parse_dates=None, cache=True, cache_dir=CACHE_DIR, **kwargs):
+    '''
+    read() through the columnar cache: unchanged files (same path, mtime,
+    size and read options) are memory-mapped from the cache.
+    '''
+    if not cache or pa is None:
+        return read(path, dtype=dtype, parse_dates=parse_dates, **kwargs)
+
+    options = dict(kwargs, dtype=dtype, parse_dates=parse_dates)
+    directory = os.path.join(cache_dir, _cache_key(path, options))
+    if os.path.exists(os.path.join(directory, 'manifest.json')):
+        return _read_cache(directory)
+
+    data = read(path, dtype=dtype, parse_dates=parse_dates, **kwargs)
+    os.makedirs(cache_dir, exist_ok=True)
+    _write_cache(directory, data)
+    return data
+
+def load_many(paths, **kwargs):
+    '''load() every path, as {file name: data}'''
+    return {os.path.basename(p): load(p, **kwargs) for p in paths}
+
+def save_arrays(path, arrays, compressed=False):
+    '''Save {name: array} as an .npz at path, atomically'''
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # A temporary name per process, so two workers building at once do not write the same file
+    tmp = '{}.{}.tmp.npz'.format(path, os.getpid())
+    (np.savez_compressed if compressed else np.savez)(tmp, **arrays)
+    os.replace(tmp, path)
+
+def iter_chunks(path, chunksize=100000, dtype=None, usecols=None, encoding='utf-8', **kwargs):
+    '''Stream a delimited text file as DataFrames of at most chunksize rows'''
+    if sniff_format(path) != 'csv':
+        raise ValueError('{} is not a delimited text file'.format(path))
+    reader = pd.read_csv(path, sep=_sniff_delimiter(path, encoding), dtype=dtype, usecols=usecols,
+                         encoding=encoding, chunksize=chunksize, **kwargs)
+    with reader:
+        for chunk in reader:
+            yield chunk
+
+def iter_lines(path, encoding='utf-8'):
+    '''Lines of a text file without their line ending, read lazily'''
+    with open(path, 'r', encoding=encoding) as f:
+        for line in f:
+            yield line.rstrip('\r\n')
+
+if __name__ == '__main__':
+    paths = sys.argv[1:] or ['./2020-04-30-07-00_data.csv', './AU_cases.xls']
+    for attempt in ('first load', 'cached load'):
+        start = time.perf_counter()
+        data = load_many(paths)
+        print('{}: {} files in {:.3f}s'.format(attempt, len(data), time.perf_counter() - start))
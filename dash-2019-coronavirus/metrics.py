@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+'''
+Derived metrics of the case tables, defined once.
+
+Every metric (Active, Death rate, Confirmed/100k, Positive rate, Tests/100k)
+is registered with @metric together with the columns it needs, and
+add_metrics() computes all of them for a table in vectorized column
+operations. derive_levels() does it for all the tables of the app (places,
+countries, Brazil and Germany states) in one pass over their concatenation
+and caches the result by data version.
+
+Ratios share one rule: a zero or missing denominator, as when no tests or
+no population are reported, gives NaN (an empty cell in dash_table) rather
+than inf or a division error.
+
+Usage:
+    from metrics import add_metrics, derive_levels, METRICS
+
+    @metric('Recovery rate', needs=['Recovered', 'Confirmed'])
+    def recovery_rate(df):
+        return ratio(df['Recovered'], df['Confirmed'])
+'''
+from collections import OrderedDict
+
+import pandas as pd
+import numpy as np
+
+###################################
+# Private function and variable
+###################################
+
+# name -> (function of a DataFrame returning a Series, needed columns, integer), in registration order
+METRICS = OrderedDict()
+
+# data version -> tables with metrics, as returned by derive_levels
+_CACHE = {}
+
+###################################
+# Public function
+###################################
+
+def metric(name, needs, integer=False):
+    '''
+    Register a derived metric: the decorated function maps a DataFrame to a
+    Series. An integer metric is cast back to int64 when all its inputs are
+    integers and it has no missing value.
+    '''
+    def register(func):
+        METRICS[name] = (func, list(needs), integer)
+        return func
+    return register
+
+def ratio(numerator, denominator, scale=1):
+    '''numerator / denominator * scale, NaN where the denominator is zero or missing'''
+    denominator = denominator.astype(float)
+    return numerator / denominator.where(denominator > 0) * scale
+
+@metric('Active', needs=['Confirmed', 'Recovered', 'Deaths'], integer=True)
+def active(df):
+    return df['Confirmed'] - df['Recovered'] - df['Deaths']
+
+@metric('Death rate', needs=['Deaths', 'Confirmed'])
+def death_rate(df):
+    return ratio(df['Deaths'], df['Confirmed'])
+
+@metric('Confirmed/100k', needs=['Confirmed', 'Population'])
+def confirmed_per_100k(df):
+    return ratio(df['Confirmed'], df['Population'], 100000).round()
+
+@metric('Positive rate', needs=['Confirmed', 'Tests'])
+def positive_rate(df):
+    return ratio(df['Confirmed'], df['Tests'])
+
+@metric('Tests/100k', needs=['Tests', 'Population'])
+def tests_per_100k(df):
+    return ratio(df['Tests'], df['Population'], 100000).round()
+
+def add_metrics(df, names=None):
+    '''Copy of df with every registered metric (or the given ones) whose columns df has'''
+    df = df.copy()
+    for name in names or METRICS:
+        func, needs, _ = METRICS[name]
+        if all(c in df.columns for c in needs):
+            df[name] = func(df)
+    return df
+
+def derive_levels(tables, version=None):
+    '''
+    add_metrics for a list of tables in one pass over their concatenation.
+    With a version (such as the name of the data file), the result is cached
+    and returned as is for later calls with the same version.
+    '''
+    if version is not None and version in _CACHE:
+        return _CACHE[version]
+    combined = pd.concat(tables, keys=range(len(tables)), sort=False)
+    combined = add_metrics(combined)
+    result = []
+    for i, table in enumerate(tables):
+        part = combined.xs(i, level=0)
+        # Keep only the columns of the table, plus the metrics it has the inputs for
+        extra = [m for m, (_, needs, _) in METRICS.items() if all(c in table.columns for c in needs)]
+        part = part[list(table.columns) + [m for m in extra if m not in table.columns]]
+        part.index = table.index
+        # The concatenation turns integers into floats where another table has gaps
+        dtypes = {c: table[c].dtype for c in table.columns if c not in METRICS}
+        dtypes.update({m: np.int64 for m in extra if METRICS[m][2] and part[m].notnull().all()
+                       and all(pd.api.types.is_integer_dtype(table[c]) for c in METRICS[m][1])})
+        result.append(part.astype(dtypes))
+    if version is not None:
+        _CACHE[version] = result
+    return result
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+'''
+Regional rollups computed from the country series of ./cumulative_data/.
+
+The country files are loaded once into a (case type x country x day) array,
+or taken from a series.SeriesStore that already holds them.
+A grouping (continents, the world, or any list of named country lists such
+as the EU, G7 or a personal watchlist) is a sparse group x country
+membership matrix, and every series of the grouping comes from one sparse
+matrix product with the country array. Results are cached by (grouping,
+data version), where the version changes with the country files.
+
+Rollups.series(name) returns a group in the layout of the files of
+./cumulative_data/ (newest day first, with the daily New columns), so the
+plot callbacks can draw a group exactly like a stored region. The app
+only uses the groups without a stored file (EU, G7, ...); Worldwide and
+the continents keep their files, and rollup.py prints both to compare.
+
+Usage:
+    python rollup.py
+    python rollup.py --group EU G7 Nordics
+'''
+import os
+import hashlib
+import argparse
+import warnings
+
+import pandas as pd
+import numpy as np
+from scipy import sparse
+
+###################################
+# Private function and variable
+###################################
+
+CUMULATIVE_DIR = './cumulative_data/'
+LATEST_DATA = './2020-04-30-07-00_data.csv'
+CASE_TYPES = ['Confirmed', 'Recovered', 'Deaths']
+NEW_COLUMNS = {'Confirmed': 'New', 'Recovered': 'New_recover', 'Deaths': 'New_death'}
+
+# Groups that have no stored file, by the country names of the data files
+CUSTOM_GROUPS = {
+    'EU': ['Austria', 'Belgium', 'Bulgaria', 'Croatia', 'Cyprus', 'Czechia', 'Denmark', 'Estonia',
+           'Finland', 'France', 'Germany', 'Greece', 'Hungary', 'Ireland', 'Italy', 'Latvia',
+           'Lithuania', 'Luxembourg', 'Malta', 'Netherlands', 'Poland', 'Portugal', 'Romania',
+           'Slovakia', 'Slovenia', 'Spain', 'Sweden'],
+    'G7': ['Canada', 'France', 'Germany', 'Italy', 'Japan', 'UK', 'US'],
+    'Nordics': ['Denmark', 'Finland', 'Iceland', 'Norway', 'Sweden', 'Faeroe Islands', 'Greenland'],
+}
+
+def _read_country(path):
+    '''(date_day, case type columns) of a file, one row per day'''
+    df = pd.read_csv(path, usecols=['date_day'] + CASE_TYPES)
+    # Files are newest first, so the first row of a day is its last update
+    return df.drop_duplicates('date_day').set_index('date_day').sort_index()
+
+def _matching(countries, latest, expected):
+    '''Mask of the countries whose latest Confirmed is the expected one (all without expected)'''
+    if expected is None:
+        return np.ones(len(countries), dtype=bool)
+    keep = np.array([latest[i] == expected.get(c, latest[i]) for i, c in enumerate(countries)], dtype=bool)
+    if not keep.all():
+        warnings.warn('cumulative file does not match the country, left out: {}'.format(
+            [c for c, k in zip(countries, keep) if not k]))
+    return keep
+
+def _data_version(paths):
+    stat = [(os.path.basename(p), os.stat(p).st_mtime_ns, os.stat(p).st_size) for p in paths]
+    return hashlib.sha1(repr(sorted(stat)).encode()).hexdigest()[:12]
+
+###################################
+# Public function
+###################################
+
+class Rollups:
+    '''
+    Country series as a (case type, country, day) array, named groupings of
+    the countries as sparse membership matrices, and their cached sums.
+    '''
+
+    def __init__(self, countries, days, values, version=None):
+        self.countries = list(countries)
+        self.column = {c: i for i, c in enumerate(self.countries)}
+        self.days = pd.DatetimeIndex(days)
+        self.values = values
+        self.version = version
+        self.groupings = {}   # grouping -> (group names, csr membership matrix)
+        self.groups = {}      # group -> (grouping, row)
+        self.cache = {}       # (grouping, version) -> (case type, group, day) array
+
+    @classmethod
+    def from_cumulative(cls, countries, directory=CUMULATIVE_DIR, expected=None):
+        '''
+        Load the files of the given countries. Days before a country's first
+        row count 0 and missing days repeat the previous day (the series are
+        cumulative).
+
+        expected (latest Confirmed by country) guards against files of
+        another region with the same name (Georgia.csv is the US state):
+        countries whose latest count differs are left out with a warning.
+        '''
+        paths = [os.path.join(directory, '{}.csv'.format(c)) for c in countries]
+        found = [(c, p) for c, p in zip(countries, paths) if os.path.exists(p)]
+        if len(found) < len(paths):
+            warnings.warn('no cumulative file for {}'.format(sorted(set(countries) - {c for c, _ in found})))
+        frames = [_read_country(p) for _, p in found]
+        keep = _matching([c for c, _ in found], [f['Confirmed'].iloc[-1] for f in frames], expected)
+        found = [x for x, k in zip(found, keep) if k]
+        frames = [f for f, k in zip(frames, keep) if k]
+        days = sorted(set().union(*(f.index for f in frames)))
+        values = np.stack([f.reindex(days).ffill().fillna(0)[CASE_TYPES].values.T for f in frames], axis=1)
+        return cls([c for c, _ in found], pd.to_datetime(days), values.astype(np.int64),
+                   _data_version([p for _, p in found]))
+
+    @classmethod
+    def from_series(cls, store, countries, directory=CUMULATIVE_DIR, expected=None):
+        '''
+        The countries of a series.SeriesStore, which already holds every file
+        of directory on one day axis, without reading the files again. Same
+        filling and expected check as from_cumulative.
+        '''
+        found = [c for c in countries if c in store.index]
+        if len(found) < len(countries):
+            warnings.warn('no cumulative file for {}'.format(sorted(set(countries) - set(found))))
+        confirmed = store.values[CASE_TYPES.index('Confirmed'), [store.index[c] for c in found], -1]
+        found = [c for c, k in zip(found, _matching(found, confirmed, expected)) if k]
+        values = np.nan_to_num(store.values[:, [store.index[c] for c in found], :])
+        paths = [os.path.join(directory, '{}.csv'.format(c)) for c in found]
+        return cls(found, store.days, values.astype(np.int64), _data_version(paths))
+
+    def add_grouping(self, grouping, groups):
+        '''
+        Register {group: [country, ...]} under the name grouping. Countries
+        without data are skipped with a warning; a group name can only
+        belong to one grouping.
+        '''
+        names, rows, cols = list(groups), [], []
+        for row, name in enumerate(names):
+            members = [c for c in groups[name] if c in self.column]
+            missing = set(groups[name]) - set(members)
+            if missing:
+                warnings.warn('{}: no data for {}'.format(name, sorted(missing)))
+            rows.extend([row] * len(members))
+            cols.extend(self.column[c] for c in members)
+        membership = sparse.csr_matrix((np.ones(len(rows), dtype=np.int64), (rows, cols)),
+                                       shape=(len(names), len(self.countries)))
+        self.groupings[grouping] = (names, membership)
+        self.groups.update({name: (grouping, row) for row, name in enumerate(names)})
+        # Drop the cached sums of a redefined grouping
+        self.cache = {k: v for k, v in self.cache.items() if k[0] != grouping}
+        return self
+
+    def aggregate(self, grouping):
+        '''(case type, group, day) sums of a grouping, from one sparse product'''
+        key = (grouping, self.version)
+        if key not in self.cache:
+            _, membership = self.groupings[grouping]
+            n_types, n_countries, n_days = self.values.shape
+            # countries x (case type, day) so all case types go through one product
+            flat = self.values.transpose(1, 0, 2).reshape(n_countries, n_types * n_days)
+            sums = membership @ flat
+            self.cache[key] = sums.reshape(-1, n_types, n_days).transpose(1, 0, 2)
+        return self.cache[key]
+
+    def __contains__(self, group):
+        return group in self.groups
+
+    def series(self, group):
+        '''A group in the layout of ./cumulative_data/*.csv, newest day first'''
+        grouping, row = self.groups[group]
+        sums = self.aggregate(grouping)[:, row, :]
+        df = pd.DataFrame(sums.T, columns=CASE_TYPES)
+        for case_type, new in NEW_COLUMNS.items():
+            df[new] = df[case_type].diff().fillna(df[case_type]).astype(np.int64)
+        df['date_day'] = self.days.strftime('%Y-%m-%d')
+        return df.iloc[::-1].reset_index(drop=True)
+
+def default_rollups(df_latest, directory=CUMULATIVE_DIR, custom_groups=CUSTOM_GROUPS, with_stored=False, store=None):
+    '''
+    Rollups of every country of df_latest with three groupings: 'world'
+    (Worldwide), 'continent' (df_latest['Continent']) and 'custom'. The
+    country series come from store (a series.SeriesStore of directory) when
+    given, and from the files otherwise.
+
+    Groups with a file of their own in directory (Worldwide and the
+    continents) are left to that file unless with_stored is True: some
+    country files are missing or belong to another region (Georgia), so
+    their rollups fall short of the stored totals.
+    '''
+    countries = sorted(df_latest['Country/Region'].unique())
+    expected = df_latest.groupby('Country/Region')['Confirmed'].sum()
+    if store is not None:
+        rollups = Rollups.from_series(store, countries, directory, expected)
+    else:
+        rollups = Rollups.from_cumulative(countries, directory, expected)
+    continents = df_latest.drop_duplicates('Country/Region').groupby('Continent')['Country/Region'].apply(list)
+    for grouping, groups in [('world', {'Worldwide': rollups.countries}),
+                             ('continent', continents.to_dict()),
+                             ('custom', custom_groups)]:
+        groups = {name: members for name, members in groups.items()
+                  if with_stored or not os.path.exists(os.path.join(directory, '{}.csv'.format(name)))}
+        if groups:
+            rollups.add_grouping(grouping, groups)
+    return rollups
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--group', nargs='+', default=['Worldwide', 'Europe', 'Asia', 'EU', 'G7', 'Nordics'])
+    args = parser.parse_args()
+
+    rollups = default_rollups(pd.read_csv(LATEST_DATA), with_stored=True)
+    for group in args.group:
+        latest = rollups.series(group).iloc[0]
+        stored = os.path.join(CUMULATIVE_DIR, '{}.csv'.format(group))
+        note = ''
+        if os.path.exists(stored):
+            old = pd.read_csv(stored).iloc[0]
+            note = '(stored file: {:,d} confirmed, {:,d} deaths)'.format(old['Confirmed'], old['Deaths'])
+        print('{:<10} {} {:>10,d} confirmed {:>8,d} deaths {}'.format(
+            group, latest['date_day'], latest['Confirmed'], latest['Deaths'], note))
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+'''
+Typeahead search over the names of every region of the app.
+
+A RegionIndex holds every name a region can be typed as (its display name,
+the short name of the data files and the alias spellings the scraping
+notebook renames, such as UAE, S. Korea or Macao), normalised to lower
+case ASCII without punctuation. A query is answered from two in-memory
+indexes, so only the few best matches go to the browser:
+
+* a sorted list of the names and of every word suffix of them ('york'
+  for New York), where the names starting with the query are one
+  bisect away,
+* an inverted index of character trigrams, used when the prefixes give
+  fewer than `limit` matches, to still find misspelt names (Phillipines).
+
+Matches rank whole-name prefixes first, then word prefixes, then trigram
+similarity; ties go to the larger region (more confirmed cases).
+
+Usage:
+    python search.py york
+    python search.py --limit 10 's korea' uae phillipines
+'''
+import re
+import time
+import argparse
+import bisect
+import heapq
+import unicodedata
+from collections import defaultdict
+
+import pandas as pd
+import numpy as np
+
+from rollup import CUSTOM_GROUPS
+
+###################################
+# Private function and variable
+###################################
+
+# Spellings of the scraped source -> names of the tables (see notebook/Scrap_data.ipynb), and
+# the full and short names of FULL_NAMES in app.py
+ALIASES = {
+    'S. Korea': 'South Korea',
+    'Macao': 'Macau',
+    'UAE': 'United Arab Emirates',
+    'Réunion': 'Reunion',
+    'USA': 'US',
+    'United States': 'US',
+    'United Kingdom': 'UK',
+    'Great Britain': 'UK',
+    'Dem. Rep. Congo': 'DRC',
+    'Central African Rep.': 'CAR',
+    'China': 'Mainland China',
+}
+# Tabs whose rows are regions with plots of their own; the other tabs (continents) are targets themselves
+ROW_TABS = ['Worldwide', 'Australia', 'Brazil', 'Canada', 'Germany', 'Mainland China', 'United States']
+# Tab part of the value of a custom group (EU, G7, ...), which is not a row of any table
+GROUP_TAB = 'Groups'
+# Trigram matches below this similarity are not offered
+MIN_SIMILARITY = 0.3
+
+def _normalise(name):
+    '''Lower case ASCII, punctuation as spaces, single spaces'''
+    name = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode()
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', name.lower()).split())
+
+def _trigrams(text):
+    padded = '  {} '.format(text)
+    return {padded[i:i+3] for i in range(len(padded) - 2)}
+
+###################################
+# Public function
+###################################
+
+class RegionIndex:
+    '''
+    Prefix and trigram indexes over region names. A target is anything
+    returned by search() (here a dropdown option); add() files it under
+    all of its names.
+    '''
+
+    def __init__(self):
+        self.targets = []     # target of every add()
+        self.weights = []     # ranking weight of every target (confirmed cases)
+        self.names = []       # target number of every normalised name
+        self.sizes = []       # trigram count of every normalised name
+        self.prefix = []      # sorted (name or word suffix, 0 for the whole name or 1, name number)
+        self.keys = []        # first column of prefix, for bisect
+        self.grams = defaultdict(list)  # trigram -> name numbers
+
+    def __len__(self):
+        return len(self.targets)
+
+    def add(self, target, names, weight=0):
+        '''File a target under its names (duplicates after normalising are dropped)'''
+        t = len(self.targets)
+        self.targets.append(target)
+        self.weights.append(weight)
+        for name in dict.fromkeys(_normalise(n) for n in names):
+            if not name:
+                continue
+            i = len(self.names)
+            self.names.append(t)
+            words = name.split(' ')
+            for w in range(len(words)):
+                self.prefix.append((' '.join(words[w:]), min(w, 1), i))
+            grams = _trigrams(name)
+            self.sizes.append(len(grams))
+            for gram in grams:
+                self.grams[gram].append(i)
+
+    def build(self):
+        '''Sort the prefix index once every target is added'''
+        self.prefix.sort()
+        self.keys = [key for key, _, _ in self.prefix]
+        return self
+
+    def search(self, query, limit=10):
+        '''At most limit targets for a typed query, best first, each target once'''
+        query = _normalise(query)
+        if not query:
+            return []
+        best = {}  # target number -> (rank, -weight), the smaller the better
+
+        def offer(t, rank):
+            key = (rank, -self.weights[t])
+            if key < best.get(t, (np.inf,)):
+                best[t] = key
+
+        start = bisect.bisect_left(self.keys, query)
+        stop = bisect.bisect_left(self.keys, query + '\uffff', lo=start)
+        for _, rank, i in self.prefix[start:stop]:
+            offer(self.names[i], rank)
+
+        if len(best) < limit and len(query) >= 3:
+            grams = _trigrams(query)
+            shared = defaultdict(int)
+            for gram in grams:
+                for i in self.grams.get(gram, ()):
+                    shared[i] += 1
+            # Jaccard similarity of the trigram sets of the query and a name
+            scored = ((n / (len(grams) + self.sizes[i] - n), i) for i, n in shared.items())
+            for score, i in heapq.nlargest(limit, scored):
+                if score >= MIN_SIMILARITY:
+                    # Ranks 2 to 3, after every prefix match
+                    offer(self.names[i], 3 - score)
+
+        return [self.targets[t] for t in heapq.nsmallest(limit, best, key=best.get)]
+
+def build_region_index(tables, aliases=ALIASES, groups=None):
+    '''
+    RegionIndex of the location tables of the app, {tab: table} with an
+    'id' column (the row id), the name in the first column and 'Confirmed',
+    and of the custom groups, {group: confirmed}. Targets are dropdown
+    options whose value is 'tab|row id' ('tab|' for a continent tab,
+    'Groups|group' for a group); a row is also found by its id and aliases.
+    '''
+    alias_names = defaultdict(list)
+    for alias, name in aliases.items():
+        alias_names[name].append(alias)
+    index = RegionIndex()
+    for tab, table in tables.items():
+        if tab not in ROW_TABS:
+            index.add({'label': tab, 'value': tab + '|'}, [tab], weight=table['Confirmed'].sum())
+            continue
+        for row_id, name, confirmed in zip(table['id'], table.iloc[:, 0], table['Confirmed']):
+            label = name if tab == 'Worldwide' else '{}, {}'.format(name, tab)
+            index.add({'label': label, 'value': '{}|{}'.format(tab, row_id)},
+                      [name, row_id] + alias_names[name] + alias_names[row_id], weight=confirmed)
+    for group, confirmed in (groups or {}).items():
+        index.add({'label': '{} (group)'.format(group), 'value': '{}|{}'.format(GROUP_TAB, group)}, [group], weight=confirmed)
+    return index.build()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('queries', nargs='*', default=['york', 'S. Korea', 'uae', 'phillipines', 'ger', 'c', 'eu', 'nordic'])
+    parser.add_argument('--limit', type=int, default=5)
+    args = parser.parse_args()
+
+    # Tables as in app.py: countries, provinces of the country tabs and continents
+    df = pd.read_csv('./2020-04-30-07-00_data.csv')
+    countries = df.groupby('Country/Region', as_index=False).agg({'Confirmed': 'sum', 'Continent': 'first'})
+    countries['id'] = countries['Country/Region'].replace({'China': 'Mainland China'})
+    tables = {'Worldwide': countries}
+    for tab, country in [('Australia', 'Australia'), ('Canada', 'Canada'), ('Mainland China', 'China'), ('United States', 'US')]:
+        provinces = df.loc[(df['Country/Region'] == country) & df['Province/State'].notnull(), ['Province/State', 'Confirmed']]
+        tables[tab] = provinces.assign(id=provinces['Province/State'])
+    for continent, table in countries.groupby('Continent'):
+        tables[continent] = table
+    groups = {g: countries.loc[countries['Country/Region'].isin(m), 'Confirmed'].sum() for g, m in CUSTOM_GROUPS.items()}
+    index = build_region_index(tables, groups=groups)
+
+    for query in args.queries:
+        start = time.perf_counter()
+        options = index.search(query, args.limit)
+        elapsed = time.perf_counter() - start
+        print('{:<12} {:6.3f} ms  {}'.format(query, elapsed * 1000, ' | '.join(o['label'] for o in options)))
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+'''
+Batched retrieval of the cumulative series of many regions.
+
+Every file of ./cumulative_data/ is read once into a (case type x region x
+day) array on a common day axis, kept as .npz under ./.cache/ and rebuilt
+when a file is newer than it. batch(regions) returns the series of N
+regions as one aligned array taken with a single fancy index, so an
+overlay of 20 regions costs about the same as one, instead of 20 CSV
+reads. Groups without a file (EU, G7, ...) come from rollup.Rollups on
+the same day axis.
+
+Days before a region's first row are NaN (not 0), so they leave a gap on
+a log axis instead of a drop to zero; missing days within a series repeat
+the previous day.
+
+Next to the cumulative series the store keeps the smoothed daily series
+of every region: the daily counts, their 7- and 14-day rolling means and
+an exponentially weighted mean. The rolling means of all regions come
+from one pass of cumulative-sum differences over the region x day
+matrix, and append() adds a day to every series from the last day alone.
+
+Usage:
+    python series.py Italy Spain 'New York' EU
+    python series.py --kind mean7 Italy Spain
+'''
+import os
+import glob
+import argparse
+
+import pandas as pd
+import numpy as np
+
+from loader import save_arrays
+from rollup import CASE_TYPES, default_rollups
+
+###################################
+# Private function and variable
+###################################
+
+CUMULATIVE_DIR = './cumulative_data/'
+STORE = './.cache/series.npz'
+
+# Files of cumulative_data that are not regions (or duplicate Worldwide)
+NOT_REGIONS = ['continent_name', 'The World', 'World']
+
+# Rolling mean windows (days) and span of the exponentially weighted mean
+WINDOWS = (7, 14)
+EWM_SPAN = 7
+# Series of the store, besides the running sums the rolling means are taken from
+KINDS = ['cumulative', 'daily'] + ['mean{}'.format(w) for w in WINDOWS] + ['ewm']
+
+def _region_files(directory):
+    return {os.path.basename(p)[:-4]: p for p in sorted(glob.glob(os.path.join(directory, '*.csv')))
+            if os.path.basename(p)[:-4] not in NOT_REGIONS}
+
+def _window_mean(sums, counts, w):
+    '''Mean of the last w days from running sums, NaN where the window is not full'''
+    shifted = lambda a: np.concatenate([np.zeros(a.shape[:-1] + (min(w, a.shape[-1]),)), a[..., :-w]], axis=-1)
+    full = (counts - shifted(counts)) == w
+    return np.where(full, (sums - shifted(sums)) / w, np.nan)
+
+###################################
+# Public function
+###################################
+
+def smooth(cumulative, windows=WINDOWS, span=EWM_SPAN):
+    '''
+    {kind: array} of the smoothed daily series of a (..., day) array of
+    cumulative counts, NaN before the start of a series, plus the running
+    sums and counts of daily values ('sum', 'count') that append() extends.
+
+    A rolling mean needs a full window, as pandas' rolling(w).mean(); the
+    weighted mean starts at the first day, as ewm(span, adjust=False).
+    '''
+    valid = ~np.isnan(cumulative)
+    previous = np.concatenate([np.zeros(cumulative.shape[:-1] + (1,)), np.nan_to_num(cumulative[..., :-1])], axis=-1)
+    daily = np.where(valid, cumulative - previous, np.nan)
+    series = {'cumulative': cumulative, 'daily': daily,
+              'sum': np.cumsum(np.nan_to_num(daily), axis=-1), 'count': np.cumsum(valid, axis=-1)}
+    for w in windows:
+        series['mean{}'.format(w)] = _window_mean(series['sum'], series['count'], w)
+    # The weighted mean is a recurrence over days, vectorized over the regions
+    alpha = 2. / (span + 1)
+    ewm = np.full(daily.shape, np.nan)
+    last = np.full(daily.shape[:-1], np.nan)
+    for t in range(daily.shape[-1]):
+        last = np.where(np.isnan(last), daily[..., t], alpha * daily[..., t] + (1 - alpha) * last)
+        ewm[..., t] = last
+    series['ewm'] = ewm
+    return series
+
+def build_store(directory=CUMULATIVE_DIR, store=STORE):
+    '''Read every region file once and save the (case type, region, day) arrays of every kind'''
+    files = _region_files(directory)
+    frames = []
+    for region, path in files.items():
+        df = pd.read_csv(path, usecols=['date_day'] + CASE_TYPES)
+        # Files are newest first, so the first row of a day is its last update
+        frames.append(df.drop_duplicates('date_day').set_index('date_day'))
+    days = sorted(set().union(*(f.index for f in frames)))
+    values = np.full((len(CASE_TYPES), len(frames), len(days)), np.nan)
+    for r, df in enumerate(frames):
+        df = df.sort_index()
+        first = days.index(df.index[0])
+        values[:, r, first:] = df.reindex(days[first:]).ffill()[CASE_TYPES].values.T
+    save_arrays(store, dict(regions=np.array(list(files)), days=np.array(days, dtype='datetime64[D]'), **smooth(values)))
+
+class SeriesStore:
+    '''Cumulative and smoothed daily series of every region of ./cumulative_data/ on one day axis'''
+
+    def __init__(self, directory=CUMULATIVE_DIR, store=STORE, rollups=None):
+        newest = max(os.path.getmtime(p) for p in _region_files(directory).values())
+        if not os.path.exists(store) or os.path.getmtime(store) < newest:
+            build_store(directory, store)
+        with np.load(store) as data:
+            self.regions = [str(r) for r in data['regions']]
+            self.days = pd.DatetimeIndex(data['days'])
+            self.series = {k: data[k] for k in data.files if k not in ('regions', 'days')}
+        self.index = {r: i for i, r in enumerate(self.regions)}
+        self.rollups = rollups
+
+    @property
+    def values(self):
+        '''(case type, region, day) cumulative counts'''
+        return self.series['cumulative']
+
+    def __contains__(self, region):
+        return region in self.index or (self.rollups is not None and region in self.rollups)
+
+    def append(self, day, cumulative):
+        '''
+        Add a day: cumulative is the (case type, region) array of its counts,
+        NaN for a region without an update (its last count is repeated).
+        Every series is extended from its last day, without a recompute.
+        '''
+        last = {k: v[..., -1] for k, v in self.series.items()}
+        cumulative = np.where(np.isnan(cumulative), last['cumulative'], cumulative)
+        valid = ~np.isnan(cumulative)
+        daily = np.where(valid, cumulative - np.nan_to_num(last['cumulative']), np.nan)
+        new = {'cumulative': cumulative, 'daily': daily,
+               'sum': last['sum'] + np.nan_to_num(daily), 'count': last['count'] + valid}
+        n_days = len(self.days)
+        for w in WINDOWS:
+            # Running sums w days before the new day (0 before the first day)
+            before = {k: self.series[k][..., n_days - w] if n_days >= w else 0 for k in ('sum', 'count')}
+            full = new['count'] - before['count'] == w
+            new['mean{}'.format(w)] = np.where(full, (new['sum'] - before['sum']) / w, np.nan)
+        alpha = 2. / (EWM_SPAN + 1)
+        new['ewm'] = np.where(np.isnan(last['ewm']), daily, alpha * daily + (1 - alpha) * last['ewm'])
+        self.series = {k: np.concatenate([v, new[k][..., None]], axis=-1) for k, v in self.series.items()}
+        self.days = self.days.append(pd.DatetimeIndex([pd.Timestamp(day)]))
+
+    def batch(self, regions, case_types=CASE_TYPES, kind='cumulative'):
+        '''
+        (days, found regions, (case type, region, day) array) of a kind of
+        series (see KINDS) of the given regions in their order; rolled-up
+        groups take precedence over files and unknown regions are left out.
+        '''
+        found = [r for r in regions if r in self]
+        rows = [CASE_TYPES.index(c) for c in case_types]
+        values = self.series[kind][np.ix_(rows, [self.index.get(r, 0) for r in found])]
+        grouped = [i for i, r in enumerate(found) if self.rollups is not None and r in self.rollups]
+        if grouped:
+            # Group sums sit on the day axis of the country files, a subset of ours
+            position = self.days.get_indexer(self.rollups.days)
+            cumulative = np.full((len(rows), len(grouped), len(self.days)), np.nan)
+            for j, i in enumerate(grouped):
+                grouping, row = self.rollups.groups[found[i]]
+                cumulative[:, j, position] = self.rollups.aggregate(grouping)[rows, row, :]
+            values[:, grouped, :] = cumulative if kind == 'cumulative' else smooth(cumulative)[kind]
+        return self.days, found, values
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('regions', nargs='*', default=['Italy', 'Spain', 'New York'])
+    parser.add_argument('--kind', default='cumulative', choices=KINDS)
+    args = parser.parse_args()
+
+    store = SeriesStore()
+    store.rollups = default_rollups(pd.read_csv('./2020-04-30-07-00_data.csv'), store=store)
+    days, found, values = store.batch(args.regions, kind=args.kind)
+    print(pd.DataFrame(values[0].T, index=days, columns=found).tail(10).round(1).to_string())
@@ -0,0 +1,14 @@
+import os
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+@pytest.fixture(scope='module', autouse=True)
+def in_project_dir():
+    '''Run every test (and module fixture) from the project directory, as the scripts are'''
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.chdir(os.path.dirname(HERE))
+        yield
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from rollup import CASE_TYPES
+from series import SeriesStore
+from growth import MIN_COUNT, GrowthEstimator
+
+@pytest.fixture(scope='module')
+def store(tmp_path_factory):
+    return SeriesStore(store=str(tmp_path_factory.mktemp('series') / 'series.npz'))
+
+def polyfit(cumulative, window):
+    '''(slope, fitted log count on the last day) of every window of a 1-d series, by np.polyfit'''
+    slope, last = np.full(len(cumulative), np.nan), np.full(len(cumulative), np.nan)
+    for d in range(window - 1, len(cumulative)):
+        y = cumulative[d - window + 1:d + 1]
+        if np.all(np.nan_to_num(y) >= MIN_COUNT):
+            coefficients = np.polyfit(np.arange(window), np.log(y), 1)
+            slope[d], last[d] = coefficients[0], np.polyval(coefficients, window - 1)
+    return slope, last
+
+@pytest.mark.parametrize('window', [7, 14])
+@pytest.mark.parametrize('region', ['Italy', 'US', 'New York', 'Worldwide'])
+@pytest.mark.parametrize('case_type', ['Confirmed', 'Deaths'])
+def test_windows_match_polyfit(store, region, case_type, window):
+    growth = GrowthEstimator.from_series(store, window)
+    c, r = CASE_TYPES.index(case_type), store.index[region]
+    slope, last = polyfit(store.values[c, r], window)
+    assert np.isfinite(slope).sum() > 20
+    np.testing.assert_allclose(growth.slope[c, r], slope, rtol=1e-6, atol=1e-9)
+    np.testing.assert_allclose(growth.last[c, r], last, rtol=1e-6)
+
+def test_append_matches_the_whole_series(store):
+    values = store.values
+    growth = GrowthEstimator(store.regions, store.days[:30], values[..., :30])
+    for d in range(30, len(store.days)):
+        growth.append(store.days[d], values[..., d])
+    whole = GrowthEstimator.from_series(store)
+    assert growth.days.equals(whole.days)
+    np.testing.assert_allclose(growth.slope, whole.slope, rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(growth.last, whole.last, rtol=1e-9)
+
+def test_latest_and_fit_agree(store):
+    growth = GrowthEstimator.from_series(store)
+    latest = growth.latest(['Italy', 'Atlantis'])
+    slope, count = growth.fit('Italy')
+    assert latest.loc['Italy', 'Growth rate'] == pytest.approx(np.expm1(slope))
+    assert latest.loc['Italy', 'Doubling time'] == pytest.approx(np.log(2) / slope)
+    _, last = polyfit(store.values[CASE_TYPES.index('Confirmed'), store.index['Italy']], 7)
+    assert count == pytest.approx(np.exp(last[-1]))
+    assert latest.loc['Atlantis'].isna().all()
+    assert growth.fit('Atlantis') is None
@@ -0,0 +1,52 @@
+import glob
+
+import pandas as pd
+import pytest
+
+import loader
+
+pytest.importorskip('pyarrow')
+
+LATEST = './2020-04-30-07-00_data.csv'
+SNAPSHOT = './raw_data/2020-03-13-21-00.csv'
+
+@pytest.fixture
+def one_column(tmp_path):
+    '''A single column text file, which has no delimiter to sniff'''
+    path = tmp_path / 'regions.txt'
+    path.write_text('Region\nItaly\nSpain\nJapan\n')
+    return str(path)
+
+@pytest.mark.parametrize('path, options', [
+    (LATEST, {}),
+    (LATEST, {'index_col': 0}),
+    (LATEST, {'index_col': [0, 1]}),
+    (LATEST, {'header': None}),
+    (LATEST, {'header': None, 'names': list('abcdefghijklmno')}),
+    (LATEST, {'parse_dates': ['Date_last_updated_AEDT']}),
+    (SNAPSHOT, {}),
+])
+def test_cached_load_is_the_first_load(tmp_path, path, options):
+    cache_dir = tmp_path / 'cache'
+    cold = loader.load(path, cache_dir=str(cache_dir), **options)
+    assert len(list(cache_dir.iterdir())) == 1
+    warm = loader.load(path, cache_dir=str(cache_dir), **options)
+    pd.testing.assert_frame_equal(warm, cold)
+    pd.testing.assert_frame_equal(warm, loader.read(path, **options))
+
+def test_one_column_file(tmp_path, one_column):
+    warm = loader.load(one_column, cache_dir=str(tmp_path / 'cache'))
+    pd.testing.assert_frame_equal(loader.load(one_column, cache_dir=str(tmp_path / 'cache')), warm)
+    assert warm['Region'].tolist() == ['Italy', 'Spain', 'Japan']
+
+def test_snapshots_read_as_read_csv():
+    for path in sorted(glob.glob('./raw_data/*.csv'))[::50]:
+        pd.testing.assert_frame_equal(loader.read(path), pd.read_csv(path))
+
+def test_cached_workbook_is_the_first_load(tmp_path):
+    pytest.importorskip('xlrd')
+    cold = loader.load('./AU_cases.xls', cache_dir=str(tmp_path))
+    warm = loader.load('./AU_cases.xls', cache_dir=str(tmp_path))
+    assert list(warm) == list(cold)
+    for sheet in cold:
+        pd.testing.assert_frame_equal(warm[sheet], cold[sheet])
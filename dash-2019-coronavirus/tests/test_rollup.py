@@ -0,0 +1,57 @@
+import os
+
+import pandas as pd
+import numpy as np
+import pytest
+
+from rollup import CASE_TYPES, CUMULATIVE_DIR, LATEST_DATA, CUSTOM_GROUPS, default_rollups
+from series import SeriesStore
+
+pytestmark = pytest.mark.filterwarnings('ignore::UserWarning')
+
+@pytest.fixture(scope='module')
+def df_latest():
+    return pd.read_csv(LATEST_DATA)
+
+def stored(region):
+    '''A file of ./cumulative_data/, one row per day, oldest first'''
+    return pd.read_csv(os.path.join(CUMULATIVE_DIR, '{}.csv'.format(region))).drop_duplicates('date_day') \
+        .set_index('date_day').sort_index()
+
+def test_groups_with_a_file_are_left_to_it(df_latest):
+    rollups = default_rollups(df_latest)
+    assert sorted(rollups.groups) == sorted(CUSTOM_GROUPS)
+
+def test_worldwide_series_is_the_stored_total(df_latest, tmp_path):
+    store = SeriesStore(store=str(tmp_path / 'series.npz'), rollups=default_rollups(df_latest))
+    days, found, values = store.batch(['Worldwide'])
+    assert found == ['Worldwide']
+    assert values[CASE_TYPES.index('Confirmed'), 0, -1] == df_latest['Confirmed'].sum()
+    expected = stored('Worldwide')[CASE_TYPES].reindex(days.strftime('%Y-%m-%d')).ffill()
+    np.testing.assert_array_equal(values[:, 0, :].T[expected.notnull().all(axis=1).values],
+                                  expected.dropna().values)
+
+@pytest.mark.parametrize('continent', ['Europe', 'Africa', 'North America', 'South America', 'Oceania'])
+def test_continent_rollups_match_the_stored_files(df_latest, continent):
+    rollups = default_rollups(df_latest, with_stored=True)
+    rolled = rollups.series(continent).set_index('date_day').sort_index()[CASE_TYPES]
+    expected = stored(continent)[CASE_TYPES]
+    common = rolled.index.intersection(expected.index)
+    assert len(common) > 90
+    pd.testing.assert_frame_equal(rolled.loc[common], expected.loc[common], check_dtype=False)
+
+def test_custom_group_is_the_sum_of_its_countries(df_latest):
+    rollups = default_rollups(df_latest)
+    latest = rollups.series('EU').iloc[0]
+    members = [c for c in CUSTOM_GROUPS['EU'] if os.path.exists(os.path.join(CUMULATIVE_DIR, '{}.csv'.format(c)))]
+    assert latest['Confirmed'] == sum(stored(c)['Confirmed'].iloc[-1] for c in members)
+
+def test_rollups_from_the_series_store_match_the_files(df_latest, tmp_path):
+    store = SeriesStore(store=str(tmp_path / 'series.npz'))
+    from_files, from_store = default_rollups(df_latest, with_stored=True), \
+        default_rollups(df_latest, with_stored=True, store=store)
+    assert from_store.countries == from_files.countries
+    assert from_store.days.equals(from_files.days)
+    np.testing.assert_array_equal(from_store.values, from_files.values)
+    for group in ['Worldwide', 'Asia'] + list(CUSTOM_GROUPS):
+        pd.testing.assert_frame_equal(from_store.series(group), from_files.series(group))
@@ -0,0 +1,46 @@
+import pandas as pd
+import numpy as np
+import pytest
+
+from rollup import CASE_TYPES
+from series import WINDOWS, EWM_SPAN, KINDS, smooth, SeriesStore
+
+@pytest.fixture(scope='module')
+def store(tmp_path_factory):
+    return SeriesStore(store=str(tmp_path_factory.mktemp('series') / 'series.npz'))
+
+def truncated(store, n_days):
+    '''A copy of the store with its first n_days only'''
+    copy = SeriesStore.__new__(SeriesStore)
+    copy.regions, copy.index, copy.rollups = store.regions, store.index, None
+    copy.days = store.days[:n_days]
+    copy.series = smooth(store.values[..., :n_days])
+    return copy
+
+@pytest.mark.parametrize('n_days', [1, 5, 60])
+def test_append_matches_smooth_of_the_whole_series(store, n_days):
+    copy = truncated(store, n_days)
+    for d in range(n_days, len(store.days)):
+        copy.append(store.days[d], store.values[..., d])
+    assert copy.days.equals(store.days)
+    for kind in KINDS + ['sum', 'count']:
+        np.testing.assert_allclose(copy.series[kind], store.series[kind], rtol=1e-9, err_msg=kind)
+
+def test_append_repeats_the_last_count_without_an_update(store):
+    copy = truncated(store, len(store.days))
+    cumulative = store.values[..., -1].copy()
+    italy = store.index['Italy']
+    cumulative[:, italy] = np.nan
+    copy.append(store.days[-1] + pd.Timedelta(days=1), cumulative)
+    np.testing.assert_array_equal(copy.values[:, italy, -1], store.values[:, italy, -1])
+    np.testing.assert_array_equal(copy.series['daily'][:, italy, -1], 0)
+
+@pytest.mark.parametrize('region', ['Italy', 'Worldwide', 'New York'])
+def test_smooth_matches_pandas(store, region):
+    cumulative = pd.Series(store.values[CASE_TYPES.index('Confirmed'), store.index[region]])
+    daily = cumulative.diff().fillna(cumulative)
+    series = smooth(cumulative.values)
+    np.testing.assert_allclose(series['daily'], daily)
+    for w in WINDOWS:
+        np.testing.assert_allclose(series['mean{}'.format(w)], daily.rolling(w).mean(), rtol=1e-9)
+    np.testing.assert_allclose(series['ewm'], daily.ewm(span=EWM_SPAN, adjust=False).mean(), rtol=1e-9)
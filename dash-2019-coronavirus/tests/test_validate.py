@@ -0,0 +1,88 @@
+import shutil
+
+import pandas as pd
+import numpy as np
+import pytest
+
+from asof import RAW_DIR, TEXT_COLUMNS, _snapshot_files, _columnar, cleanse_snapshot, build_store, SnapshotHistory
+from validate import ISSUE_COLUMNS, SnapshotValidator
+
+# Around the duplicate Grand Princess row of 2020-03-13 21:00
+FIRST, LAST = pd.Timestamp('2020-03-12'), pd.Timestamp('2020-03-15')
+
+@pytest.fixture(scope='module')
+def snapshots():
+    '''{time: raw snapshot} from FIRST to LAST'''
+    return {when: pd.read_csv(path) for when, path in _snapshot_files(RAW_DIR).items() if FIRST <= when < LAST}
+
+def store_arrays(snapshots):
+    frames = [cleanse_snapshot(df) for df in snapshots.values()]
+    snapshot = np.repeat(np.arange(len(frames)), [len(f) for f in frames])
+    return _columnar(list(snapshots), snapshot, pd.concat(frames, ignore_index=True))
+
+def comparable(issues):
+    '''Issues without the row counts of the unknown check, which only the whole store has'''
+    issues = issues.assign(value=issues['value'].where(issues['check'] != 'unknown'))
+    issues[TEXT_COLUMNS] = issues[TEXT_COLUMNS].fillna('').astype(object)
+    return issues.astype({'snapshot': 'datetime64[ns]', 'value': float, 'reference': float}) \
+        .sort_values(ISSUE_COLUMNS, kind='stable').reset_index(drop=True)
+
+def test_incremental_validation_matches_the_store(snapshots):
+    store = SnapshotValidator().validate_store(store_arrays(snapshots))
+    validator = SnapshotValidator()
+    incremental = pd.concat([validator.validate_snapshot(when, df).issues for when, df in snapshots.items()],
+                            ignore_index=True)
+    assert (store.issues['check'] == 'duplicate').sum() == 1
+    pd.testing.assert_frame_equal(comparable(incremental), comparable(store.issues))
+
+def test_error_rows_are_numbered_in_their_snapshot(snapshots):
+    when = pd.Timestamp('2020-03-13 21:00')
+    report = SnapshotValidator().validate_snapshot(when, snapshots[when])
+    rows = report.error_rows()
+    assert len(rows) == 1
+    assert snapshots[when].loc[rows[0], 'Province/State'] == 'Grand Princess'
+    assert snapshots[when].loc[rows[0], 'Confirmed'] == 2
+
+def test_build_store_quarantines_error_rows(snapshots, tmp_path):
+    raw = tmp_path / 'raw_data'
+    raw.mkdir()
+    for when, path in _snapshot_files(RAW_DIR).items():
+        if FIRST <= when < LAST:
+            shutil.copy(path, str(raw))
+    store, report = str(tmp_path / 'snapshots.npz'), str(tmp_path / 'validation.csv')
+    with pytest.warns(UserWarning, match='1 rows quarantined'):
+        build_store(str(raw), store, report)
+
+    history = SnapshotHistory(store=store, raw_dir=str(raw))
+    assert len(history) == len(snapshots)
+    assert history.offsets[-1] == sum(len(df) for df in snapshots.values()) - 1
+    places = history.places(history.locate(pd.Timestamp('2020-03-13 21:00')))
+    assert places.loc[places['Province/State'] == 'Grand Princess', 'Confirmed'].tolist() == [21]
+    assert SnapshotValidator().validate_store(history.arrays).ok
+    assert (pd.read_csv(report)['check'] == 'duplicate').sum() == 1
+
+def test_decrease_skips_duplicate_rows():
+    # The second row of A at 01:00 is a duplicate; 15 at 02:00 is a decrease from the 20 kept
+    snapshots = {pd.Timestamp('2020-03-01 00:00'): [10], pd.Timestamp('2020-03-01 01:00'): [20, 5],
+                 pd.Timestamp('2020-03-01 02:00'): [15]}
+    snapshots = {when: pd.DataFrame({'Province/State': None, 'Country/Region': 'A', 'Confirmed': confirmed,
+                                     'Deaths': 0, 'Recovered': 0}) for when, confirmed in snapshots.items()}
+    store = SnapshotValidator(known=set()).validate_store(store_arrays(snapshots))
+    validator = SnapshotValidator(known=set())
+    incremental = pd.concat([validator.validate_snapshot(when, df).issues for when, df in snapshots.items()],
+                            ignore_index=True)
+    for issues in (store.issues, incremental):
+        decrease = issues[issues['check'] == 'decrease']
+        assert decrease[['value', 'reference']].values.tolist() == [[15, 20]]
+
+def test_store_is_rebuilt_when_the_raw_files_change(tmp_path):
+    raw = tmp_path / 'raw_data'
+    raw.mkdir()
+    paths = [path for when, path in _snapshot_files(RAW_DIR).items() if FIRST <= when < LAST]
+    for path in paths[:3]:
+        shutil.copy(path, str(raw))
+    store = str(tmp_path / 'snapshots.npz')
+    assert len(SnapshotHistory(store=store, raw_dir=str(raw))) == 3
+    shutil.copy(paths[3], str(raw))
+    assert len(SnapshotHistory(store=store, raw_dir=str(raw))) == 4
+    assert (tmp_path / 'validation.csv').exists()
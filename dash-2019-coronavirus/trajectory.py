@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+'''
+Build the "days since the Nth case" trajectories of every region from
+./cumulative_data/.
+
+update_logplot and update_deathplot plot each region against the growth
+curves of pseduoDay, counting DayElapsed from the first day the region
+reached 100 confirmed cases (DayElapsed_death: 3 deaths). The counts are
+made monotone with a cumulative maximum first (a few regions have days
+where the cumulative count drops after a correction), and the start of
+every region is found in one pass over all regions instead of a loop.
+
+Thresholds are parameters, and per-capita trajectories (per 100k people)
+use the populations of the latest data files. Every table is saved both as
+the CSV the app always read (lineplot_data/dfs_curve.csv ...) and as an
+indexed .npz, where the rows of a region are one contiguous slice found
+from a dictionary lookup instead of a scan of the whole table.
+
+Usage:
+    python trajectory.py
+    python trajectory.py --per-capita
+'''
+import os
+import glob
+import argparse
+
+import pandas as pd
+import numpy as np
+
+###################################
+# Private function and variable
+###################################
+
+CUMULATIVE_DIR = './cumulative_data/'
+OUTPUT_DIR = './lineplot_data/'
+LATEST_DATA = ['./2020-04-30-07-00_data.csv', './2020-04-30_Brazil_data.csv', './2020-04-30_Germany_data.csv']
+
+# (value column, threshold, day column, CSV file) of the tables the app reads
+CURVES = [
+    ('Confirmed', 100, 'DayElapsed', 'dfs_curve.csv'),
+    ('Deaths', 3, 'DayElapsed_death', 'dfs_curve_death.csv'),
+]
+# Per-capita variants, thresholds per 100k people
+PER_CAPITA_CURVES = [
+    ('Confirmed', 1, 'DayElapsed', 'dfs_curve_per100k.csv'),
+    ('Deaths', 0.1, 'DayElapsed_death', 'dfs_curve_death_per100k.csv'),
+]
+PER = 100000
+
+# Files of cumulative_data that are not regions (or duplicate Worldwide)
+NOT_REGIONS = ['continent_name', 'The World', 'World']
+
+def _segment_starts(codes):
+    '''First row of every run of equal codes (codes sorted)'''
+    return np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+
+###################################
+# Public function
+###################################
+
+def load_cumulative(directory=CUMULATIVE_DIR):
+    '''
+    Long table (Region, date_day, Confirmed, Deaths) of every region file,
+    one row per region and day (the last update of the day), sorted by
+    region and day.
+    '''
+    frames = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.csv'))):
+        if os.path.basename(path)[:-4] in NOT_REGIONS:
+            continue
+        df = pd.read_csv(path, usecols=['date_day', 'Confirmed', 'Deaths'])
+        frames.append(df.assign(Region=os.path.basename(path)[:-4]))
+    long = pd.concat(frames, ignore_index=True)
+    # Files are newest first, so the first row of a day is its last update
+    long = long.drop_duplicates(['Region', 'date_day'])
+    return long.sort_values(['Region', 'date_day'], kind='mergesort').reset_index(drop=True)
+
+def load_population(paths=LATEST_DATA):
+    '''
+    Population of every region name used in ./cumulative_data/: provinces
+    and states, countries, continents and the whole world.
+    '''
+    df = pd.concat([pd.read_csv(p, usecols=['Province/State', 'Country/Region', 'Population', 'Continent', 'World'])
+                    for p in paths if os.path.exists(p)], ignore_index=True)
+    # Brazil and Germany states are listed in their own files and in the country total
+    df = df.drop_duplicates(['Province/State', 'Country/Region'], keep='last')
+    states = df[df['Province/State'].notnull()]
+    population = pd.concat([
+        df.groupby('World')['Population'].sum(),
+        df.groupby('Continent')['Population'].sum(),
+        df.groupby('Country/Region')['Population'].sum(),
+        states.set_index('Province/State')['Population'],
+    ])
+    population = population[population > 0]
+    return population[~population.index.duplicated(keep='last')]
+
+class Trajectories:
+    '''
+    Aligned trajectories of many regions stored region by region.
+
+    The rows of region r are day[offsets[i]:offsets[i+1]] and
+    value[offsets[i]:offsets[i+1]] with i = index[r], newest day first (as
+    in dfs_curve.csv, so element 0 is the current position of the region).
+    '''
+
+    def __init__(self, regions, offsets, day, value, column='Confirmed', day_column='DayElapsed'):
+        self.regions = [str(r) for r in regions]
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.day = np.asarray(day)
+        self.value = np.asarray(value)
+        self.column = column
+        self.day_column = day_column
+        self.index = {r: i for i, r in enumerate(self.regions)}
+
+    @classmethod
+    def from_cumulative(cls, long, column='Confirmed', threshold=100, day_column='DayElapsed',
+                        population=None, per=PER):
+        '''
+        Trajectories of `column` from the long table of load_cumulative.
+
+        Day 1 of a region is the first day its cumulative maximum of column
+        reaches threshold; regions that never reach it are left out. With
+        population (a Series by region), values and threshold are per `per`
+        people and regions without a population are left out.
+        '''
+        codes, regions = pd.factorize(long['Region'], sort=True)
+        value = long[column].values.astype(float)
+        if population is not None:
+            value = value / population.reindex(regions).values[codes] * per
+        running_max = pd.Series(value).groupby(codes).cummax().values
+
+        # The running maximum is sorted within each region, so the number of
+        # days below threshold locates day 1 of the region (a searchsorted per
+        # region, done for all regions at once)
+        starts = _segment_starts(codes)
+        stops = np.r_[starts[1:], len(codes)]
+        below = np.add.reduceat(~(running_max >= threshold), starts)
+        first = starts + below
+
+        position = np.arange(len(codes))
+        elapsed = position - first[codes] + 1
+        keep = elapsed >= 1
+        # Newest day first within every region
+        order = np.lexsort((-elapsed[keep], codes[keep]))
+        kept_codes = codes[keep][order]
+        day = elapsed[keep][order].astype(np.int32)
+        value = (long[column].values[keep] if population is None else value[keep])[order]
+
+        reached = first < stops
+        counts = np.bincount(kept_codes, minlength=len(regions))[reached]
+        offsets = np.r_[0, np.cumsum(counts)]
+        name = column if population is None else '{}/{}'.format(column, '100k' if per == PER else per)
+        return cls(np.asarray(regions)[reached], offsets, day, value, name, day_column)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['regions'], data['offsets'], data['day'], data['value'],
+                       str(data['column']), str(data['day_column']))
+
+    def save(self, path):
+        np.savez_compressed(path, regions=np.array(self.regions), offsets=self.offsets, day=self.day, value=self.value,
+                 column=self.column, day_column=self.day_column)
+
+    def __contains__(self, region):
+        return region in self.index
+
+    def __len__(self):
+        return len(self.regions)
+
+    def get(self, region):
+        '''(day, value) arrays of a region, newest day first; views, not copies'''
+        i = self.index[region]
+        rows = slice(self.offsets[i], self.offsets[i+1])
+        return self.day[rows], self.value[rows]
+
+    def batch(self, regions):
+        '''
+        (found regions, (region, day - 1) array) of the given regions in their
+        order, NaN after the last day of a region; one scatter for all of them
+        '''
+        found = [r for r in regions if r in self.index]
+        i = np.array([self.index[r] for r in found], dtype=np.int64)
+        starts, counts = self.offsets[i], self.offsets[i+1] - self.offsets[i]
+        # Row numbers of all the regions' rows, without a loop over the regions
+        take = np.repeat(starts - np.r_[0, np.cumsum(counts)[:-1]], counts) + np.arange(counts.sum())
+        values = np.full((len(found), counts.max() if len(found) else 0), np.nan)
+        values[np.repeat(np.arange(len(found)), counts), self.day[take] - 1] = self.value[take]
+        return found, values
+
+    def frame(self, region):
+        '''Rows of a region in the layout of dfs_curve.csv'''
+        day, value = self.get(region)
+        return pd.DataFrame({self.column: value, self.day_column: day, 'Region': region})
+
+    def to_frame(self):
+        '''Every region in the layout of dfs_curve.csv'''
+        counts = np.diff(self.offsets)
+        return pd.DataFrame({self.column: self.value, self.day_column: self.day,
+                             'Region': np.repeat(self.regions, counts)})
+
+def build_all(cumulative_dir=CUMULATIVE_DIR, output_dir=OUTPUT_DIR, per_capita=False):
+    '''Build and save every table of CURVES (and PER_CAPITA_CURVES); returns {file: Trajectories}'''
+    long = load_cumulative(cumulative_dir)
+    population = load_population() if per_capita else None
+    os.makedirs(output_dir, exist_ok=True)
+    tables = {}
+    for curves, pop in ((CURVES, None), (PER_CAPITA_CURVES, population)):
+        if curves is PER_CAPITA_CURVES and not per_capita:
+            continue
+        for column, threshold, day_column, name in curves:
+            curve = Trajectories.from_cumulative(long, column, threshold, day_column, population=pop)
+            curve.to_frame().to_csv(os.path.join(output_dir, name), index=False)
+            curve.save(os.path.join(output_dir, name[:-4] + '.npz'))
+            tables[name] = curve
+    return tables
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cumulative-dir', default=CUMULATIVE_DIR)
+    parser.add_argument('--output-dir', default=OUTPUT_DIR)
+    parser.add_argument('--per-capita', action='store_true', help='also build the per 100k people tables')
+    args = parser.parse_args()
+
+    for name, curve in build_all(args.cumulative_dir, args.output_dir, args.per_capita).items():
+        print('{}: {} regions, {} rows'.format(name, len(curve), curve.offsets[-1]))
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+'''
+Validation of the snapshots of ./raw_data/ at ingest.
+
+check_schema() runs on every raw snapshot before it enters the columnar
+store of asof.py, and a snapshot with a bad schema (missing columns,
+counts that are not whole numbers, names that are not text) is left out
+of the store. The rows of the store are then checked all at once:
+
+    duplicate   a place (Province/State, Country/Region) twice in a snapshot   error
+    negative    a count below zero                                            error
+    decrease    a cumulative count below the place's count in an earlier one  warning
+    balance     Confirmed < Deaths + Recovered                                warning
+    unknown     a place missing from coordinatesDB.csv (once per place)       warning
+    no_cases    Confirmed == 0, such as the dummy rows of tests/critical      info
+
+Every check is a vectorized comparison over the rows of all snapshots:
+the decrease and duplicate checks sort the rows once by (place, snapshot)
+and compare each row with the row before it. A SnapshotValidator keeps
+the last counts of every place, so a new snapshot is checked against
+them alone (validate_snapshot) instead of against the whole history.
+
+Results are a ValidationReport: one issue per row with the check, its
+severity, the snapshot time, the place, the column and the values
+compared. build_store() of asof.py quarantines the rows with an error
+(error_rows(): a duplicate row, a negative count), which are kept out of
+the store, and saves the report as ./snapshot_data/validation.csv.
+
+Usage:
+    python validate.py                                      # the whole store
+    python validate.py raw_data/2020-04-30-07-00.csv        # a new snapshot, against the store
+'''
+import sys
+import argparse
+
+import pandas as pd
+import numpy as np
+
+###################################
+# Private function and variable
+###################################
+
+COORDINATES_DB = './coordinatesDB.csv'
+TEXT_COLUMNS = ['Province/State', 'Country/Region']
+REQUIRED_COUNTS = ['Confirmed', 'Deaths', 'Recovered']
+OPTIONAL_COUNTS = ['Tests', 'Critical']
+# Severity of every check
+CHECKS = {'schema': 'error', 'duplicate': 'error', 'negative': 'error', 'decrease': 'warning',
+          'balance': 'warning', 'unknown': 'warning', 'no_cases': 'info'}
+ISSUE_COLUMNS = ['check', 'severity', 'snapshot', 'Province/State', 'Country/Region', 'column', 'value', 'reference']
+
+def _issues(check, rows, column=None, value=None, reference=None):
+    '''Issues of a check as a DataFrame indexed by row, before the snapshot and place are filled in'''
+    rows = np.asarray(rows, dtype=np.int64)
+    return pd.DataFrame({'check': check, 'severity': CHECKS[check], 'row': rows, 'column': column,
+                         'value': value if value is not None else np.nan,
+                         'reference': reference if reference is not None else np.nan})
+
+def _check_rows(snapshot, provinces, countries, counts, known=None):
+    '''
+    (issues, last rows) of rows in snapshot order: snapshot numbers, province
+    names (None without one), country names and {column: counts}; the last
+    rows are the indexes of the latest row of every place. Of the rows of a
+    place in one snapshot, all but the first are duplicates.
+    '''
+    province_codes, _ = pd.factorize(provinces)
+    country_codes, _ = pd.factorize(countries)
+    place = (province_codes.astype(np.int64) + 1) * (country_codes.max(initial=0) + 1) + country_codes
+    order = np.lexsort((snapshot, place))
+    p, s = place[order], snapshot[order]
+    same_place = p[1:] == p[:-1]
+    duplicate = same_place & (s[1:] == s[:-1])
+    issues = [_issues('duplicate', order[1:][duplicate])]
+    # Sorted position of the latest row of the place that is not a duplicate, at or before every position
+    kept = np.maximum.accumulate(np.where(np.r_[False, duplicate], 0, np.arange(len(order))))
+
+    for column, values in counts.items():
+        issues.append(_issues('negative', np.flatnonzero(values < 0), column, values[values < 0]))
+        if column in REQUIRED_COUNTS:
+            # Compared with the previous row of the place that is kept, as the store keeps no duplicate
+            v, before = values[order], values[order[kept[:-1]]]
+            decrease = same_place & ~duplicate & (v[1:] < before)
+            issues.append(_issues('decrease', order[1:][decrease], column, v[1:][decrease], before[decrease]))
+    confirmed, closed = counts['Confirmed'], counts['Deaths'] + counts['Recovered']
+    balance = confirmed < closed
+    issues.append(_issues('balance', np.flatnonzero(balance), 'Confirmed', confirmed[balance], closed[balance]))
+    issues.append(_issues('no_cases', np.flatnonzero(confirmed == 0), 'Confirmed', 0))
+
+    if known is not None:
+        # One issue per unknown place, at its first row, with its number of rows
+        places, first, n_rows = np.unique(place, return_index=True, return_counts=True)
+        keys = [(provinces[i] or '') + '|' + countries[i] for i in first]
+        unknown = np.array([key not in known for key in keys], dtype=bool)
+        issues.append(_issues('unknown', first[unknown], value=n_rows[unknown]))
+
+    # The latest row of a place is the first of its rows in its latest snapshot, not a duplicate
+    last = order[kept[np.r_[~same_place, True]]]
+    return pd.concat(issues, ignore_index=True), last
+
+###################################
+# Public function
+###################################
+
+def check_schema(df):
+    '''Problems of the columns and dtypes of a raw snapshot, as messages (none for a good one)'''
+    problems = []
+    missing = [c for c in TEXT_COLUMNS + REQUIRED_COUNTS if c not in df]
+    if missing:
+        problems.append('missing columns {}'.format(missing))
+    for column in [c for c in TEXT_COLUMNS if c in df]:
+        # An empty column is read as float
+        if not (pd.api.types.is_string_dtype(df[column]) or pd.api.types.is_object_dtype(df[column])
+                or df[column].isna().all()):
+            problems.append('{} is {}, not text'.format(column, df[column].dtype))
+    if 'Country/Region' in df and df['Country/Region'].isna().any():
+        problems.append('{} rows without Country/Region'.format(df['Country/Region'].isna().sum()))
+    for column in [c for c in REQUIRED_COUNTS + OPTIONAL_COUNTS if c in df]:
+        values = df[column]
+        if not pd.api.types.is_numeric_dtype(values):
+            problems.append('{} is {}, not a count'.format(column, values.dtype))
+        elif (values.dropna() % 1 != 0).any():
+            problems.append('{} has fractional counts'.format(column))
+    return problems
+
+def known_places(path=COORDINATES_DB):
+    ''''Province/State|Country/Region' keys of the coordinates DB ('|Country' for a country)'''
+    db = pd.read_csv(path)
+    return set(db['Province/State'].fillna('') + '|' + db['Country/Region'])
+
+class ValidationReport:
+    '''Issues (ISSUE_COLUMNS) of a validation, one row per flagged row'''
+
+    def __init__(self, issues=None):
+        self.issues = pd.DataFrame(columns=ISSUE_COLUMNS) if issues is None else issues[ISSUE_COLUMNS]
+        # Number of the flagged row among the rows validated (-1 for a schema problem)
+        self.rows = np.full(len(self.issues), -1, dtype=np.int64) if issues is None or 'row' not in issues \
+            else issues['row'].values.astype(np.int64)
+
+    def __len__(self):
+        return len(self.issues)
+
+    @property
+    def ok(self):
+        '''True without errors (warnings and info are allowed)'''
+        return not (self.issues['severity'] == 'error').any()
+
+    def error_rows(self):
+        '''Sorted numbers of the rows with an error, the rows to quarantine'''
+        rows = self.rows[(self.issues['severity'] == 'error').values]
+        return np.unique(rows[rows >= 0])
+
+    def summary(self):
+        '''Number of issues per check, with its severity'''
+        counts = self.issues.groupby('check').size().reindex(list(CHECKS), fill_value=0)
+        return pd.DataFrame({'severity': pd.Series(CHECKS), 'issues': counts})
+
+class SnapshotValidator:
+    '''Row checks of the snapshot store, kept up to date one new snapshot at a time'''
+
+    def __init__(self, known=None):
+        self.known = known_places() if known is None else known
+        # Last time, and province, country and counts of the latest row of every place
+        self.time, self.last = None, None
+
+    def _check(self, snapshot, times, provinces, countries, counts, skip=0):
+        '''Report of the rows from skip on, and the latest row of every place kept for the next snapshot'''
+        issues, last = _check_rows(snapshot, provinces, countries, counts, self.known)
+        issues = issues[issues['row'] >= skip]
+        rows = issues['row'].values
+        issues = issues.assign(snapshot=times[snapshot[rows]], row=rows - skip, **{
+            'Province/State': provinces[rows], 'Country/Region': countries[rows]})
+        self.time = times[-1]
+        self.last = (provinces[last], countries[last], {c: v[last] for c, v in counts.items()})
+        return ValidationReport(issues.sort_values(['snapshot', 'check'], kind='stable').reset_index(drop=True))
+
+    def validate_store(self, arrays):
+        '''Report of every row of a columnar store (asof.py's arrays) in one pass'''
+        offsets, times = arrays['offsets'], pd.DatetimeIndex(arrays['times'])
+        snapshot = np.repeat(np.arange(len(times)), np.diff(offsets))
+        names = {}
+        for column in TEXT_COLUMNS:
+            codes = arrays[column + ':codes']
+            # Code -1 (no name) takes the None appended to the categories
+            names[column] = np.append(arrays[column + ':categories'].astype(object), None)[codes]
+        counts = {c: arrays[c] for c in REQUIRED_COUNTS + OPTIONAL_COUNTS if c in arrays}
+        return self._check(snapshot, times, names['Province/State'], names['Country/Region'], counts)
+
+    def validate_snapshot(self, when, df):
+        '''
+        Report of a new raw snapshot taken at when, checked against the last
+        counts of every place only; its rows (but duplicates) become the last
+        counts unless its schema is bad. Names are cleansed as for the store,
+        and the rows of the report are numbered as those of df.
+        '''
+        problems = check_schema(df)
+        if problems:
+            return ValidationReport(pd.DataFrame({
+                'check': 'schema', 'severity': CHECKS['schema'], 'snapshot': pd.Timestamp(when),
+                'Province/State': None, 'Country/Region': None, 'column': None, 'value': problems, 'reference': np.nan}))
+        # asof.py imports this module for check_schema
+        from asof import cleanse_snapshot
+        df = cleanse_snapshot(df)
+        provinces = df['Province/State'].astype(object).where(df['Province/State'].notnull(), None).values
+        countries = df['Country/Region'].astype(object).values
+        counts = {c: df[c].values for c in REQUIRED_COUNTS + OPTIONAL_COUNTS}
+        if self.last is None:
+            return self._check(np.zeros(len(df), dtype=np.int64), pd.DatetimeIndex([when]), provinces, countries, counts)
+        last_provinces, last_countries, last_counts = self.last
+        skip = len(last_countries)
+        return self._check(
+            np.r_[np.zeros(skip, dtype=np.int64), np.ones(len(df), dtype=np.int64)],
+            pd.DatetimeIndex([self.time, pd.Timestamp(when)]),
+            np.r_[last_provinces, provinces], np.r_[last_countries, countries],
+            {c: np.r_[last_counts[c], counts[c]] for c in counts}, skip=skip)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('snapshot', nargs='?', help='a new raw snapshot file (YYYY-MM-DD-HH-MM.csv)')
+    args = parser.parse_args()
+
+    from asof import SnapshotHistory
+    history = SnapshotHistory()
+    validator = SnapshotValidator()
+    report = validator.validate_store(history.arrays)
+    if args.snapshot:
+        when = pd.to_datetime(args.snapshot.rsplit('/', 1)[-1][:-4], format='%Y-%m-%d-%H-%M')
+        report = validator.validate_snapshot(when, pd.read_csv(args.snapshot))
+    print(report.summary().to_string())
+    print(report.issues.head(20).to_string(index=False))
+    sys.exit(0 if report.ok else 1)
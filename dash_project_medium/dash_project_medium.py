@@ -3,6 +3,7 @@
 import json
 
 import pandas as pd
+from flask import Response
 
 import plotly
 import plotly.graph_objects as go
@@ -11,12 +12,22 @@ import dash
 import dash_core_components as dcc
 import dash_html_components as html
 
+from geometry import simplify_geojson
+
 # Import data 
 median_price_new = pd.read_csv('median_price_new_for_dash.csv')
 
 with open('Sydney_suburb.geojson') as json_data:
     Sydney_data = json.load(json_data)
 
+# Polygon simplification tolerance in degrees (0.0001 is about 10 m)
+SIMPLIFY_TOLERANCE = 0.0001
+
+# The suburb polygons are simplified once, serialised once and served by the
+# app at this URL, so they are not embedded in the figure JSON at all
+GEOJSON_URL = '/Sydney_suburb.geojson'
+Sydney_geojson = json.dumps(simplify_geojson(Sydney_data, SIMPLIFY_TOLERANCE), separators=(',', ':'))
+
 # mapbox token
 mapbox_accesstoken = 'YOUR TOKEN GOES HERE'
 
@@ -38,48 +49,56 @@ pl_deep=[[0.0, 'rgb(253, 253, 204)'],
 
 Types = ['Unit_buy/M','Unit_rent','House_rent','House_buy/M']    
 
-trace1 = []    
-    
-# Suburbs order should be the same as "id" passed to location
-for q in Types:
-    trace1.append(go.Choroplethmapbox(
-        geojson = Sydney_data,
-        locations = median_price_new['id'].tolist(),
-        z = median_price_new[q].tolist(), 
-        colorscale = pl_deep,
-        text = suburbs, 
-        colorbar = dict(thickness=20, ticklen=3),
-        marker_line_width=0, marker_opacity=0.7,
-        visible=False,
-        subplot='mapbox1',
-        hovertemplate = "<b>%{text}</b><br><br>" +
-                        "Price: %{z}<br>" +
-                        "<extra></extra>")) # "<extra></extra>" means we don't display the info in the secondary box, such as trace id.
-    
-trace1[0]['visible'] = True
+# Top 10 suburbs per type, computed once for the initial bar and the buttons
+top10 = {q: median_price_new.nlargest(10, q) for q in Types}
 
-trace2 = []    
-    
+def bar_data(q):
+    return top10[q][q].tolist(), top10[q]['Suburb_name_geojson'].str.title().tolist()
+
+# One choropleth trace for all types; the dropdown swaps its z values.
 # Suburbs order should be the same as "id" passed to location
-for q in Types:
-    trace2.append(go.Bar(
-        x=median_price_new.sort_values([q], ascending=False).head(10)[q],
-        y=median_price_new.sort_values([q], ascending=False).head(10)['Suburb_name_geojson'].str.title().tolist(),
-        xaxis='x2',
-        yaxis='y2',
-        marker=dict(
-            color='rgba(91, 207, 135, 0.3)',
-            line=dict(
-                color='rgba(91, 207, 135, 2.0)',
-                width=0.5),
-        ),
-        visible=False,
-        name='Top 10 suburbs with the highest {} median price'.format(q),
-        orientation='h',
-    ))
-    
-trace2[0]['visible'] = True
+trace1 = go.Choroplethmapbox(
+    geojson = GEOJSON_URL,
+    locations = median_price_new['id'].tolist(),
+    z = median_price_new[Types[0]].tolist(),
+    colorscale = pl_deep,
+    text = suburbs,
+    colorbar = dict(thickness=20, ticklen=3),
+    marker_line_width=0, marker_opacity=0.7,
+    subplot='mapbox1',
+    hovertemplate = "<b>%{text}</b><br><br>" +
+                    "Price: %{z}<br>" +
+                    "<extra></extra>") # "<extra></extra>" means we don't display the info in the secondary box, such as trace id.
+
+bar_x, bar_y = bar_data(Types[0])
+trace2 = go.Bar(
+    x=bar_x,
+    y=bar_y,
+    xaxis='x2',
+    yaxis='y2',
+    marker=dict(
+        color='rgba(91, 207, 135, 0.3)',
+        line=dict(
+            color='rgba(91, 207, 135, 2.0)',
+            width=0.5),
+    ),
+    name='Top 10 suburbs with the highest {} median price'.format(Types[0]),
+    orientation='h',
+)
 
+def type_button(q):
+    '''Restyle the bar (trace 0) and the choropleth (trace 1) for type q'''
+    x, y = bar_data(q)
+    return dict(
+        # Per-trace values; None leaves an attribute unset on the trace that has no use for it
+        args=[{'x': [x, None],
+               'y': [y, None],
+               'name': ['Top 10 suburbs with the highest {} median price'.format(q), None],
+               'z': [None, median_price_new[q].tolist()]},
+              [0, 1]],
+        label='Property type: {}'.format(q.replace('_', ' ')),
+        method='restyle'
+        )
 
 # Sydney latitude and longitude values
 latitude = -33.892319
@@ -120,31 +139,10 @@ layout.update(updatemenus=list([
          y=1,
          xanchor='left',
          yanchor='middle',
-         buttons=list([
-             dict(
-                 args=['visible', [True, False, False, False]],
-                 label='Property type: Unit buy/M',
-                 method='restyle'
-                 ),
-             dict(
-                 args=['visible', [False, True, False, False]],
-                 label='Property type: Unit rent',
-                 method='restyle'
-                 ),
-             dict(
-                 args=['visible', [False, False, True, False]],
-                 label='Property type: House rent',
-                 method='restyle'
-                 ),
-             dict(
-                 args=['visible', [False, False, False, True]],
-                 label='Property type: House buy/M',
-                 method='restyle'
-                )
-            ]),
+         buttons=[type_button(q) for q in Types],
         )]))
 
-fig=go.Figure(data=trace2 + trace1, layout=layout)
+fig=go.Figure(data=[trace2, trace1], layout=layout)
 #####################################################################
 # This is the part to initiate Dash app
 
@@ -152,6 +150,12 @@ external_stylesheets = ['https://codepen.io/chriddyp/pen/bWLwgP.css']
 
 app = dash.Dash(__name__, external_stylesheets=external_stylesheets)
 
+@app.server.route(GEOJSON_URL)
+def suburb_geojson():
+    # Fetched once by the browser and cached, instead of being part of every figure
+    return Response(Sydney_geojson, mimetype='application/json',
+                    headers={'Cache-Control': 'public, max-age=86400'})
+
 app.layout = html.Div(children=[
     html.H1(children=''),
 
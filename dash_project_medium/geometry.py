@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+'''
+Geometry helpers for the Sydney suburb geojson.
+
+simplify_geojson reduces every polygon ring with the Douglas-Peucker
+algorithm at a given tolerance (in degrees) and rounds coordinates, which is
+all a zoom-12 choropleth needs and makes the geojson several times smaller.
+
+PolygonStore parses the geojson once into flat NumPy buffers (one coordinate
+array plus ring and feature offsets) and a uniform grid index over the
+feature bounding boxes. locate() maps millions of lon/lat points to suburbs
+at once: points are binned into grid cells, candidate suburbs are filtered by
+bounding box, and each suburb's edges are bucketed into horizontal slabs so
+the even-odd ray test of a point only visits the edges spanning its latitude.
+All (point, edge) pairs are tested in bounded-size vectorized blocks.
+
+Usage:
+    python geometry.py listings.csv     # median prices from raw listings
+'''
+import sys
+import json
+
+import pandas as pd
+import numpy as np
+
+###################################
+# Private function and variable
+###################################
+
+def _douglas_peucker(points, tolerance):
+    '''Boolean mask of the points of a polyline kept at the given tolerance'''
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        start, end = points[first], points[last]
+        inner = points[first+1:last]
+        segment = end - start
+        length = np.hypot(*segment)
+        if length == 0:
+            dist = np.hypot(*(inner - start).T)
+        else:
+            # Perpendicular distance of every inner point to the chord
+            dist = np.abs(segment[0]*(inner[:, 1] - start[1]) - segment[1]*(inner[:, 0] - start[0])) / length
+        k = int(np.argmax(dist))
+        if dist[k] > tolerance:
+            split = first + 1 + k
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return keep
+
+def _simplify_ring(ring, tolerance, precision):
+    '''Simplify a closed ring, keeping it closed and at least a triangle'''
+    points = np.asarray(ring, dtype=float)
+    if len(points) <= 4:
+        return np.round(points, precision).tolist()
+    # A closed ring starts and ends on the same point, so split it at the
+    # point farthest from the start and simplify both halves
+    far = int(np.argmax(np.hypot(*(points - points[0]).T)))
+    keep = np.zeros(len(points), dtype=bool)
+    keep[:far+1] |= _douglas_peucker(points[:far+1], tolerance)
+    keep[far:] |= _douglas_peucker(points[far:], tolerance)
+    simplified = points[keep] if keep.sum() >= 4 else points
+    return np.round(simplified, precision).tolist()
+
+def _simplify_geometry(geometry, tolerance, precision):
+    if geometry['type'] == 'Polygon':
+        coords = [_simplify_ring(r, tolerance, precision) for r in geometry['coordinates']]
+    elif geometry['type'] == 'MultiPolygon':
+        coords = [[_simplify_ring(r, tolerance, precision) for r in polygon]
+                  for polygon in geometry['coordinates']]
+    else:
+        return geometry
+    return {'type': geometry['type'], 'coordinates': coords}
+
+# Point x edge pairs tested per block in the ray test
+MAX_PAIRS = 2**22
+
+# Average number of edges per slab of a feature
+EDGES_PER_SLAB = 8
+
+def _rings(geometry):
+    '''Every ring of a Polygon or MultiPolygon, outer rings and holes alike'''
+    if geometry['type'] == 'Polygon':
+        return geometry['coordinates']
+    if geometry['type'] == 'MultiPolygon':
+        return [ring for polygon in geometry['coordinates'] for ring in polygon]
+    return []
+
+def _expand(start, stop):
+    '''Concatenated ranges start[i]:stop[i], and the i each element comes from'''
+    counts = stop - start
+    owner = np.repeat(np.arange(len(start)), counts)
+    within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return start[owner] + within, owner
+
+###################################
+# Public function
+###################################
+
+def simplify_geojson(geojson, tolerance=0.0001, precision=5, keep_properties=False):
+    '''
+    Copy of a geojson FeatureCollection with simplified polygons.
+
+    tolerance is the Douglas-Peucker distance in degrees (0.0001 is about
+    10 m in Sydney), precision the number of decimals kept. Feature
+    properties are dropped unless keep_properties is set; the feature id,
+    which the choropleth matches on, is always kept.
+    '''
+    features = []
+    for feature in geojson['features']:
+        simplified = {'type': 'Feature', 'id': feature.get('id'),
+                      'geometry': _simplify_geometry(feature['geometry'], tolerance, precision)}
+        if keep_properties:
+            simplified['properties'] = feature.get('properties', {})
+        features.append(simplified)
+    return {'type': 'FeatureCollection', 'features': features}
+
+def geojson_size(geojson):
+    '''Size in bytes of a geojson object serialised as compact JSON'''
+    return len(json.dumps(geojson, separators=(',', ':')))
+
+class PolygonStore:
+    '''
+    Flat polygon buffers and grid index for a geojson FeatureCollection.
+
+    coords holds every vertex of every ring; ring_offsets[k]:ring_offsets[k+1]
+    is ring k, ring_feature its feature, and ids/bounds the feature ids and
+    (min lon, min lat, max lon, max lat) boxes.
+    '''
+
+    def __init__(self, ids, coords, ring_offsets, ring_feature, cell_size=None):
+        self.ids = np.asarray(ids)
+        self.coords = np.asarray(coords, dtype=float)
+        self.ring_offsets = np.asarray(ring_offsets, dtype=np.int64)
+        self.ring_feature = np.asarray(ring_feature, dtype=np.int64)
+        self._build_edges()
+        self._build_bounds()
+        self._build_slabs()
+        self._build_grid(cell_size)
+
+    @classmethod
+    def from_geojson(cls, geojson, cell_size=None):
+        '''Build the store from a geojson object or a path to a geojson file'''
+        if isinstance(geojson, str):
+            with open(geojson) as f:
+                geojson = json.load(f)
+        ids, rings, ring_feature = [], [], []
+        for k, feature in enumerate(geojson['features']):
+            ids.append(feature.get('id'))
+            for ring in _rings(feature['geometry']):
+                rings.append(np.asarray(ring, dtype=float)[:, :2])
+                ring_feature.append(k)
+        ring_offsets = np.concatenate([[0], np.cumsum([len(r) for r in rings])])
+        return cls(ids, np.concatenate(rings), ring_offsets, ring_feature, cell_size)
+
+    @classmethod
+    def load(cls, path, cell_size=None):
+        '''Load flat buffers saved by save()'''
+        with np.load(path, allow_pickle=False) as archive:
+            return cls(archive['ids'], archive['coords'], archive['ring_offsets'],
+                       archive['ring_feature'], cell_size)
+
+    def save(self, path):
+        '''Save the flat buffers as a compressed .npz, so the geojson is parsed only once'''
+        np.savez_compressed(path, ids=self.ids.astype(str), coords=self.coords,
+                            ring_offsets=self.ring_offsets, ring_feature=self.ring_feature)
+
+    # Index construction
+    def _build_edges(self):
+        '''Edge k joins vertex k to vertex k+1 of the same ring'''
+        last = np.zeros(len(self.coords), dtype=bool)
+        # No edge from the last vertex of a ring to the first of the next one
+        last[self.ring_offsets[1:] - 1] = True
+        start = np.flatnonzero(~last)
+        ring_of_vertex = np.repeat(np.arange(len(self.ring_feature)), np.diff(self.ring_offsets))
+        self.edge_start = self.coords[start]
+        self.edge_end = self.coords[start + 1]
+        self.edge_feature = self.ring_feature[ring_of_vertex[start]]
+
+    def _build_slabs(self):
+        '''
+        Split each feature's latitude range into slabs and list, per slab, the
+        edges whose latitude span overlaps it (CSR layout over all slabs).
+        '''
+        n_edges = np.bincount(self.edge_feature, minlength=len(self.ids))
+        self.n_slabs = np.maximum(1, n_edges // EDGES_PER_SLAB)
+        self.slab_base = np.concatenate([[0], np.cumsum(self.n_slabs)])
+        height = self.bounds[:, 3] - self.bounds[:, 1]
+        self.slab_height = np.where(height > 0, height / self.n_slabs, 1.0)
+
+        f = self.edge_feature
+        y0, y1 = self.edge_start[:, 1], self.edge_end[:, 1]
+        low = self._slab(f, np.minimum(y0, y1))
+        high = self._slab(f, np.maximum(y0, y1))
+        slabs, edge = _expand(self.slab_base[f] + low, self.slab_base[f] + high + 1)
+
+        order = np.argsort(slabs, kind='stable')
+        self.slab_offsets = np.searchsorted(slabs[order], np.arange(self.slab_base[-1] + 1))
+        # Edge data copied in slab order, so a query reads contiguous slices
+        edge = edge[order]
+        self.slab_x0 = self.edge_start[edge, 0]
+        self.slab_y0 = y0[edge]
+        self.slab_y1 = y1[edge]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Horizontal edges never cross a ray, so their inf/nan slope is never used
+            self.slab_dxdy = (self.edge_end[edge, 0] - self.slab_x0) / (self.slab_y1 - self.slab_y0)
+
+    def _slab(self, feature, lat):
+        '''Slab of each latitude within the given features, clipped to their range'''
+        k = np.floor((lat - self.bounds[feature, 1]) / self.slab_height[feature]).astype(np.int64)
+        return np.clip(k, 0, self.n_slabs[feature] - 1)
+
+    def _build_bounds(self):
+        vertex_feature = np.repeat(self.ring_feature, np.diff(self.ring_offsets))
+        n = len(self.ids)
+        self.bounds = np.empty((n, 4))
+        self.bounds[:, :2] = np.inf
+        self.bounds[:, 2:] = -np.inf
+        np.minimum.at(self.bounds[:, 0], vertex_feature, self.coords[:, 0])
+        np.minimum.at(self.bounds[:, 1], vertex_feature, self.coords[:, 1])
+        np.maximum.at(self.bounds[:, 2], vertex_feature, self.coords[:, 0])
+        np.maximum.at(self.bounds[:, 3], vertex_feature, self.coords[:, 1])
+
+    def _build_grid(self, cell_size):
+        '''Uniform grid over the extent; each cell lists the features whose box overlaps it'''
+        valid = np.isfinite(self.bounds).all(axis=1)
+        self.extent = (self.bounds[valid, 0].min(), self.bounds[valid, 1].min(),
+                       self.bounds[valid, 2].max(), self.bounds[valid, 3].max())
+        if cell_size is None:
+            # Cells about the size of a median feature box
+            sizes = np.maximum(self.bounds[valid, 2] - self.bounds[valid, 0],
+                               self.bounds[valid, 3] - self.bounds[valid, 1])
+            cell_size = float(np.median(sizes)) or 1.0
+        self.cell_size = cell_size
+        self.grid_shape = (int((self.extent[3] - self.extent[1]) // cell_size) + 1,
+                           int((self.extent[2] - self.extent[0]) // cell_size) + 1)
+
+        features = np.flatnonzero(valid)
+        low = self._cells(self.bounds[features, 0], self.bounds[features, 1])
+        high = self._cells(self.bounds[features, 2], self.bounds[features, 3])
+        cell_ids, feature_ids = [], []
+        for f, (r0, c0), (r1, c1) in zip(features, zip(*low), zip(*high)):
+            rows, cols = np.mgrid[r0:r1+1, c0:c1+1]
+            cell_ids.append((rows*self.grid_shape[1] + cols).ravel())
+            feature_ids.append(np.full(rows.size, f))
+        cell_ids, feature_ids = np.concatenate(cell_ids), np.concatenate(feature_ids)
+
+        # CSR layout: cell c lists cell_features[cell_offsets[c]:cell_offsets[c+1]]
+        order = np.argsort(cell_ids, kind='stable')
+        self.cell_features = feature_ids[order]
+        self.cell_offsets = np.searchsorted(cell_ids[order], np.arange(self.grid_shape[0]*self.grid_shape[1] + 1))
+
+    def _cells(self, lon, lat):
+        '''(row, col) grid cell of each point, clipped to the grid'''
+        col = np.clip(((lon - self.extent[0]) // self.cell_size).astype(np.int64), 0, self.grid_shape[1] - 1)
+        row = np.clip(((lat - self.extent[1]) // self.cell_size).astype(np.int64), 0, self.grid_shape[0] - 1)
+        return row, col
+
+    # Queries
+    def candidates(self, lon, lat):
+        '''(point, feature) index pairs whose feature box contains the point'''
+        lon, lat = np.asarray(lon, dtype=float), np.asarray(lat, dtype=float)
+        x_low, y_low, x_high, y_high = self.extent
+        in_extent = np.flatnonzero((lon >= x_low) & (lon <= x_high) & (lat >= y_low) & (lat <= y_high))
+        row, col = self._cells(lon[in_extent], lat[in_extent])
+        cell = row*self.grid_shape[1] + col
+        start, stop = self.cell_offsets[cell], self.cell_offsets[cell + 1]
+
+        # Expand every point into one pair per feature listed in its cell
+        listed, owner = _expand(start, stop)
+        points, features = in_extent[owner], self.cell_features[listed]
+
+        box = self.bounds[features]
+        keep = ((lon[points] >= box[:, 0]) & (lon[points] <= box[:, 2]) &
+                (lat[points] >= box[:, 1]) & (lat[points] <= box[:, 3]))
+        return points[keep], features[keep]
+
+    def locate(self, lon, lat, max_pairs=MAX_PAIRS):
+        '''
+        Index into ids of the feature containing each point, -1 for points
+        outside every feature. A point on a shared border goes to the feature
+        listed first.
+        '''
+        lon, lat = np.asarray(lon, dtype=float), np.asarray(lat, dtype=float)
+        n_features = len(self.ids)
+        result = np.full(len(lon), n_features, dtype=np.int64)
+        points, features = self.candidates(lon, lat)
+
+        slab = self.slab_base[features] + self._slab(features, lat[points])
+        start, stop = self.slab_offsets[slab], self.slab_offsets[slab + 1]
+        # Split the candidate pairs into blocks of at most max_pairs (point, edge) tests
+        work = np.cumsum(stop - start)
+        splits = np.searchsorted(work, np.arange(max_pairs, work[-1] if len(work) else 0, max_pairs))
+        for block in np.split(np.arange(len(points)), splits):
+            if len(block) == 0:
+                continue
+            listed, owner = _expand(start[block], stop[block])
+            p = points[block][owner]
+            py = lat[p]
+            y0 = self.slab_y0[listed]
+            # Even-odd ray test: holes and multi-part features need no special case
+            crosses = (y0 > py) != (self.slab_y1[listed] > py)
+            listed, owner, p, py, y0 = listed[crosses], owner[crosses], p[crosses], py[crosses], y0[crosses]
+            left = lon[p] < self.slab_x0[listed] + (py - y0) * self.slab_dxdy[listed]
+            parity = np.bincount(owner[left], minlength=len(block)) % 2
+            inside = block[parity == 1]
+            # Pairs are ordered by point, then feature: keep the first hit of each point
+            found, first = np.unique(points[inside], return_index=True)
+            unset = result[found] == n_features
+            result[found[unset]] = features[inside[first[unset]]]
+        result[result == n_features] = -1
+        return result
+
+    def locate_ids(self, lon, lat):
+        '''Feature id of the feature containing each point, None outside'''
+        index = self.locate(lon, lat)
+        ids = self.ids.astype(object)[index]
+        ids[index == -1] = None
+        return ids
+
+def median_price_table(listings, store, type_column='type', price_column='price'):
+    '''
+    Median price per suburb id and property type from raw listings with
+    lon/lat columns, in the wide layout of median_price_new_for_dash.csv.
+    '''
+    suburb = store.locate_ids(listings['lon'].values, listings['lat'].values)
+    located = listings.assign(id=suburb).dropna(subset=['id'])
+    table = located.pivot_table(index='id', columns=type_column, values=price_column, aggfunc='median')
+    table.columns.name = None
+    return table.reset_index()
+
+if __name__ == '__main__':
+    store = PolygonStore.from_geojson('Sydney_suburb.geojson')
+    listings = pd.read_csv(sys.argv[1])
+    table = median_price_table(listings, store)
+    prices = pd.read_csv('median_price_new_for_dash.csv').drop(columns=list(table.columns.drop('id')), errors='ignore')
+    print(prices.merge(table, on='id', how='left').head())
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+'''
+Small-multiples renderer that draws every panel on one shared Axes.
+
+Instead of one Axes (with its own spines, ticks and text) and one artist per
+panel, panels are laid out at precomputed offsets in a single data space and
+drawn with a handful of collections: one LineCollection for all series, one
+PolyCollection for all bars and one for the panel frames. The number of
+artists therefore stays constant as the number of panels grows.
+
+Usage:
+    python small_multiples.py     # renders pattern_grid.png and temp_strips.png
+'''
+import glob
+import calendar
+from os.path import basename
+
+import pandas as pd
+import numpy as np
+
+import matplotlib.pyplot as plt
+from matplotlib import cm
+from matplotlib.collections import LineCollection, PolyCollection
+
+###################################
+# Private function and variable
+###################################
+
+def _panel_offsets(n_panels, ncols, hgap=0.1, vgap=0.1):
+    '''Lower-left corner of each unit panel, filled row by row from the top'''
+    order = np.arange(n_panels)
+    nrows = int(np.ceil(n_panels / ncols))
+    x0 = (order % ncols) * (1 + hgap)
+    y0 = (nrows - 1 - order // ncols) * (1 + vgap)
+    return x0, y0
+
+def _unit_scale(values, low, high):
+    '''Scale values into [0, 1] given per-panel lower and upper bounds'''
+    span = np.where(high > low, high - low, 1)
+    return (values - low) / span
+
+def _as_positions(x):
+    '''
+    Numeric positions for numbers or dates, plus the size of one x unit
+    (one day for dates, as with ax.bar)
+    '''
+    x = pd.Index(x)
+    if x.inferred_type in ('integer', 'floating', 'mixed-integer-float'):
+        return np.asarray(x, dtype=float), 1.0
+    seconds = pd.to_datetime(x).values.astype('datetime64[s]').astype(float)
+    return seconds, 86400.0
+
+def _frames(x0, y0, width=1, height=1):
+    '''Rectangle vertices for every panel frame'''
+    corners = np.array([[0, 0], [width, 0], [width, height], [0, height]])
+    return corners[None, :, :] + np.stack([x0, y0], axis=1)[:, None, :]
+
+def _finish(ax, x0, y0, hgap, vgap, width=1, height=1):
+    ax.set_xlim(x0.min() - hgap/2, x0.max() + width + hgap/2)
+    ax.set_ylim(y0.min() - vgap/2, y0.max() + height + vgap/2)
+    ax.set_axis_off()
+
+###################################
+# Public function
+###################################
+
+def line_grid(ax, x, table, ncols=7, colors='black', scale='panel', labels=True,
+              hgap=0.1, vgap=0.1, frame_color='#d3d3d3', linewidth=1, fontsize=8):
+    '''
+    Draw one line panel per column of table on ax.
+
+    x is shared by all panels; table is a (len(x), n_panels) DataFrame or
+    array. scale='panel' min-max scales each panel on its own, 'shared' uses
+    the global range, and None expects values already in [0, 1].
+    colors is one colour or one per panel.
+    '''
+    values = np.asarray(table, dtype=float)
+    n_panels = values.shape[1]
+    names = list(table.columns) if isinstance(table, pd.DataFrame) else [str(i) for i in range(n_panels)]
+
+    xs, _ = _as_positions(x)
+    xs = _unit_scale(xs, xs.min(), xs.max())
+    if scale == 'panel':
+        ys = _unit_scale(values, np.nanmin(values, axis=0), np.nanmax(values, axis=0))
+    elif scale == 'shared':
+        ys = _unit_scale(values, np.nanmin(values), np.nanmax(values))
+    else:
+        ys = values
+
+    x0, y0 = _panel_offsets(n_panels, ncols, hgap, vgap)
+    # (n_panels, n_points, 2) vertices, shifted to each panel's corner
+    segments = np.empty((n_panels, len(xs), 2))
+    segments[:, :, 0] = xs[None, :] + x0[:, None]
+    segments[:, :, 1] = ys.T + y0[:, None]
+
+    ax.add_collection(PolyCollection(_frames(x0, y0), facecolors='none',
+                                     edgecolors=frame_color, linewidths=0.5))
+    ax.add_collection(LineCollection(segments, colors=colors, linewidths=linewidth))
+    if labels:
+        for name, left, bottom in zip(names, x0, y0):
+            ax.text(left + 0.05, bottom + 0.8, name, va='center', ha='left', fontsize=fontsize)
+    _finish(ax, x0, y0, hgap, vgap)
+    return x0, y0
+
+def bar_strips(ax, df, group, x, y, order=None, baseline=0, ylim=None, cmap=cm.RdYlBu_r,
+               color_values=None, bar_width=0.7, vgap=0.2, labels=True, label_color='black',
+               fontsize=10):
+    '''
+    Draw one horizontal strip of bars per group of df on ax.
+
+    The frame is grouped once; bars of every strip go into a single
+    PolyCollection. Bars start at baseline, ylim=(low, high) is the value
+    range of a strip (default: global range) and colours come from cmap
+    applied to color_values (default: y / max(y) per group, as in
+    daily_temp_2019.ipynb).
+    '''
+    groups = dict(tuple(df.groupby(group, sort=False)))
+    order = list(groups) if order is None else [i for i in order if i in groups]
+
+    low, high = ylim if ylim is not None else (min(df[y].min() - baseline, 0), max(df[y].max() - baseline, 0))
+    xs_all, unit = _as_positions(df[x])
+    x_low, x_high = xs_all.min(), xs_all.max() + unit
+
+    # First position of each strip from the top, one unit high each
+    y0 = (len(order) - 1 - np.arange(len(order))) * (1 + vgap)
+    verts, colors = [], []
+    for strip, name in zip(y0, order):
+        g = groups[name]
+        xs, _ = _as_positions(g[x])
+        left = _unit_scale(xs, x_low, x_high)
+        # bar_width is in x units (days for dates), as with ax.bar
+        right = left + bar_width * unit / (x_high - x_low)
+        zero = strip + _unit_scale(0, low, high)
+        top = strip + _unit_scale(g[y].values - baseline, low, high)
+        verts.append(np.stack([np.stack([left, np.full_like(left, zero)], axis=1),
+                               np.stack([right, np.full_like(left, zero)], axis=1),
+                               np.stack([right, top], axis=1),
+                               np.stack([left, top], axis=1)], axis=1))
+        shade = g[y].values / g[y].max() if color_values is None else g[color_values].values
+        colors.append(cmap(shade))
+
+    ax.add_collection(PolyCollection(np.concatenate(verts), facecolors=np.concatenate(colors),
+                                     edgecolors='none'))
+    if labels:
+        for name, bottom in zip(order, y0):
+            ax.text(-0.01, bottom + 0.5, str(name).title(), va='center', ha='right', color=label_color,
+                    fontsize=fontsize, fontweight='bold')
+    ax.set_xlim(0, 1)
+    ax.set_ylim(-vgap/2, y0.max() + 1 + vgap/2)
+    ax.set_axis_off()
+    return y0
+
+if __name__ == '__main__':
+    # 7x7 growth pattern grid from the PCoA notebook
+    DailyData = pd.read_csv('../coronavirus_country_PCoA/DailyData.csv', index_col=0)
+    DailyDataFifty = DailyData.loc[:, DailyData.sum() > 50].clip(lower=0)**0.5
+
+    fig = plt.figure(figsize=(16, 12), dpi=200)
+    ax = fig.add_axes([0.01, 0.01, 0.98, 0.98])
+    line_grid(ax, DailyDataFifty.index, DailyDataFifty, ncols=7)
+    fig.savefig('pattern_grid.png')
+
+    # Daily temperature strips, one per city, ordered by latitude
+    df = pd.concat([pd.read_csv(f).assign(City=basename(f)[:-18]) for f in glob.glob('./*_max_temp_2019.csv')],
+                   ignore_index=True)
+    df['Date'] = pd.to_datetime(df[['Year', 'Month', 'Day']])
+    df = df.rename(columns={'Maximum temperature (Degree C)': 'max_tmp_day'})
+    df = df.loc[df['Year'] == 2019]
+    df['max_tmp_day'] = df.groupby('City')['max_tmp_day'].ffill()
+    cityList = ['hobart', 'melbourne', 'canberra', 'adelaide', 'sydney', 'perth', 'brisbane', 'darwin']
+
+    fig = plt.figure(figsize=(10, 10), dpi=300, facecolor='#222222')
+    ax = fig.add_axes([0.1, 0.05, 0.88, 0.9])
+    bar_strips(ax, df, 'City', 'Date', 'max_tmp_day', order=cityList, baseline=df['max_tmp_day'].mean(),
+               ylim=(-30, 30), label_color='#e3e3e3')
+    for i, mon in enumerate(calendar.month_abbr[1:13]):
+        ax.text((i + 0.5) / 12, -0.1, mon, ha='center', va='center', fontsize=8, color='#e3e3e3',
+                fontweight='bold')
+    fig.savefig('temp_strips.png', facecolor='#222222')
@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+'''
+Blitted, parallel renderer for the yearly maximum temperature animations.
+
+Two charts are rendered: the Sydney temperature and hot-day chart of
+Sydney-max-tmp.ipynb (TemperatureAnimation, animation5) and the chart of
+every main city of AUS-main-city-tmp.ipynb (CityAnimation, animation3/4).
+The notebooks clear the axes and replot the whole history on every frame.
+Here the figure, the static decorations (reference lines, legends, labels,
+spines) and one artist per moving element are built once; a frame only
+updates artist data, restores the cached background and redraws the moving
+artists. Frames are piped as raw RGBA buffers straight into ffmpeg.
+
+Long runs can split the frame range across worker processes. Each worker
+renders its own ffmpeg segment and the segments are joined with ffmpeg's
+concat demuxer, without re-encoding.
+
+A .gif output is encoded with a palette pass instead of H.264 (segments
+of a parallel run are H.264 and converted once joined).
+
+Usage:
+    python animate.py --city sydney --out animation5.mp4
+    python animate.py --city sydney --out animation5.mp4 --jobs 4 --timings
+    python animate.py --chart cities --out animation3.mp4
+    python animate.py --chart cities --out animation4.gif --jobs 4
+'''
+import os
+import time
+import argparse
+import tempfile
+import functools
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import numpy as np
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from matplotlib import cycler
+
+from climate import load_yearly_stats
+
+###################################
+# Private function and variable
+###################################
+
+FFMPEG = os.environ.get('FFMPEG_BINARY', 'ffmpeg')
+CITY_PATTERN = './*-max-tmp.csv'
+# One pass palette for GIF output
+GIF_FILTER = 'split[a][b];[a]palettegen[p];[b][p]paletteuse'
+
+def _set_style(colors=('#fc280f', '#5fdcff', '#f4ba26', '#85c54c', '#c6d7e0')):
+    '''Same plot style as Sydney-max-tmp.ipynb (AUS-main-city-tmp.ipynb with its colors)'''
+    colors = cycler('color', list(colors))
+    plt.rc('figure', facecolor='#222222')
+    plt.rc('axes', facecolor='#222222', edgecolor='#222222',
+           axisbelow=True, grid=True, prop_cycle=colors)
+    plt.rc('grid', color='#e3e3e3', linestyle='solid')
+    plt.rc('xtick', direction='in', color='#e3e3e3')
+    plt.rc('ytick', direction='in', color='#e3e3e3')
+    plt.rc('patch', edgecolor='#e3e3e3')
+    plt.rc('lines', linewidth=1.5)
+
+def yearly_series(path, hot_threshold=30):
+    '''Yearly maximum temperature and number of days at or above hot_threshold, through the climate.py cache'''
+    stats = load_yearly_stats(path, hot_threshold=hot_threshold)
+    return stats[['Year', 'max_tmp_year', 'hot_day']]
+
+def _output_args(out, crf=20):
+    '''ffmpeg encoding arguments for the extension of out'''
+    if out.lower().endswith('.gif'):
+        return ['-filter_complex', GIF_FILTER, out]
+    return ['-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-crf', str(crf), out]
+
+def _encoder(out, width, height, fps):
+    '''ffmpeg process reading raw RGBA frames from stdin'''
+    cmd = [FFMPEG, '-y', '-loglevel', 'error',
+           '-f', 'rawvideo', '-pix_fmt', 'rgba', '-s', '{}x{}'.format(width, height),
+           '-r', str(fps), '-i', '-'] + _output_args(out)
+    return subprocess.Popen(cmd, stdin=subprocess.PIPE)
+
+def _concat(segments, out, tmp):
+    '''Join ffmpeg segments with the concat demuxer, copying the streams unless out needs another codec'''
+    listing = os.path.join(tmp, 'segments.txt')
+    with open(listing, 'w') as f:
+        f.writelines("file '{}'\n".format(seg) for seg in segments)
+    codec = _output_args(out) if out.lower().endswith('.gif') else ['-c', 'copy', out]
+    subprocess.run([FFMPEG, '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0', '-i', listing] + codec,
+                   check=True)
+
+###################################
+# Public function
+###################################
+
+class BlittedAnimation:
+    '''
+    Frame rendering of the animations: a subclass builds self.fig with its
+    moving artists set animated, self.years (the year of every frame) and
+    update(i), which sets and returns the moving artists of frame i.
+    '''
+    background = None
+
+    def render_frame(self, i):
+        '''Blit frame i onto the cached background and return its RGBA buffer'''
+        canvas = self.fig.canvas
+        if self.background is None:
+            canvas.draw()
+            self.background = canvas.copy_from_bbox(self.fig.bbox)
+        canvas.restore_region(self.background)
+        for artist in self.update(i):
+            artist.axes.draw_artist(artist)
+        canvas.blit(self.fig.bbox)
+        return canvas.buffer_rgba()
+
+    def save(self, out, frames, fps=1000/300, timings=None):
+        '''Encode the given frame indices to out, recording seconds per frame'''
+        width, height = self.fig.canvas.get_width_height()
+        encoder = _encoder(out, width, height, fps)
+        for i in frames:
+            start = time.perf_counter()
+            encoder.stdin.write(self.render_frame(i))
+            if timings is not None:
+                timings.append((int(self.years[i]), time.perf_counter() - start))
+        encoder.stdin.close()
+        if encoder.wait() != 0:
+            raise RuntimeError('ffmpeg failed while writing {}'.format(out))
+
+class TemperatureAnimation(BlittedAnimation):
+    '''
+    Yearly max. temperature / hot-day animation with artists built once.
+
+    update(i) shows the history up to the i-th year and returns the moving
+    artists, so it can be used directly as a FuncAnimation(blit=True) func.
+    '''
+
+    def __init__(self, yearly, city='Sydney', figsize=(12, 4), dpi=300):
+        _set_style()
+        self.yearly = yearly
+        years = yearly['Year'].values
+        self.years = years
+        self.fig, self.ax = plt.subplots(figsize=figsize, dpi=dpi)
+        self.ax2 = self.ax.twinx()
+        ax, ax2 = self.ax, self.ax2
+
+        # Static decorations, drawn once into the background
+        ax.plot(years, np.full(len(years), 40), label='_1', color='#fc280f',
+                linestyle='dashed', alpha=0.1, linewidth=0.5, zorder=1)
+        ax2.plot(years, np.full(len(years), 20), label='_2', color='#eeb72b',
+                 linestyle='dashed', alpha=0.1, linewidth=0.5, zorder=1)
+
+        # Moving artists
+        self.line_tmp, = ax.plot([], [], label='Yearly max. temp. ($^\\circ$C)', color='#fc280f', zorder=3)
+        self.line_hot, = ax2.plot([], [], label='Yearly accumulated days above 30$^\\circ$C',
+                                  color='#eeb72b', zorder=3)
+        self.dot_tmp, = ax.plot([], [], 'o', color='#fc280f', markersize=8, markeredgecolor='w',
+                                markeredgewidth=1, zorder=4)
+        self.dot_hot, = ax2.plot([], [], 'o', color='#eeb72b', markersize=8, markeredgecolor='w',
+                                 markeredgewidth=1, zorder=4)
+        self.text_tmp = ax.text(0, 0, '', size=10, color='#fc280f', ha='center', va='bottom', zorder=5)
+        self.text_hot = ax2.text(0, 0, '', size=10, color='#eeb72b', ha='center', va='bottom', zorder=5)
+        self.text_year = ax.text(0.5, 0.5, '', fontweight='bold', size=60, color='#e3e3e3',
+                                 ha='center', va='center', alpha=0.5, transform=ax.transAxes, zorder=2)
+
+        for legend in (ax.legend(loc='upper left'), ax2.legend(loc='upper right')):
+            for text in legend.get_texts():
+                text.set_color('#e3e3e3')
+
+        # Axis limits are fixed over the whole history so the background stays valid
+        pad = 0.05 * (years.max() - years.min())
+        ax.set_xlim(years.min() - pad, years.max() + pad)
+        ax.set_ylim(0, yearly['max_tmp_year'].max()*1.68)
+        ax2.set_ylim(yearly['hot_day'].min()-5, yearly['hot_day'].max()*1.5)
+        ax.grid(False)
+        ax2.grid(False)
+        ax.set_ylabel('Temperature ($^\\circ$C)', color='#e3e3e3')
+        ax2.set_ylabel('Day', color='#e3e3e3')
+        for spine in ax2.spines.values():
+            spine.set_color('#e3e3e3')
+        for tick in ax.xaxis.get_ticklabels():
+            tick.set_fontsize('x-small')
+        ax.text(0.00, 1.05, '{} Annual Maximum Temperature From {} to {}'.format(city.title(), years.min(), years.max()),
+                color='#e3e3e3', transform=ax.transAxes, size=17, weight='light', ha='left')
+        ax.text(0.00, -0.1, 'Data source from http://www.bom.gov.au', color='#e3e3e3',
+                transform=ax.transAxes, size=5, weight='light', ha='left')
+
+        self.artists = [self.text_year, self.line_tmp, self.line_hot, self.dot_tmp, self.dot_hot,
+                        self.text_tmp, self.text_hot]
+        for artist in self.artists:
+            artist.set_animated(True)
+
+    def update(self, i):
+        '''Set the moving artists to show years[0..i]'''
+        years = self.years[:i+1]
+        tmp = self.yearly['max_tmp_year'].values[:i+1]
+        hot = self.yearly['hot_day'].values[:i+1]
+        self.line_tmp.set_data(years, tmp)
+        self.line_hot.set_data(years, hot)
+        self.dot_tmp.set_data([years[-1]], [tmp[-1]])
+        self.dot_hot.set_data([years[-1]], [hot[-1]])
+        self.text_tmp.set_position((years[-1], tmp[-1]+5))
+        self.text_tmp.set_text('Temp. {}'.format(tmp[-1]))
+        self.text_hot.set_position((years[-1], hot[-1]+0.7))
+        self.text_hot.set_text('{} Days'.format(int(hot[-1])))
+        self.text_year.set_text(str(years[-1]))
+        return self.artists
+
+class CityAnimation(BlittedAnimation):
+    '''
+    Yearly max. temperature of every main city (AUS-main-city-tmp.ipynb),
+    with one line, dot and label per city built once. A city whose record
+    has ended keeps its last point.
+    '''
+
+    def __init__(self, stats, years, figsize=(12, 4), dpi=300):
+        _set_style(['#8dd3c7', '#ffffb3', '#bebada', '#fb8072', '#80b1d3', '#fdb462', '#b3de69'])
+        self.years = np.asarray(years)
+        self.fig, self.ax = plt.subplots(figsize=figsize, dpi=dpi)
+        ax = self.ax
+        # (years, yearly max) of every city, and the number of its years up to every frame
+        self.series = {city: (df['Year'].values, df['max_tmp_year'].values)
+                       for city, df in stats.groupby('City', observed=True)}
+        self.shown = {city: np.searchsorted(y, self.years, side='right') for city, (y, _) in self.series.items()}
+
+        self.lines, self.dots, self.labels = {}, {}, {}
+        for city in self.series:
+            self.lines[city], = ax.plot([], [], alpha=0.8, zorder=2)
+            self.dots[city], = ax.plot([], [], 'o', color='w', markersize=7, markeredgecolor='k',
+                                       markeredgewidth=1, zorder=3)
+            self.labels[city] = ax.text(0, 0, '', size=5, color='#e3e3e3', ha='center', va='bottom', zorder=4)
+        self.text_year = ax.text(0.5, 0.5, '', fontweight='bold', size=60, color='#e3e3e3',
+                                 ha='center', va='center', alpha=0.5, transform=ax.transAxes, zorder=1)
+
+        # Axis limits are fixed over the whole history so the background stays valid
+        first = min(y[0] for y, _ in self.series.values())
+        last = max(y[-1] for y, _ in self.series.values())
+        pad = 0.01 * (last - first)
+        ax.set_xlim(first - pad, last + pad)
+        ax.set_ylim(20, stats.loc[stats['City'] == 'sydney', 'max_tmp_year'].max()*1.3)
+        for tick in ax.xaxis.get_ticklabels():
+            tick.set_fontsize('x-small')
+
+        self.artists = [self.text_year] + list(self.lines.values()) + list(self.dots.values()) + list(self.labels.values())
+        for artist in self.artists:
+            artist.set_animated(True)
+
+    def update(self, i):
+        '''Set the moving artists to show every city up to years[i]'''
+        for city, (years, tmp) in self.series.items():
+            n = self.shown[city][i]
+            self.lines[city].set_data(years[:n], tmp[:n])
+            if n:
+                self.dots[city].set_data([years[n-1]], [tmp[n-1]])
+                self.labels[city].set_position((years[n-1], tmp[n-1]+1))
+                self.labels[city].set_text('{} {}'.format(city.title(), tmp[n-1]))
+            else:
+                self.dots[city].set_data([], [])
+                self.labels[city].set_text('')
+        self.text_year.set_text(str(self.years[i]))
+        return self.artists
+
+def _render_segment(args):
+    make, frames, out, fps = args
+    anim = make()
+    timings = []
+    anim.save(out, frames, fps=fps, timings=timings)
+    plt.close(anim.fig)
+    return timings
+
+def _run(make, n_frames, out, fps, n_jobs):
+    '''
+    Encode the frames of make() (a picklable animation factory) to out,
+    in n_jobs segments rendered in parallel when n_jobs > 1.
+    Returns a DataFrame of (Year, seconds) per frame.
+    '''
+    frames = np.arange(n_frames)
+    if n_jobs == 1:
+        return pd.DataFrame(_render_segment((make, frames, out, fps)), columns=['Year', 'seconds'])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        chunks = [c for c in np.array_split(frames, n_jobs) if len(c)]
+        segments = [os.path.join(tmp, 'segment_{:03d}.mp4'.format(k)) for k in range(len(chunks))]
+        tasks = [(make, chunk, seg, fps) for chunk, seg in zip(chunks, segments)]
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            results = list(executor.map(_render_segment, tasks))
+        _concat(segments, out, tmp)
+
+    return pd.DataFrame([t for r in results for t in r], columns=['Year', 'seconds'])
+
+def render(path, out, city='Sydney', dpi=300, fps=1000/300, n_jobs=1, last_year=None):
+    '''
+    Render the animation for one city file to out, optionally splitting the
+    frame range into n_jobs ffmpeg segments rendered in parallel.
+    Returns a DataFrame of (Year, seconds) per frame.
+    '''
+    yearly = yearly_series(path)
+    # The notebooks stop before the latest, incomplete year
+    last_year = yearly['Year'].max() - 1 if last_year is None else last_year
+    yearly = yearly.loc[yearly['Year'] <= last_year].reset_index(drop=True)
+    make = functools.partial(TemperatureAnimation, yearly, city=city, dpi=dpi)
+    return _run(make, len(yearly), out, fps, n_jobs)
+
+def render_cities(out, pattern=CITY_PATTERN, dpi=300, fps=1000/300, n_jobs=1, last_year=None):
+    '''
+    Render the animation of every city file matching pattern to out, one
+    frame per year from the first record to last_year, as render().
+    '''
+    stats = load_yearly_stats(pattern)
+    last_year = stats['Year'].max() - 1 if last_year is None else last_year
+    years = np.arange(stats['Year'].min(), last_year + 1)
+    make = functools.partial(CityAnimation, stats, years, dpi=dpi)
+    return _run(make, len(years), out, fps, n_jobs)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--chart', default='line', choices=['line', 'cities'],
+                        help='line: one city (animation5), cities: every city file (animation3/4)')
+    parser.add_argument('--city', default='sydney')
+    parser.add_argument('--out', default=None, help='default: animation5.mp4 (line), animation3.mp4 (cities)')
+    parser.add_argument('--dpi', type=int, default=300)
+    parser.add_argument('--fps', type=float, default=1000/300)
+    parser.add_argument('--jobs', type=int, default=1)
+    parser.add_argument('--timings', action='store_true', help='print the render time of every frame')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.chart == 'cities':
+        timings = render_cities(args.out or './animation3.mp4', dpi=args.dpi, fps=args.fps, n_jobs=args.jobs)
+    else:
+        timings = render('./{}-max-tmp.csv'.format(args.city), args.out or './animation5.mp4', city=args.city,
+                         dpi=args.dpi, fps=args.fps, n_jobs=args.jobs)
+    if args.timings:
+        for year, seconds in timings.itertuples(index=False):
+            print('{} {:.1f} ms'.format(year, seconds*1000))
+    print('{} frames, {:.1f} ms/frame mean, {:.1f} ms/frame max, {:.1f}s total'.format(
+        len(timings), timings['seconds'].mean()*1000, timings['seconds'].max()*1000,
+        time.perf_counter() - start))
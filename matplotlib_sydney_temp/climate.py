@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+'''
+Vectorized climate statistics over the BOM daily maximum temperature files.
+
+All ./*-max-tmp.csv files are read into one long-format frame with a City
+categorical. Dates are built from the integer Year/Month/Day columns, and the
+per-city-per-year maximum, threshold flags and hot-day counts are computed
+in one grouped pass instead of row loops and chained assignment.
+
+Yearly statistics are cached as a Parquet file (requires pyarrow) keyed by
+the path, size and modification time of every source file, so later runs
+skip the CSV parsing entirely.
+
+Usage:
+    python climate.py                 # print yearly statistics for all cities
+'''
+import os
+import glob
+import hashlib
+import warnings
+from os.path import basename
+
+import pandas as pd
+import numpy as np
+
+###################################
+# Private function and variable
+###################################
+
+PATTERN = './*-max-tmp.csv'
+CACHE_DIR = './.cache/'
+
+COLUMNS = {'Year': 'int16', 'Month': 'int8', 'Day': 'int8',
+           'Maximum temperature (Degree C)': 'float64'}
+
+def _city(path):
+    '''City name from a file name such as sydney-max-tmp.csv'''
+    return basename(path)[:-len('-max-tmp.csv')]
+
+def _cache_key(files, **params):
+    '''Key changing whenever a source file or a parameter changes'''
+    h = hashlib.sha1()
+    for f in sorted(files):
+        stat = os.stat(f)
+        h.update('{}:{}:{}'.format(os.path.abspath(f), stat.st_size, stat.st_mtime_ns).encode())
+    h.update(repr(sorted(params.items())).encode())
+    return h.hexdigest()[:16]
+
+###################################
+# Public function
+###################################
+
+def load_all(pattern=PATTERN):
+    '''Long-format daily frame (City, date, Year, Month, Day, max_tmp_day) for every file'''
+    files = sorted(glob.glob(pattern))
+    frames = [pd.read_csv(f, usecols=list(COLUMNS), dtype=COLUMNS) for f in files]
+    cities = [_city(f) for f in files]
+
+    df = pd.concat(frames, ignore_index=True)
+    df = df.rename(columns={'Maximum temperature (Degree C)': 'max_tmp_day'})
+    df.insert(0, 'City', pd.Categorical(np.repeat(cities, [len(i) for i in frames]), categories=cities))
+    df.insert(1, 'date', pd.to_datetime(pd.DataFrame({'year': df['Year'], 'month': df['Month'], 'day': df['Day']})))
+    return df
+
+def yearly_stats(df, hot_threshold=30, near_max=0.95):
+    '''
+    Per-city-per-year statistics in one grouped pass:
+    max_tmp_year, mean_tmp_year, days (observed), hot_day (days at or above
+    hot_threshold, as in Sydney-max-tmp.ipynb) and near_max_day (days within
+    near_max of the yearly maximum, as in AUS-main-city-tmp.ipynb).
+    '''
+    keys = [df['City'], df['Year']]
+    max_tmp_year = df.groupby(keys, observed=True)['max_tmp_day'].transform('max')
+
+    flags = pd.DataFrame({
+        'City': df['City'],
+        'Year': df['Year'],
+        'max_tmp_day': df['max_tmp_day'],
+        'hot': df['max_tmp_day'] >= hot_threshold,
+        'near_max': df['max_tmp_day'] >= max_tmp_year * near_max,
+    })
+    stats = flags.groupby(['City', 'Year'], observed=True).agg(
+        max_tmp_year=('max_tmp_day', 'max'),
+        mean_tmp_year=('max_tmp_day', 'mean'),
+        days=('max_tmp_day', 'count'),
+        hot_day=('hot', 'sum'),
+        near_max_day=('near_max', 'sum'),
+    )
+    return stats.astype({'hot_day': 'int16', 'near_max_day': 'int16', 'days': 'int16'}).reset_index()
+
+def load_yearly_stats(pattern=PATTERN, hot_threshold=30, near_max=0.95, cache_dir=CACHE_DIR):
+    '''yearly_stats over every file matching pattern, read from the cache when unchanged'''
+    files = glob.glob(pattern)
+    key = _cache_key(files, hot_threshold=hot_threshold, near_max=near_max)
+    path = os.path.join(cache_dir, 'yearly_stats_{}.parquet'.format(key))
+
+    if os.path.exists(path):
+        return pd.read_parquet(path)
+
+    stats = yearly_stats(load_all(pattern), hot_threshold, near_max)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        stats.to_parquet(path, index=False)
+    except ImportError:
+        warnings.warn('pyarrow is not installed, yearly statistics are not cached')
+    return stats
+
+if __name__ == '__main__':
+    stats = load_yearly_stats()
+    print(stats.groupby('City', observed=True).tail(3).to_string(index=False))
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+'''
+Statistical micro-benchmark harness.
+
+Re-runs the idiom comparisons of speed_up_python_code.ipynb and the
+dashboard's data functions with warm-up, repeated runs, bootstrap confidence
+intervals and peak memory, and writes a JSON report that can be compared
+between commits.
+
+Usage (from speed_up_python_code/):
+    python -m benchmark run --out report.json
+    python -m benchmark run --suite idioms --repeat 30 --out report.json
+    python -m benchmark compare old.json new.json
+    python -m benchmark history --freeze --fixture history_fixture --out history.json
+'''
+from .harness import Case, measure, run_cases, make_report, save_report, load_report, compare
+from . import idioms, dashboard, history
+
+# Suite name -> function returning its cases
+SUITES = {
+    'idioms': idioms.cases,
+    'dashboard': dashboard.dashboard_cases,
+    'lineplot': dashboard.lineplot_cases,
+}
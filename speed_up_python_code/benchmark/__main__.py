@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import sys
+import argparse
+
+from . import SUITES, run_cases, make_report, save_report, load_report, compare, history
+from .harness import format_seconds
+
+def _run(args):
+    results, skipped = [], {}
+    for suite in args.suite:
+        kwargs = {'size': args.size} if suite == 'idioms' else {}
+        kwargs.update({'n_snapshots': args.snapshots} if suite == 'lineplot' else {})
+        try:
+            cases = SUITES[suite](**kwargs)
+        except Exception as e:
+            # A suite whose code or data cannot be loaded is reported, not fatal
+            skipped[suite] = '{}: {}'.format(type(e).__name__, e)
+            print('{:<10} skipped ({})'.format(suite, skipped[suite]), file=sys.stderr)
+            continue
+        for result in run_cases(suite, cases, repeat=args.repeat, warmup=args.warmup,
+                                memory=not args.no_memory):
+            results.append(result)
+            memory = '' if result['peak_bytes'] is None else '{:>10.1f} KiB'.format(result['peak_bytes'] / 1024)
+            print('{:<10} {:<22} {:<16} {:>10} [{} - {}]{}'.format(
+                suite, result['group'], result['name'], format_seconds(result['median']),
+                format_seconds(result['ci_low']), format_seconds(result['ci_high']), memory))
+    save_report(make_report(results, skipped), args.out)
+
+def _compare(args):
+    rows = compare(load_report(args.old), load_report(args.new), threshold=args.threshold)
+    for row in rows:
+        print('{:<10} {:<22} {:<16} {:>10} -> {:>10}  x{:.2f}  {}'.format(
+            row['suite'], row['group'], row['name'], format_seconds(row['old_median']),
+            format_seconds(row['new_median']), row['ratio'], row['verdict']))
+    # Non-zero exit status when something got slower, for use in scripts
+    return 1 if any(row['verdict'] == 'slower' for row in rows) else 0
+
+def _history(args):
+    if args.freeze:
+        print('froze fixture {} in {}'.format(history.freeze_fixture(args.fixture), args.fixture))
+
+    def progress(result):
+        print('{:<32} {}'.format(result['script'], result.get('error') or '{} lines, import {}, {:.0f} MiB'.format(
+            result['lines'], format_seconds(result['import_seconds']), result['peak_rss'] / 2**20)))
+
+    report = history.run_history(args.fixture, scripts=args.scripts, repeat=args.repeat,
+                                 timeout=args.timeout, progress=progress)
+    save_report(report, args.out)
+    table = history.history_table(report)
+    for metric in history.METRICS:
+        jumps = history.steps(table, metric, threshold=args.threshold)
+        if len(jumps):
+            print('\n{} jumps by more than {:.0%}:'.format(metric, args.threshold))
+            print(jumps.to_string())
+
+parser = argparse.ArgumentParser(prog='python -m benchmark')
+commands = parser.add_subparsers(dest='command', required=True)
+
+run = commands.add_parser('run', help='run suites and write a JSON report')
+run.add_argument('--suite', nargs='+', default=sorted(SUITES), choices=sorted(SUITES))
+run.add_argument('--out', default='benchmark_report.json')
+run.add_argument('--repeat', type=int, default=20)
+run.add_argument('--warmup', type=int, default=2)
+run.add_argument('--size', type=int, default=100000, help='list length of the idioms suite')
+run.add_argument('--snapshots', type=int, default=200, help='raw_data snapshots used by the lineplot suite')
+run.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+
+cmp = commands.add_parser('compare', help='compare two JSON reports')
+cmp.add_argument('old')
+cmp.add_argument('new')
+cmp.add_argument('--threshold', type=float, default=0.05)
+
+hist = commands.add_parser('history', help='measure the history_version snapshots against a data fixture')
+hist.add_argument('--fixture', default='history_fixture', help='frozen copy of the data the snapshots read')
+hist.add_argument('--freeze', action='store_true', help='(re)create the fixture from dash-2019-coronavirus first')
+hist.add_argument('--scripts', nargs='+', help='snapshot scripts to measure (default: all, by date)')
+hist.add_argument('--out', default='history_report.json')
+hist.add_argument('--repeat', type=int, default=5, help='runs per callback')
+hist.add_argument('--timeout', type=int, default=600, help='seconds allowed per snapshot')
+hist.add_argument('--threshold', type=float, default=0.2, help='relative growth reported as a step')
+
+args = parser.parse_args()
+sys.exit({'run': _run, 'compare': _compare, 'history': _history}[args.command](args))
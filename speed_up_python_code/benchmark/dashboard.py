@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+'''
+Benchmark cases for the data functions of the COVID-19 dashboard.
+
+The 'dashboard' suite imports dash-2019-coronavirus/app.py itself (run from
+its own directory, since it reads its data with relative paths) and times
+make_country_table, make_continent_table and render_region_map with the
+arguments the app uses.
+
+The 'lineplot' suite times the df_for_lineplot_diff pipeline of
+history_version/app_replaced_20200317.py. That script cannot be imported
+(it reads a data.xls that is no longer shipped), so only the function is
+compiled from its source, and its input is built from raw_data/*.csv with
+the notebook's cleansing steps.
+'''
+import os
+import ast
+import sys
+from contextlib import contextmanager
+from datetime import timedelta
+
+import pandas as pd
+import numpy as np
+
+from .harness import Case
+
+###################################
+# Private function and variable
+###################################
+
+APP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'dash-2019-coronavirus'))
+LINEPLOT_SCRIPT = os.path.join(APP_DIR, 'history_version', 'app_replaced_20200317.py')
+
+@contextmanager
+def _in_app_dir():
+    cwd = os.getcwd()
+    os.chdir(APP_DIR)
+    sys.path.insert(0, APP_DIR)
+    try:
+        yield
+    finally:
+        sys.path.remove(APP_DIR)
+        os.chdir(cwd)
+
+def _load_function(path, name, namespace):
+    '''Compile only the top-level function `name` of a script into namespace'''
+    with open(path) as f:
+        tree = ast.parse(f.read(), filename=path)
+    node = next(n for n in tree.body if isinstance(n, ast.FunctionDef) and n.name == name)
+    exec(compile(ast.Module(body=[node], type_ignores=[]), path, 'exec'), namespace)
+    return namespace[name]
+
+###################################
+# Public function
+###################################
+
+def load_snapshots(raw_dir=os.path.join(APP_DIR, 'raw_data'), n_snapshots=None):
+    '''
+    Raw snapshots as {sheet name: DataFrame}, newest first, cleansed as in
+    Data_cleansing.ipynb (filled counts, China renamed, AEDT timestamps).
+    '''
+    sheet_name = sorted((i[:-4] for i in os.listdir(raw_dir) if 'data' not in i and i.endswith('.csv')),
+                        reverse=True)[:n_snapshots]
+    dfs = {}
+    for key in sheet_name:
+        df = pd.read_csv(os.path.join(raw_dir, key + '.csv'))
+        df[['Confirmed', 'Deaths', 'Recovered']] = df[['Confirmed', 'Deaths', 'Recovered']].fillna(0).astype('int64')
+        df = df.replace({'Country/Region': 'Mainland China'}, 'China')
+        df['Date_last_updated_AEDT'] = pd.to_datetime(df['Last Update'], format='%m/%d/%Y %H:%M') + timedelta(hours=16)
+        dfs[key] = df
+    return dfs
+
+def dashboard_cases():
+    '''Cases for the app's table and map functions; needs app.py to import'''
+    with _in_app_dir():
+        import app
+
+    europe = app.list_dict['Europe']
+    return [
+        Case('make_country_table', 'Australia', app.make_country_table, lambda: ('Australia',)),
+        Case('make_country_table', 'US', app.make_country_table, lambda: ('US',)),
+        Case('make_country_table', 'China', app.make_country_table, lambda: ('China',)),
+        Case('make_continent_table', 'Europe', app.make_continent_table, lambda: (europe,)),
+        Case('render_region_map', 'Brazil', app.render_region_map,
+             lambda: (app.df_brazil, app.BrazilTable, -12.423067, -58.627803, 3)),
+        Case('render_region_map', 'Germany', app.render_region_map,
+             lambda: (app.df_germany, app.GermanyTable, 50.849548, 10.231292, 5)),
+    ]
+
+def lineplot_cases(n_snapshots=200):
+    '''Cases for loading snapshots and df_for_lineplot_diff over the latest n_snapshots'''
+    df_for_lineplot_diff = _load_function(LINEPLOT_SCRIPT, 'df_for_lineplot_diff', {'pd': pd, 'np': np})
+    dfs = load_snapshots(n_snapshots=n_snapshots)
+    cases = [Case('load_snapshots', '{} snapshots'.format(len(dfs)), load_snapshots,
+                  lambda: (os.path.join(APP_DIR, 'raw_data'), n_snapshots))]
+    for case_type in ('Confirmed', 'Recovered', 'Deaths'):
+        cases.append(Case('df_for_lineplot_diff', case_type, df_for_lineplot_diff,
+                          lambda case_type=case_type: (dfs, case_type)))
+    return cases
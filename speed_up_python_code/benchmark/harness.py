@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+'''
+Measurement core: warm-up, calibrated repeated runs, bootstrap confidence
+intervals, peak memory, and JSON reports that can be compared between commits.
+'''
+import gc
+import sys
+import json
+import time
+import platform
+import subprocess
+import tracemalloc
+from datetime import datetime
+from collections import namedtuple
+
+import numpy as np
+
+###################################
+# Private function and variable
+###################################
+
+# One benchmark: setup() returns the argument tuple of func. With fresh=True
+# setup runs before every call (for functions that mutate their input, such
+# as list.sort), otherwise once per run and the call is looped.
+Case = namedtuple('Case', ['group', 'name', 'func', 'setup', 'fresh'])
+Case.__new__.__defaults__ = (None, False)
+
+def _calibrate(func, args, min_run_time):
+    '''Number of calls per run so that one run takes at least min_run_time seconds'''
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func(*args)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_run_time or loops >= 10**7:
+            return loops
+        # Aim a little above the target, at most 10x per step
+        loops = int(loops * min(10, max(2, 1.2 * min_run_time / max(elapsed, 1e-9))))
+
+def _timed_run(func, setup, fresh, loops):
+    '''Seconds per call of one run'''
+    if fresh:
+        total = 0.0
+        for _ in range(loops):
+            args = setup() if setup else ()
+            start = time.perf_counter()
+            func(*args)
+            total += time.perf_counter() - start
+        return total / loops
+    args = setup() if setup else ()
+    start = time.perf_counter()
+    for _ in range(loops):
+        func(*args)
+    return (time.perf_counter() - start) / loops
+
+def _bootstrap_ci(samples, statistic=np.median, level=0.95, n_boot=2000, seed=0):
+    '''Percentile bootstrap confidence interval of a statistic'''
+    samples = np.asarray(samples)
+    rng = np.random.RandomState(seed)
+    resampled = statistic(samples[rng.randint(0, len(samples), (n_boot, len(samples)))], axis=1)
+    tail = (1 - level) / 2 * 100
+    return tuple(np.percentile(resampled, [tail, 100 - tail]))
+
+def _peak_memory(func, setup):
+    '''Peak bytes allocated by one call, as traced by tracemalloc'''
+    args = setup() if setup else ()
+    tracemalloc.start()
+    try:
+        func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+def _git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+###################################
+# Public function
+###################################
+
+def measure(func, setup=None, fresh=False, repeat=20, warmup=2, min_run_time=0.02, memory=True):
+    '''
+    Time func(*setup()) over `repeat` runs after `warmup` discarded runs.
+
+    Each run loops enough calls to last about min_run_time (one call per
+    run when fresh is set), with the garbage collector disabled as timeit
+    does. Returns a dict of per-call statistics in seconds, the 95%
+    bootstrap interval of the median and the peak traced memory in bytes.
+    '''
+    loops = 1 if fresh else _calibrate(func, setup() if setup else (), min_run_time)
+
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(warmup):
+            _timed_run(func, setup, fresh, loops)
+        samples = [_timed_run(func, setup, fresh, loops) for _ in range(repeat)]
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    ci_low, ci_high = _bootstrap_ci(samples)
+    return {
+        'loops': loops,
+        'runs': repeat,
+        'mean': float(np.mean(samples)),
+        'median': float(np.median(samples)),
+        'stdev': float(np.std(samples, ddof=1)) if repeat > 1 else 0.0,
+        'min': float(np.min(samples)),
+        'ci_low': float(ci_low),
+        'ci_high': float(ci_high),
+        'peak_bytes': _peak_memory(func, setup) if memory else None,
+    }
+
+def run_cases(suite, cases, **kwargs):
+    '''measure every Case, returning one result dict per case'''
+    results = []
+    for case in cases:
+        result = measure(case.func, case.setup, case.fresh, **kwargs)
+        result.update({'suite': suite, 'group': case.group, 'name': case.name})
+        results.append(result)
+    return results
+
+def make_report(results, skipped=None):
+    '''Report dict with the environment the results were measured in'''
+    import pandas as pd
+    return {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'argv': sys.argv,
+        },
+        'skipped': skipped or {},
+        'results': results,
+    }
+
+def save_report(report, path):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=1, sort_keys=True)
+
+def load_report(path):
+    with open(path) as f:
+        return json.load(f)
+
+def compare(old, new, threshold=0.05):
+    '''
+    Compare two reports case by case. A change is only called faster or
+    slower when the median moved by more than threshold and the two 95%
+    intervals do not overlap. Returns a list of dicts, one per common case.
+    '''
+    key = lambda r: (r['suite'], r['group'], r['name'])
+    before = {key(r): r for r in old['results']}
+    rows = []
+    for r in new['results']:
+        if key(r) not in before:
+            continue
+        b = before[key(r)]
+        ratio = r['median'] / b['median'] if b['median'] else float('nan')
+        disjoint = r['ci_low'] > b['ci_high'] or r['ci_high'] < b['ci_low']
+        if disjoint and ratio < 1 - threshold:
+            verdict = 'faster'
+        elif disjoint and ratio > 1 + threshold:
+            verdict = 'slower'
+        else:
+            verdict = 'same'
+        rows.append({'suite': r['suite'], 'group': r['group'], 'name': r['name'],
+                     'old_median': b['median'], 'new_median': r['median'],
+                     'ratio': ratio, 'verdict': verdict})
+    return rows
+
+def format_seconds(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return '{:.3g} {}'.format(seconds / scale, unit)
+    return '{:.3g} ns'.format(seconds / 1e-9)
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+'''
+Performance history of the dashboard snapshots in
+dash-2019-coronavirus/history_version/.
+
+Every snapshot is imported in its own subprocess (see snapshot.py) against a
+frozen copy of the data, so the numbers of different snapshots only differ
+by their code: import time, peak RSS, size of the layout JSON and the
+latency of each callback called with the layout's initial values. The
+results form a time series ordered by the date in the file name, and
+steps() lists the snapshots where a metric jumps, to know where to bisect.
+'''
+import os
+import re
+import sys
+import json
+import shutil
+import hashlib
+import subprocess
+
+import pandas as pd
+
+from .dashboard import APP_DIR
+from .harness import make_report
+
+###################################
+# Private function and variable
+###################################
+
+SNAPSHOT_DIR = os.path.join(APP_DIR, 'history_version')
+PACKAGE_PARENT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Data the snapshots read with relative paths
+FIXTURE_DIRS = ['cumulative_data', 'lineplot_data', 'raw_data', 'Country_data']
+FIXTURE_PATTERN = re.compile(r'.*\.(csv|xls|xlsx)$')
+
+METRICS = ['import_seconds', 'import_rss', 'peak_rss', 'layout_bytes', 'callback_seconds']
+
+def _fixture_files(root):
+    '''Relative paths of the data files below root'''
+    files = [name for name in os.listdir(root)
+             if FIXTURE_PATTERN.match(name) and not name.startswith('~$') and os.path.isfile(os.path.join(root, name))]
+    for directory in FIXTURE_DIRS:
+        for base, _, names in os.walk(os.path.join(root, directory)):
+            files.extend(os.path.relpath(os.path.join(base, n), root) for n in names)
+    return sorted(files)
+
+def _snapshot_date(name):
+    match = re.search(r'(2020\d{4})', name)
+    return pd.Timestamp(match.group(1)).date().isoformat() if match else None
+
+def _lines(path):
+    with open(path, encoding='utf-8', errors='replace') as f:
+        return sum(1 for _ in f)
+
+###################################
+# Public function
+###################################
+
+def freeze_fixture(dest, app_dir=APP_DIR):
+    '''
+    Copy the data files of app_dir into dest and write a manifest of their
+    sha1, so later runs can check they measure against the same data.
+    '''
+    manifest = {}
+    for rel in _fixture_files(app_dir):
+        os.makedirs(os.path.join(dest, os.path.dirname(rel)), exist_ok=True)
+        shutil.copy2(os.path.join(app_dir, rel), os.path.join(dest, rel))
+        with open(os.path.join(dest, rel), 'rb') as f:
+            manifest[rel] = hashlib.sha1(f.read()).hexdigest()
+    with open(os.path.join(dest, 'fixture.json'), 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    return fixture_digest(dest)
+
+def fixture_digest(fixture):
+    '''Digest of a frozen fixture's manifest'''
+    with open(os.path.join(fixture, 'fixture.json'), 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+def snapshots(snapshot_dir=SNAPSHOT_DIR):
+    '''Dashboard scripts of snapshot_dir as (date or None, path), dated ones first in date order'''
+    paths = [os.path.join(snapshot_dir, n) for n in os.listdir(snapshot_dir)
+             if n.startswith('app') and n.endswith('.py')]
+    dated = [(_snapshot_date(os.path.basename(p)), p) for p in paths]
+    return sorted(dated, key=lambda d: (d[0] is None, d[0] or '', os.path.basename(d[1])))
+
+def run_snapshot(script, fixture, repeat=5, timeout=600):
+    '''
+    Measure one script in a fresh interpreter. Returns the dict printed by
+    snapshot.py, or {'script': ..., 'error': ...} when the script fails.
+    '''
+    pythonpath = os.pathsep.join(p for p in (PACKAGE_PARENT, os.environ.get('PYTHONPATH')) if p)
+    env = dict(os.environ, PYTHONPATH=pythonpath, PYTHONHASHSEED='0', MPLBACKEND='Agg')
+    command = [sys.executable, '-m', 'benchmark.snapshot', script, fixture, '--repeat', str(repeat)]
+    try:
+        out = subprocess.run(command, capture_output=True, text=True, env=env, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {'script': os.path.basename(script), 'error': 'timeout after {}s'.format(timeout)}
+    if out.returncode != 0:
+        # Last line of the traceback, e.g. a module or data file the snapshot needs
+        lines = out.stderr.strip().splitlines() or ['exit status {}'.format(out.returncode)]
+        return {'script': os.path.basename(script), 'error': lines[-1]}
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def run_history(fixture, scripts=None, repeat=5, timeout=600, progress=None):
+    '''
+    Measure every snapshot (or the given scripts) against a frozen fixture,
+    one subprocess at a time so that the runs do not compete for the CPU.
+    Returns a report in the format of harness.make_report.
+    '''
+    scripts = scripts or [path for _, path in snapshots()]
+    results = []
+    for script in scripts:
+        result = run_snapshot(script, os.path.abspath(fixture), repeat=repeat, timeout=timeout)
+        result.update({'date': _snapshot_date(os.path.basename(script)), 'lines': _lines(script)})
+        results.append(result)
+        if progress:
+            progress(result)
+    report = make_report(results)
+    report['meta']['fixture'] = fixture_digest(fixture)
+    return report
+
+def history_table(report):
+    '''
+    One row per snapshot in report order, with the source lines, the import
+    metrics, the number of callbacks and their total median latency.
+    '''
+    rows = []
+    for r in report['results']:
+        callbacks = [c for c in r.get('callbacks', []) if 'median' in c]
+        rows.append({
+            'script': r['script'], 'date': r.get('date'), 'lines': r.get('lines'),
+            'import_seconds': r.get('import_seconds'), 'import_rss': r.get('import_rss'),
+            'peak_rss': r.get('peak_rss'), 'layout_bytes': r.get('layout_bytes'),
+            'callbacks': len(r.get('callbacks', [])) if 'error' not in r else None,
+            'callback_seconds': sum(c['median'] for c in callbacks) if callbacks else None,
+            'error': r.get('error'),
+        })
+    return pd.DataFrame(rows).set_index('script')
+
+def steps(table, metric='import_seconds', threshold=0.2):
+    '''
+    Snapshots where metric grew by more than threshold (relative) since the
+    previous measured snapshot: the places to bisect a regression.
+    '''
+    series = table[metric].dropna().astype(float)
+    change = series / series.shift() - 1
+    jumps = change[change > threshold]
+    return pd.DataFrame({'previous': series.shift()[jumps.index], metric: series[jumps.index],
+                         'change': jumps})
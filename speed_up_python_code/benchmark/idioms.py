@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+'''
+The idiom comparisons of speed_up_python_code.ipynb as benchmark cases.
+
+Each group holds the "clumsy" and the "good" version of one notebook
+section, run on the same data (random integers, seed 666, as in the notebook).
+The Counter section's dict loop is fixed to use its own dictionary; in the
+notebook it referenced an undefined num_counts.
+'''
+import random
+from collections import Counter
+
+from .harness import Case
+
+###################################
+# Private function and variable
+###################################
+
+def _long_list(n, high, seed=666):
+    random.seed(seed)
+    return [random.randint(0, high) for _ in range(n)]
+
+# unique
+def _unique_loop(values):
+    unique = []
+    for n in values:
+        if n not in unique:
+            unique.append(n)
+    return unique
+
+def _unique_set(values):
+    return list(set(values))
+
+# sum
+def _sum_loop(values):
+    sum_value = 0
+    for n in values:
+        sum_value += n
+    return sum_value
+
+# comprehension
+def _even_loop(values):
+    even_num = []
+    for number in values:
+        if number % 2 == 0:
+            even_num.append(number)
+    return even_num
+
+def _even_comprehension(values):
+    return [number for number in values if number % 2 == 0]
+
+# membership
+def _check_membership(values, n):
+    for element in values:
+        if element == n:
+            return True
+    return False
+
+def _in_container(container, n):
+    return n in container
+
+# counter
+def _count_loop(values):
+    num_counts = {}
+    for num in values:
+        if num in num_counts:
+            num_counts[num] += 1
+        else:
+            num_counts[num] = 1
+    return num_counts
+
+def _count_get(values):
+    num_counts = {}
+    for num in values:
+        num_counts[num] = num_counts.get(num, 0) + 1
+    return num_counts
+
+# function call inside or outside the loop
+def _compute_cubic(number):
+    return number**3
+
+def _cubic_call_per_item(values):
+    return [_compute_cubic(number) for number in values]
+
+def _cubic_loop_inside(values):
+    return [number**3 for number in values]
+
+# zip
+def _unzip(pairs):
+    return tuple(zip(*pairs))
+
+def _unzip_comprehension(pairs):
+    return [pair[0] for pair in pairs], [pair[1] for pair in pairs]
+
+###################################
+# Public function
+###################################
+
+def cases(size=100000):
+    '''Benchmark cases for every notebook section, on lists of `size` integers'''
+    a_long_list = _long_list(size, 50)
+    another_long_list = _long_list(size, 500)
+    check_set = set(another_long_list)
+    pairs = list(zip(map(str, a_long_list), map(str, another_long_list)))
+
+    data = lambda: (a_long_list,)
+    other = lambda: (another_long_list,)
+    return [
+        Case('unique', 'loop', _unique_loop, data),
+        Case('unique', 'set', _unique_set, data),
+        Case('sum', 'loop', _sum_loop, data),
+        Case('sum', 'builtin', sum, data),
+        Case('sort', 'sorted', sorted, data),
+        # list.sort works in place, so every call gets a fresh copy
+        Case('sort', 'list.sort', list.sort, lambda: (list(a_long_list),), True),
+        Case('comprehension', 'loop', _even_loop, other),
+        Case('comprehension', 'comprehension', _even_comprehension, other),
+        Case('membership', 'loop', _check_membership, lambda: (another_long_list, 900)),
+        Case('membership', 'in list', _in_container, lambda: (another_long_list, 900)),
+        Case('membership', 'in set', _in_container, lambda: (check_set, 900)),
+        Case('membership', 'build set', set, other),
+        Case('counter', 'dict loop', _count_loop, data),
+        Case('counter', 'dict.get', _count_get, data),
+        Case('counter', 'Counter', Counter, data),
+        Case('function call', 'call per item', _cubic_call_per_item, data),
+        Case('function call', 'loop inside', _cubic_loop_inside, data),
+        Case('zip', 'zip(*pairs)', _unzip, lambda: (pairs,)),
+        Case('zip', 'comprehensions', _unzip_comprehension, lambda: (pairs,)),
+    ]
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+'''
+Measure one dashboard script in the current process and print the result as
+a JSON line. Run by history.run_snapshot in a fresh subprocess per script, so
+imports, caches and memory of one snapshot never leak into the next.
+
+Usage:
+    python -m benchmark.snapshot SCRIPT FIXTURE_DIR [--repeat N]
+'''
+import os
+import sys
+import json
+import time
+import resource
+import argparse
+import importlib.util
+
+###################################
+# Private function and variable
+###################################
+
+# Callbacks registered while the script is imported: (args, kwargs, function)
+_REGISTERED = []
+
+def _record_callbacks():
+    '''Wrap dash.Dash.callback so the undecorated callback functions are kept'''
+    import dash
+    original = dash.Dash.callback
+
+    def callback(self, *args, **kwargs):
+        decorator = original(self, *args, **kwargs)
+        def wrap(func):
+            _REGISTERED.append((args, kwargs, func))
+            return decorator(func)
+        return wrap
+
+    dash.Dash.callback = callback
+
+def _peak_rss():
+    '''Peak resident set size of this process in bytes'''
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def _dependencies(args, kwargs):
+    '''Flat (Input and State) dependencies of a callback, in call order'''
+    from dash.dependencies import Input, State
+    flat = []
+    for item in list(args) + [kwargs.get('inputs', []), kwargs.get('state', [])]:
+        flat.extend(item if isinstance(item, (list, tuple)) else [item])
+    inputs = [d for d in flat if isinstance(d, Input)]
+    states = [d for d in flat if isinstance(d, State)]
+    return inputs + states
+
+def _components(layout):
+    '''{id: component} of every component with an id in a layout tree'''
+    found, stack = {}, [layout]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (list, tuple)):
+            stack.extend(node)
+            continue
+        if not hasattr(node, 'to_plotly_json'):
+            continue
+        if getattr(node, 'id', None) is not None:
+            found[str(node.id)] = node
+        stack.append(getattr(node, 'children', None))
+    return found
+
+def _measure_callbacks(components, repeat):
+    '''Latency of every recorded callback, called with the initial layout values'''
+    from .harness import measure
+    results = []
+    for args, kwargs, func in _REGISTERED:
+        values = [getattr(components.get(str(d.component_id)), d.component_property, None)
+                  for d in _dependencies(args, kwargs)]
+        result = {'name': func.__name__}
+        try:
+            func(*values)
+            result.update(measure(func, lambda values=values: values, repeat=repeat, warmup=1,
+                                  memory=False))
+        except Exception as e:
+            # Callbacks that need user interaction (PreventUpdate, None inputs) are reported as such
+            result['error'] = '{}: {}'.format(type(e).__name__, e)
+        results.append(result)
+    return results
+
+###################################
+# Public function
+###################################
+
+def measure_script(script, fixture, repeat=5):
+    '''Import time, peak RSS, layout size and callback latencies of one dashboard script'''
+    script = os.path.abspath(script)
+    os.chdir(fixture)
+    sys.path.insert(0, os.getcwd())
+    result = {'script': os.path.basename(script), 'baseline_rss': _peak_rss()}
+
+    _record_callbacks()
+    spec = importlib.util.spec_from_file_location('app', script)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['app'] = module
+    start = time.perf_counter()
+    spec.loader.exec_module(module)
+    result['import_seconds'] = time.perf_counter() - start
+    result['import_rss'] = _peak_rss()
+
+    import plotly
+    layout = module.app.layout
+    layout = layout() if callable(layout) else layout
+    result['layout_bytes'] = len(json.dumps(layout, cls=plotly.utils.PlotlyJSONEncoder).encode())
+    result['callbacks'] = _measure_callbacks(_components(layout), repeat)
+    result['peak_rss'] = _peak_rss()
+    return result
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python -m benchmark.snapshot')
+    parser.add_argument('script')
+    parser.add_argument('fixture')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    result = measure_script(args.script, args.fixture, repeat=args.repeat)
+    # The scripts print while importing; the result is always the last line
+    sys.stdout.write('\n' + json.dumps(result) + '\n')
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+'''
+Vectorized trajectory engine for the strange_attractors.yml presets.
+
+A single attractor trajectory is sequential, so instead of one long orbit
+thousands of independent seeds, scattered around the preset's initial point,
+are iterated in lock-step as NumPy vectors. Each seed's transient is
+discarded, and every later step is binned straight into a fixed-resolution
+2D count grid in chunks of at most `chunk_points` points, so memory stays
+constant however many points are requested. Presets can be spread across a
+process pool.
+
+Usage:
+    python attractors.py                          # all presets, 10M points each
+    python attractors.py --points 50000000 --jobs 4 --only Clifford
+'''
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import yaml
+
+###################################
+# Private function and variable
+###################################
+
+PRESETS = './strange_attractors.yml'
+
+# Points binned per chunk (one chunk holds steps x seeds coordinates)
+CHUNK_POINTS = 2**22
+
+def _clifford(x, y, a, b, c, d):
+    return np.sin(a*y) + c*np.cos(a*x), np.sin(b*x) + d*np.cos(b*y)
+
+def _de_jong(x, y, a, b, c, d):
+    return np.sin(a*y) - np.cos(b*x), np.sin(c*x) - np.cos(d*y)
+
+def _svensson(x, y, a, b, c, d):
+    return d*np.sin(a*x) - np.sin(b*y), c*np.cos(a*x) + np.cos(b*y)
+
+def _bedhead(x, y, a, b):
+    return np.sin(x*y/b)*y + np.cos(a*x - y), x + np.sin(y)/b
+
+def _fractal_dream(x, y, a, b, c, d):
+    return np.sin(y*b) + c*np.sin(x*b), np.sin(x*a) + d*np.sin(y*a)
+
+def _hopalong1(x, y, a, b, c):
+    return y - np.sqrt(np.abs(b*x - c))*np.sign(x), a - x
+
+def _hopalong2(x, y, a, b, c):
+    return y - 1.0 - np.sqrt(np.abs(b*x - 1.0 - c))*np.sign(x - 1.0), a - x - 1.0
+
+def _gumowski_mira(x, y, a, b, mu):
+    def g(x):
+        return mu*x + 2*(1 - mu)*x**2 / (1.0 + x**2)
+    xn = y + a*(1 - b*y**2)*y + g(x)
+    return xn, -x + g(xn)
+
+def _symmetric_icon(x, y, a, b, g, om, l, d):
+    zzbar = x*x + y*y
+    p = a*zzbar + l
+    zreal, zimag = x, y
+    for _ in range(1, int(d) - 1):
+        zreal, zimag = zreal*x - zimag*y, zimag*x + zreal*y
+    p = p + b*(x*zreal - y*zimag)
+    return p*x + g*zreal - om*y, p*y - g*zimag + om*x
+
+# Preset name -> vectorized map (x, y, *params) -> (x, y)
+MAPS = {
+    'Clifford': _clifford,
+    'De_Jong': _de_jong,
+    'Svensson': _svensson,
+    'Bedhead': _bedhead,
+    'Fractal_Dream': _fractal_dream,
+    'Hopalong1': _hopalong1,
+    'Hopalong2': _hopalong2,
+    'Gumowski_Mira': _gumowski_mira,
+    'Symmetric_Icon': _symmetric_icon,
+}
+
+def _seeds(preset, n_seeds, spread, rng):
+    '''Seeds scattered around the preset's initial point'''
+    x = preset['x0'] + spread*rng.standard_normal(n_seeds)
+    y = preset['y0'] + spread*rng.standard_normal(n_seeds)
+    return x, y
+
+def _iterate(fn, x, y, params, n_steps):
+    '''Advance every seed n_steps, dropping seeds that escape to inf/nan'''
+    with np.errstate(all='ignore'):
+        for _ in range(n_steps):
+            x, y = fn(x, y, *params)
+    keep = np.isfinite(x) & np.isfinite(y)
+    return x[keep], y[keep]
+
+def _estimate_bounds(fn, x, y, params, n_steps=200, margin=0.05):
+    '''Bounding box of a short pilot run, padded by margin on each side'''
+    xs, ys = [], []
+    with np.errstate(all='ignore'):
+        for _ in range(n_steps):
+            x, y = fn(x, y, *params)
+            xs.append(x)
+            ys.append(y)
+    xs, ys = np.concatenate(xs), np.concatenate(ys)
+    keep = np.isfinite(xs) & np.isfinite(ys)
+    # Quantiles rather than min/max, so a few stray seeds do not shrink the attractor
+    x_low, x_high = np.quantile(xs[keep], [0.0005, 0.9995])
+    y_low, y_high = np.quantile(ys[keep], [0.0005, 0.9995])
+    pad_x = margin*(x_high - x_low) or 1
+    pad_y = margin*(y_high - y_low) or 1
+    return (x_low - pad_x, x_high + pad_x, y_low - pad_y, y_high + pad_y)
+
+def _accumulate(counts, xs, ys, bounds):
+    '''Add points to the (height, width) count grid, ignoring those out of bounds'''
+    height, width = counts.shape
+    x_low, x_high, y_low, y_high = bounds
+    col = ((xs - x_low) * (width / (x_high - x_low))).astype(np.int64)
+    row = ((ys - y_low) * (height / (y_high - y_low))).astype(np.int64)
+    inside = (col >= 0) & (col < width) & (row >= 0) & (row < height)
+    flat = row[inside]*width + col[inside]
+    counts += np.bincount(flat, minlength=width*height).reshape(height, width).astype(counts.dtype)
+
+###################################
+# Public function
+###################################
+
+def load_presets(path=PRESETS):
+    '''
+    Presets from strange_attractors.yml as a list of dicts with the keys
+    index, name, cmap, x0, y0 and params (the remaining numbers of the entry).
+    '''
+    with open(path) as f:
+        entries = yaml.safe_load(f)
+    return [{'index': i, 'name': e[0], 'cmap': e[1], 'x0': float(e[2]), 'y0': float(e[3]),
+             'params': tuple(float(p) for p in e[4:])}
+            for i, e in enumerate(entries)]
+
+def iter_counts(preset, n_points=10**7, resolution=(800, 800), n_seeds=4096, transient=100,
+                bounds=None, spread=0.01, chunk_points=CHUNK_POINTS, random_state=0):
+    '''
+    Iterate n_seeds seeds of one preset in lock-step and bin n_points points
+    (after each seed's transient) into a (height, width) count grid.
+
+    bounds=(x_low, x_high, y_low, y_high) fixes the plotted region; by
+    default it is estimated from a short pilot run. Yields
+    (counts, bounds, points binned so far) after every chunk, at least once;
+    counts is the same array, updated in place.
+    '''
+    if n_points < 1:
+        raise ValueError('n_points must be at least 1, got {}'.format(n_points))
+    fn = MAPS[preset['name']]
+    params = preset['params']
+    width, height = resolution
+    rng = np.random.RandomState(random_state)
+
+    x, y = _seeds(preset, n_seeds, spread, rng)
+    x, y = _iterate(fn, x, y, params, transient)
+    if len(x) == 0:
+        raise ValueError('every seed of preset {} ({}) diverged'.format(preset['index'], preset['name']))
+    if bounds is None:
+        bounds = _estimate_bounds(fn, x, y, params)
+
+    counts = np.zeros((height, width), dtype=np.uint32)
+    steps_per_chunk = max(1, chunk_points // len(x))
+    xs = np.empty((steps_per_chunk, len(x)))
+    ys = np.empty((steps_per_chunk, len(x)))
+
+    done = 0
+    with np.errstate(all='ignore'):
+        while done < n_points:
+            steps = min(steps_per_chunk, -(-(n_points - done) // len(x)))
+            for k in range(steps):
+                x, y = fn(x, y, *params)
+                xs[k], ys[k] = x, y
+            # Non-finite points fall outside the grid and are dropped by _accumulate
+            n = min(n_points - done, steps*len(x))
+            _accumulate(counts, xs[:steps].ravel()[:n], ys[:steps].ravel()[:n], bounds)
+            done += n
+            yield counts, bounds, done
+
+def trajectory_counts(preset, n_points=10**7, **kwargs):
+    '''Final (counts, bounds) of iter_counts'''
+    for counts, bounds, _ in iter_counts(preset, n_points, **kwargs):
+        pass
+    return counts, bounds
+
+def _render_preset(args):
+    preset, kwargs = args
+    start = time.perf_counter()
+    counts, bounds = trajectory_counts(preset, **kwargs)
+    return preset['index'], counts, bounds, time.perf_counter() - start
+
+def render_presets(presets, n_jobs=1, **kwargs):
+    '''
+    trajectory_counts for every preset, spread over n_jobs processes.
+    Returns {preset index: (counts, bounds, seconds)}.
+    '''
+    tasks = [(preset, kwargs) for preset in presets]
+    if n_jobs == 1:
+        results = list(map(_render_preset, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            results = list(executor.map(_render_preset, tasks))
+    return {i: (counts, bounds, seconds) for i, counts, bounds, seconds in results}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--points', type=int, default=10**7)
+    parser.add_argument('--seeds', type=int, default=4096)
+    parser.add_argument('--resolution', type=int, default=800)
+    parser.add_argument('--jobs', type=int, default=1)
+    parser.add_argument('--only', default=None, help='render only the presets of this attractor')
+    args = parser.parse_args()
+
+    presets = [p for p in load_presets() if args.only in (None, p['name'])]
+    start = time.perf_counter()
+    results = render_presets(presets, n_jobs=args.jobs, n_points=args.points, n_seeds=args.seeds,
+                             resolution=(args.resolution, args.resolution))
+    for preset in presets:
+        counts, bounds, seconds = results[preset['index']]
+        print('{:>2} {:<15} {:>5.1f}s  {:>6.1%} of pixels hit'.format(
+            preset['index'], preset['name'], seconds, (counts > 0).mean()))
+    print('{} presets in {:.1f}s'.format(len(presets), time.perf_counter() - start))
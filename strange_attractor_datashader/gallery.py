@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+'''
+Aggregate cache and batch gallery renderer for the strange_attractors.yml presets.
+
+Aggregation (iterating the attractor and binning points) is the expensive
+step; shading is cheap. The raw count grid of each preset is therefore cached
+on disk as a compressed .npz keyed by attractor, initial point, parameters,
+resolution and point count, so re-rendering a preset with another colormap
+only re-shades the cached grid.
+
+Missing grids are computed in parallel with attractors.render_presets. With
+--preview, a coarse gallery from a small number of points is written first
+and replaced once the full-resolution grids are accumulated.
+
+Colormap names such as bgy, bmw or fire come from colorcet; when colorcet is
+not installed they fall back to the closest matplotlib colormap.
+
+Usage:
+    python gallery.py --out gallery.png
+    python gallery.py --out gallery.png --points 50000000 --jobs 4 --preview 500000
+'''
+import os
+import time
+import hashlib
+import argparse
+
+import numpy as np
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.image as mpimg
+
+from attractors import load_presets, iter_counts, render_presets
+
+try:
+    import colorcet
+except ImportError:
+    colorcet = None
+
+###################################
+# Private function and variable
+###################################
+
+CACHE_DIR = './.cache/'
+
+# Fallbacks for the colorcet colormaps used in strange_attractors.yml
+FALLBACK_CMAPS = {
+    'bgy': 'viridis',
+    'bgyw': 'YlGnBu_r',
+    'bmw': 'PuBu_r',
+    'bmy': 'plasma',
+    'fire': 'afmhot',
+    'kbc': 'Blues_r',
+    'kgy': 'Greens_r',
+}
+
+# Render settings that change the count grid, and so belong in the cache key
+KEY_SETTINGS = ('n_points', 'resolution', 'n_seeds', 'transient', 'spread', 'random_state')
+
+def _settings(n_points, resolution, n_seeds=4096, transient=100, spread=0.01, random_state=0):
+    return {'n_points': int(n_points), 'resolution': tuple(resolution), 'n_seeds': n_seeds,
+            'transient': transient, 'spread': spread, 'random_state': random_state}
+
+def _cache_path(preset, settings, cache_dir):
+    '''Cache file of a preset; the colormap is deliberately not part of the key'''
+    key = repr((preset['name'], preset['x0'], preset['y0'], preset['params'],
+                [settings[k] for k in KEY_SETTINGS]))
+    digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, '{}_{}.npz'.format(preset['name'], digest))
+
+def _save_counts(path, counts, bounds):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write then rename, so a concurrent reader never sees a partial file
+    tmp = path + '.tmp.npz'
+    np.savez_compressed(tmp, counts=counts, bounds=np.asarray(bounds))
+    os.replace(tmp, path)
+
+def _load_counts(path):
+    with np.load(path) as archive:
+        return archive['counts'], tuple(archive['bounds'])
+
+def _tile(images, ncols, background):
+    '''Arrange equally sized RGB images into a grid, row by row'''
+    height, width, _ = images[0].shape
+    nrows = int(np.ceil(len(images) / ncols))
+    grid = np.empty((nrows*height, ncols*width, 3), dtype=np.uint8)
+    grid[:] = background
+    for k, image in enumerate(images):
+        row, col = divmod(k, ncols)
+        grid[row*height:(row+1)*height, col*width:(col+1)*width] = image
+    return grid
+
+###################################
+# Public function
+###################################
+
+def get_cmap(name):
+    '''Matplotlib colormap for a preset colormap name'''
+    if colorcet is not None and name in colorcet.cm:
+        return colorcet.cm[name]
+    return matplotlib.colormaps[FALLBACK_CMAPS.get(name, name)]
+
+def shade(counts, cmap, how='eq_hist', background=(0, 0, 0)):
+    '''
+    RGB uint8 image of a count grid, row 0 at the top. how is 'eq_hist'
+    (histogram equalisation, datashader's default), 'log' or 'linear';
+    empty pixels get the background colour.
+    '''
+    cmap = get_cmap(cmap) if isinstance(cmap, str) else cmap
+    counts = counts[::-1]
+    hit = counts > 0
+    level = np.zeros(counts.shape)
+    if hit.any():
+        values = counts[hit]
+        if how == 'eq_hist':
+            _, inverse, freq = np.unique(values, return_inverse=True, return_counts=True)
+            cdf = np.cumsum(freq) / len(values)
+            level[hit] = cdf[inverse.ravel()]
+        elif how == 'log':
+            level[hit] = np.log1p(values) / np.log1p(values.max())
+        else:
+            level[hit] = values / values.max()
+    image = (cmap(level)[:, :, :3] * 255).astype(np.uint8)
+    image[~hit] = background
+    return image
+
+def cached_counts(presets, n_points=10**7, resolution=(800, 800), n_jobs=1, cache_dir=CACHE_DIR, **kwargs):
+    '''
+    Count grid and bounds of every preset, read from the cache when
+    available; the missing ones are rendered across n_jobs processes and
+    cached. Returns {preset index: (counts, bounds)}.
+    '''
+    settings = _settings(n_points, resolution, **kwargs)
+    paths = {p['index']: _cache_path(p, settings, cache_dir) for p in presets}
+    results = {i: _load_counts(path) for i, path in paths.items() if os.path.exists(path)}
+
+    missing = [p for p in presets if p['index'] not in results]
+    if missing:
+        rendered = render_presets(missing, n_jobs=n_jobs, **settings)
+        for i, (counts, bounds, _) in rendered.items():
+            _save_counts(paths[i], counts, bounds)
+            results[i] = (counts, bounds)
+    return results
+
+def render_gallery(presets, out, n_points=10**7, resolution=(400, 400), ncols=8, how='eq_hist',
+                   cmaps=None, n_jobs=1, preview_points=None, cache_dir=CACHE_DIR, **kwargs):
+    '''
+    Shade every preset with its own colormap (or cmaps[index]) and tile them
+    into one image saved to out. With preview_points, a coarse gallery is
+    written first and overwritten by the full one.
+    '''
+    cmaps = {} if cmaps is None else cmaps
+    passes = [preview_points, n_points] if preview_points else [n_points]
+    for points in passes:
+        grids = cached_counts(presets, points, resolution, n_jobs=n_jobs, cache_dir=cache_dir, **kwargs)
+        images = [shade(grids[p['index']][0], cmaps.get(p['index'], p['cmap']), how) for p in presets]
+        mpimg.imsave(out, _tile(images, min(ncols, len(images)), 0))
+    return out
+
+def progressive_render(preset, out, n_points=10**8, resolution=(800, 800), how='eq_hist',
+                       chunk_points=2**20, cache_dir=CACHE_DIR, **kwargs):
+    '''
+    Render one preset to out, rewriting the image after every chunk so a
+    coarse picture appears at once and sharpens while points accumulate.
+    The final grid is cached like cached_counts does.
+    '''
+    settings = _settings(n_points, resolution, **kwargs)
+    path = _cache_path(preset, settings, cache_dir)
+    if os.path.exists(path):
+        counts, _ = _load_counts(path)
+        mpimg.imsave(out, shade(counts, preset['cmap'], how))
+        return counts
+
+    for counts, bounds, done in iter_counts(preset, chunk_points=chunk_points, **settings):
+        mpimg.imsave(out, shade(counts, preset['cmap'], how))
+    _save_counts(path, counts, bounds)
+    return counts
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--out', default='./gallery.png')
+    parser.add_argument('--points', type=int, default=10**7)
+    parser.add_argument('--resolution', type=int, default=400)
+    parser.add_argument('--ncols', type=int, default=8)
+    parser.add_argument('--how', default='eq_hist', choices=['eq_hist', 'log', 'linear'])
+    parser.add_argument('--jobs', type=int, default=1)
+    parser.add_argument('--preview', type=int, default=None, help='points per preset of the coarse preview')
+    parser.add_argument('--only', default=None, help='render only the presets of this attractor')
+    args = parser.parse_args()
+
+    presets = [p for p in load_presets() if args.only in (None, p['name'])]
+    start = time.perf_counter()
+    render_gallery(presets, args.out, n_points=args.points, resolution=(args.resolution, args.resolution),
+                   ncols=args.ncols, how=args.how, n_jobs=args.jobs, preview_points=args.preview)
+    print('{} presets written to {} in {:.1f}s'.format(len(presets), args.out, time.perf_counter() - start))